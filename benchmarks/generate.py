@@ -0,0 +1,225 @@
+"""
+合成测试文档生成器。
+
+    python -m benchmarks.generate out.docx --paragraphs 10000 [--seed 1]
+
+生成的文档包含：
+- 所有 TITLE_FORMATS 格式的手打编号标题（编号后带随机空格、英文括号）
+- 被拆成多个 run 的碎片化正文（夹带拼写检查标记）
+- 自动编号列表（List Number 样式）
+- 表格及其上方的表题、图片及其下方的图题（中间偶尔夹一个空段落）
+- 可选：--media-mb 指定大小的随机像素图片（几乎不可压缩，模拟嵌入扫描件的文档）
+
+段落直接用 lxml 构建后追加到正文，10 万段也只需几秒
+（python-docx 的 add_paragraph 每次都要查找 sectPr，整体是平方复杂度）。
+"""
+import argparse
+import copy
+import io
+import random
+import struct
+import zlib
+
+from docx import Document
+from docx.oxml.ns import qn
+from docx.shared import Inches
+from lxml import etree
+
+from wordtool.core.matcher import TITLE_FORMATS
+from wordtool.core.numbering import format_number
+
+# 格式字符串中的示例编号 -> 渲染时使用的 numFmt
+_TOKEN_FORMATS = (
+    ("一", "chineseCounting"),
+    ("①", "decimalEnclosedCircle"),
+    ("1", "decimal"),
+    ("a", "lowerLetter"),
+    ("A", "upperLetter"),
+    ("I", "upperRoman"),
+)
+
+_WORDS = (
+    "本项目", "研究", "系统", "数据", "分析", "方法", "结果", "表明", "通过", "实验",
+    "模型", "参数", "性能", "优化", "设计", "实现", "测试", "评估", "应用", "处理",
+)
+
+
+def title_prefix(fmt, n):
+    """按 TITLE_FORMATS 中的格式渲染第 n 个编号，如 ("（一）、", 3) -> "（三）、" """
+    for token, num_fmt in _TOKEN_FORMATS:
+        if token in fmt:
+            return fmt.replace(token, format_number(n, num_fmt), 1)
+    return fmt
+
+
+def _png(width=8, height=8):
+    """生成一张纯色 PNG（不依赖图片库）"""
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    raw = b"".join(b"\x00" + b"\x40\x80\xc0" * width for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw))
+            + chunk(b"IEND", b""))
+
+
+def _noise_png(rng, size):
+    """约 size 字节的随机像素 PNG（压缩后大小基本不变）"""
+    width = 1024
+    height = max(1, size // (width * 3))
+    raw = b"".join(b"\x00" + rng.randbytes(width * 3) for _ in range(height))
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw, 1))
+            + chunk(b"IEND", b""))
+
+
+_MEDIA_CHUNK = 4 * 1024 * 1024  # 每张大图片的大小
+
+
+class _Builder:
+    def __init__(self, doc, rng):
+        self.doc = doc
+        self.rng = rng
+        self.body = doc.element.body
+        self.sect_pr = self.body.find(qn("w:sectPr"))
+        self.count = 0        # 已生成的段落数
+        self.counters = {}    # 各格式的编号计数
+        self.drawing_id = 100
+
+        # 插入一张图片作为模板，之后复制它的 drawing（共用同一个图片部件）
+        doc.add_picture(io.BytesIO(_png()), width=Inches(1.5))
+        picture_p = self.body.findall(qn("w:p"))[-1]
+        self.drawing = copy.deepcopy(picture_p.find(".//" + qn("w:drawing")))
+        self.body.remove(picture_p)
+        self.list_style = doc.styles["List Number"].style_id
+
+        # 表格同样只用 python-docx 生成一次模板（add_table 每次都要遍历整个正文）
+        self.tbl = doc.add_table(rows=3, cols=3)._tbl
+        self.body.remove(self.tbl)
+
+    # ---------------------- 元素构建 ----------------------
+    def _append(self, elm):
+        if self.sect_pr is not None:
+            self.sect_pr.addprevious(elm)
+        else:
+            self.body.append(elm)
+
+    @staticmethod
+    def _run(parent, text):
+        r = etree.SubElement(parent, qn("w:r"))
+        t = etree.SubElement(r, qn("w:t"))
+        t.text = text
+        if text != text.strip():
+            t.set("{http://www.w3.org/XML/1998/namespace}space", "preserve")
+        return r
+
+    def paragraph(self, texts, style=None):
+        p = etree.Element(qn("w:p"))
+        if style is not None:
+            pPr = etree.SubElement(p, qn("w:pPr"))
+            etree.SubElement(pPr, qn("w:pStyle")).set(qn("w:val"), style)
+        for text in texts:
+            self._run(p, text)
+        self._append(p)
+        self.count += 1
+        return p
+
+    def sentence(self, words=12):
+        text = "".join(self.rng.choice(_WORDS) for _ in range(words))
+        if self.rng.random() < 0.3:
+            text += "(注：示例)"
+        return text + "。"
+
+    # ---------------------- 内容块 ----------------------
+    def title(self):
+        fmt = self.rng.choice(TITLE_FORMATS)
+        n = self.counters[fmt] = self.counters.get(fmt, 0) + 1
+        prefix = title_prefix(fmt, (n - 1) % 20 + 1)
+        # 编号后的空格数随机，英文括号随机出现
+        prefix = prefix + " " * self.rng.randint(0, 2)
+        if self.rng.random() < 0.3:
+            prefix = prefix.replace("（", "(").replace("）", ")")
+        self.paragraph([prefix + self.sentence(4)])
+
+    def fragmented(self):
+        """把一句话拆成 3~8 个 run，并在中间插入拼写检查标记"""
+        text = self.sentence(self.rng.randint(10, 30))
+        cuts = sorted(self.rng.sample(range(1, len(text)), min(len(text) - 1, self.rng.randint(2, 7))))
+        parts = [text[i:j] for i, j in zip([0] + cuts, cuts + [len(text)])]
+        p = self.paragraph(parts)
+        for r in list(p.iterchildren(qn("w:r")))[1::2]:
+            r.addprevious(etree.Element(qn("w:proofErr"), {qn("w:type"): "spellStart"}))
+
+    def numbered_list(self, items):
+        for _ in range(items):
+            self.paragraph([self.sentence(6)], style=self.list_style)
+
+    def table(self, number):
+        self.paragraph([f"表{number} 示例表格"])
+        if self.rng.random() < 0.2:
+            self.paragraph([])
+        tbl = copy.deepcopy(self.tbl)
+        for tc in tbl.iter(qn("w:tc")):
+            self._run(tc.find(qn("w:p")), self.rng.choice(_WORDS))
+        self._append(tbl)
+
+    def image(self, number):
+        p = self.paragraph([])
+        r = etree.SubElement(p, qn("w:r"))
+        drawing = copy.deepcopy(self.drawing)
+        self.drawing_id += 1
+        for doc_pr in drawing.iter(qn("wp:docPr")):
+            doc_pr.set("id", str(self.drawing_id))
+        r.append(drawing)
+        if self.rng.random() < 0.2:
+            self.paragraph([])
+        self.paragraph([f"图{number} 示例图片"])
+
+
+def generate(path, paragraphs=1000, seed=1, media_mb=0):
+    """生成约 paragraphs 个段落的测试文档，返回实际段落数；media_mb 为额外嵌入的大图片总大小"""
+    rng = random.Random(seed)
+    builder = _Builder(Document(), rng)
+    tables = images = 0
+    while builder.count < paragraphs:
+        roll = rng.random()
+        if roll < 0.15:
+            builder.title()
+        elif roll < 0.20:
+            builder.numbered_list(rng.randint(2, 5))
+        elif roll < 0.22:
+            tables += 1
+            builder.table(tables)
+        elif roll < 0.24:
+            images += 1
+            builder.image(images)
+        elif roll < 0.60:
+            builder.fragmented()
+        else:
+            builder.paragraph([builder.sentence(rng.randint(10, 40))])
+    for _ in range(-(-media_mb * 1024 * 1024 // _MEDIA_CHUNK)):
+        builder.doc.add_picture(io.BytesIO(_noise_png(rng, _MEDIA_CHUNK)), width=Inches(4))
+        builder.count += 1
+    builder.doc.save(path)
+    return builder.count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成基准测试用的 .docx 文档")
+    parser.add_argument("output", help="输出文件")
+    parser.add_argument("--paragraphs", "-n", type=int, default=1000, help="段落数，默认 1000")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子，相同种子生成相同文档")
+    parser.add_argument("--media-mb", type=int, default=0, help="额外嵌入的大图片总大小（MB），默认 0")
+    args = parser.parse_args(argv)
+    count = generate(args.output, args.paragraphs, args.seed, args.media_mb)
+    print(f"已生成 {args.output}：{count} 段")
+
+
+if __name__ == "__main__":
+    main()
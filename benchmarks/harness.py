@@ -0,0 +1,242 @@
+"""
+基准测试：生成不同规模的文档，测量 save() 全流程及各阶段 / 各 stage 的耗时、
+吞吐量（段落/秒）和峰值内存，并与基线比较。
+
+    python -m benchmarks.harness                          # 默认 1k / 10k / 100k 段
+    python -m benchmarks.harness --sizes 1000 10000 --engine docx streaming
+    python -m benchmarks.harness --update-baseline        # 用本次结果覆盖基线
+    python -m benchmarks.harness --sizes 1000 --media-mb 300 --loader lazy eager   # 图片多的文档，对比两种读取方式
+
+吞吐量低于基线 (1 - threshold) 倍，或峰值内存高于基线 (1 + threshold) 倍且多出 RSS_SLACK 以上时判定为退化，
+退出码为 1。每次测量都在单独的子进程中进行，峰值内存互不影响。
+
+另外测量 IMPORT_MODULES 的导入时间（批量处理的工作进程、打包后的 exe 每次启动都要付出），
+超过基线 (1 + threshold) 倍且多出 IMPORT_SLACK 秒以上时同样判定为退化。
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+DEFAULT_BASELINE = HERE / "baseline.json"
+DEFAULT_CONFIG = HERE / "config.json"
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_THRESHOLD = 0.2
+
+# 各入口首先导入的模块
+IMPORT_MODULES = (
+    "wordtool.core",            # 作为库使用
+    "wordtool.cli",             # python -m wordtool
+    "wordtool.app.main",        # 图形界面 / exe 工作进程
+    "wordtool.core.batch",      # 批量处理主进程
+    "wordtool.core.formatter",  # 工作进程处理第一个文件前
+)
+IMPORT_REPEAT = 7
+IMPORT_SLACK = 0.02   # 十几毫秒的抖动不算退化
+# 小文档的峰值内存只有几十 MB，分配器 arena、垃圾回收时机带来的几十 MB 波动不算退化
+RSS_SLACK = 32 * 2**20
+
+# 退出码
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+
+
+# ----------------------------------------------------------------------
+# 子进程：测量一次
+# ----------------------------------------------------------------------
+def run_one(path, engine, config_path, loader="lazy"):
+    from wordtool.config import ConfigManager
+    from wordtool.core.formatter import WordFormatter
+    from wordtool.core.instrument import Instrumentation
+
+    config = ConfigManager.load_config_file(config_path)
+    config["engine"] = engine
+    # lazy：惰性读取输入包（默认）；eager：python-docx 一次读入全部部件
+    config["package"] = dict(config.get("package") or {}, lazy=loader == "lazy")
+    formatter = WordFormatter(path, config)
+    formatter.instrument = Instrumentation()
+
+    fd, out_path = tempfile.mkstemp(suffix=".docx")
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        if not formatter.save(out_path):
+            raise RuntimeError(formatter.last_error)
+        seconds = time.perf_counter() - start
+    finally:
+        os.remove(out_path)
+
+    report = formatter.instrument.report()
+    return {
+        "seconds": round(seconds, 6),
+        "paragraphs": formatter.paragraph_count,
+        "paragraphs_per_sec": round(formatter.paragraph_count / seconds, 1),
+        "peak_rss": report["peak_rss"],
+        "phases": report["phases"],
+        "stages": report["stages"],
+    }
+
+
+def _python(*args):
+    """在新的子进程中运行 python，返回标准输出的最后一行"""
+    env = dict(os.environ)
+    src = str(HERE.parent / "src")
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (src, str(HERE.parent), env.get("PYTHONPATH")) if p)
+    proc = subprocess.run([sys.executable, *args], env=env, capture_output=True, text=True, encoding="utf-8")
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip() or f"子进程退出码 {proc.returncode}")
+    return proc.stdout.strip().splitlines()[-1]
+
+
+def _measure(path, engine, config_path, loader="lazy"):
+    """在新的子进程中测量，返回 run_one 的结果"""
+    return json.loads(_python("-m", "benchmarks.harness", "--run-one", str(path),
+                              "--engine", engine, "--config", str(config_path), "--loader", loader))
+
+
+def measure_import(module, repeat=IMPORT_REPEAT):
+    """在全新的解释器中导入 module 的耗时（秒），取多次中最快的一次"""
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    return min(float(_python("-c", code)) for _ in range(repeat))
+
+
+# ----------------------------------------------------------------------
+# 基线比较
+# ----------------------------------------------------------------------
+def compare(results, baseline, threshold):
+    """返回 [(key, 说明)] 形式的退化列表"""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if result["paragraphs_per_sec"] < base["paragraphs_per_sec"] * (1 - threshold):
+            regressions.append((key, f"吞吐量 {result['paragraphs_per_sec']:.0f} 段/秒，"
+                                     f"基线 {base['paragraphs_per_sec']:.0f} 段/秒"))
+        rss, base_rss = result["peak_rss"], base.get("peak_rss")
+        if rss and base_rss and rss > base_rss * (1 + threshold) and rss - base_rss > RSS_SLACK:
+            regressions.append((key, f"峰值内存 {result['peak_rss'] / 2**20:.0f} MB，"
+                                     f"基线 {base['peak_rss'] / 2**20:.0f} MB"))
+    return regressions
+
+
+def compare_imports(imports, baseline, threshold):
+    regressions = []
+    for module, seconds in imports.items():
+        base = baseline.get(module)
+        if base is not None and seconds > base * (1 + threshold) and seconds - base > IMPORT_SLACK:
+            regressions.append((f"import {module}", f"{seconds * 1000:.1f} ms，基线 {base * 1000:.1f} ms"))
+    return regressions
+
+
+def _print_row(key, result, base):
+    rss = f"{result['peak_rss'] / 2**20:8.1f} MB" if result["peak_rss"] else "       -   "
+    line = f"{key:<30}{result['seconds']:>10.2f}s{result['paragraphs_per_sec']:>12.0f} 段/秒{rss}"
+    if base:
+        ratio = result["paragraphs_per_sec"] / base["paragraphs_per_sec"]
+        line += f"   基线的 {ratio:.0%}"
+    print(line, flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WordFormatter 基准测试")
+    parser.add_argument("--sizes", type=int, nargs="*", default=list(DEFAULT_SIZES),
+                        help="段落数；不带值时只测量导入时间")
+    parser.add_argument("--engine", nargs="+", default=["docx"], choices=["docx", "streaming"])
+    parser.add_argument("--loader", nargs="+", default=["lazy"], choices=["lazy", "eager"],
+                        help="输入包读取方式：lazy 惰性读取（默认），eager 为 python-docx 一次读入全部部件")
+    parser.add_argument("--media-mb", type=int, default=0, help="测试文档额外嵌入的大图片总大小（MB）")
+    parser.add_argument("--repeat", type=int, default=1, help="每个规模测量次数，取最快的一次")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--config", default=str(DEFAULT_CONFIG), help="格式化配置，默认 benchmarks/config.json")
+    parser.add_argument("--workdir", default=None, help="生成文档的缓存目录，默认系统临时目录")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--threshold", type=float, default=None,
+                        help=f"允许的退化比例，默认取基线文件中的值或 {DEFAULT_THRESHOLD}")
+    parser.add_argument("--update-baseline", action="store_true", help="用本次结果写入基线")
+    parser.add_argument("--output", help="把完整结果（含各阶段耗时）写入 JSON 文件")
+    parser.add_argument("--skip-imports", action="store_true", help="不测量导入时间")
+    parser.add_argument("--run-one", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_one:
+        print(json.dumps(run_one(args.run_one, args.engine[0], args.config, args.loader[0])))
+        return EXIT_OK
+
+    # 子进程由 _python() 把 src 加入 PYTHONPATH；本进程生成测试文档时同样要导入 wordtool
+    src = str(HERE.parent / "src")
+    if src not in sys.path:
+        sys.path.insert(0, src)
+    from benchmarks.generate import generate
+
+    baseline_path = Path(args.baseline)
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8")) if baseline_path.exists() else {}
+    threshold = args.threshold if args.threshold is not None else baseline.get("threshold", DEFAULT_THRESHOLD)
+    base_results = baseline.get("results", {})
+    base_imports = baseline.get("imports", {})
+
+    imports = {}
+    if not args.skip_imports:
+        for module in IMPORT_MODULES:
+            imports[module] = round(measure_import(module), 6)
+            line = f"import {module:<28}{imports[module] * 1000:>8.1f} ms"
+            if module in base_imports:
+                line += f"   基线 {base_imports[module] * 1000:.1f} ms"
+            print(line, flush=True)
+
+    workdir = Path(args.workdir or tempfile.gettempdir()) / "wordtool_bench"
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    results = {}
+    for size in args.sizes:
+        media = f"_m{args.media_mb}" if args.media_mb else ""
+        path = workdir / f"bench_{size}_s{args.seed}{media}.docx"
+        if not path.exists():
+            generate(str(path), size, args.seed, args.media_mb)
+        for engine in args.engine:
+            for loader in args.loader:
+                # 默认组合的键保持 "引擎/段落数"，与已有基线兼容
+                key = f"{engine}/{size}"
+                if args.media_mb:
+                    key += f"/media{args.media_mb}"
+                if loader != "lazy":
+                    key += f"/{loader}"
+                runs = [_measure(path, engine, args.config, loader) for _ in range(max(1, args.repeat))]
+                results[key] = min(runs, key=lambda r: r["seconds"])
+                _print_row(key, results[key], base_results.get(key))
+
+    if args.output:
+        report = {"results": results, "imports": imports}
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    if args.update_baseline:
+        base_results.update({
+            key: {k: r[k] for k in ("seconds", "paragraphs", "paragraphs_per_sec", "peak_rss")}
+            for key, r in results.items()
+        })
+        base_imports.update(imports)
+        baseline = {
+            "threshold": threshold,
+            "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                        "processor": platform.machine()},
+            "results": base_results,
+            "imports": base_imports,
+        }
+        baseline_path.write_text(json.dumps(baseline, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"基线已更新：{baseline_path}")
+        return EXIT_OK
+
+    regressions = compare(results, base_results, threshold) + compare_imports(imports, base_imports, threshold)
+    for key, message in regressions:
+        print(f"退化 {key}：{message}", file=sys.stderr)
+    return EXIT_REGRESSION if regressions else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,29 +1,46 @@
 from tkinter import filedialog, messagebox
 from pathlib import Path
+from wordtool.app.jobs import JobRunner
 from wordtool.config import ConfigManager
-from wordtool.core.formatter import WordFormatter
 
 
 class EventHandlers:
     def __init__(self, ui):
         self.ui = ui
-        self.input_file = None
+        self.input_files = []
         self.output_dir = None
+
+        # 当前一批任务：任务编号 -> 输入文件；正在处理的任务占用的进度条槽位
+        self.jobs = []
+        self.job_slots = {}
+        self.waiting = []    # 已开始但暂时没有空闲槽位的任务
+        self.finished = {}   # 任务编号 -> (状态, 错误信息)
+        self.runner = JobRunner(
+            ui.root,
+            on_start=self._on_job_start,
+            on_progress=self._on_job_progress,
+            on_done=self._on_job_done,
+            on_finished=self._on_all_done,
+        )
         self._bind_events()
 
     def _bind_events(self):
         self.ui.btn_choose.config(command=self.choose_file)
         self.ui.btn_output.config(command=self.choose_output_path)
         self.ui.btn_start.config(command=self.start_formatting)
+        self.ui.btn_cancel.config(command=self.cancel_formatting)
+        self.ui.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def choose_file(self):
-        path = filedialog.askopenfilename(
-            title="选择 Word 文件",
+        paths = filedialog.askopenfilenames(
+            title="选择 Word 文件（可多选）",
             filetypes=[("Word Document", "*.docx")]
         )
-        if path:
-            self.input_file = path
-            messagebox.showinfo("选择成功", path)
+        if paths:
+            self.input_files = list(paths)
+            names = "\n".join(Path(p).name for p in self.input_files[:10])
+            more = f"\n……共 {len(self.input_files)} 个文件" if len(self.input_files) > 10 else ""
+            messagebox.showinfo("选择成功", names + more)
 
     def choose_output_path(self):
         path = filedialog.askdirectory(title="选择输出路径")
@@ -31,8 +48,14 @@ class EventHandlers:
             self.output_dir = path
             messagebox.showinfo("输出路径已设置", path)
 
+    # ----------------------------------------------------------------------
+    # 开始 / 取消
+    # ----------------------------------------------------------------------
     def start_formatting(self):
-        if not self.input_file:
+        if self.runner.running:
+            return
+
+        if not self.input_files:
             messagebox.showwarning("缺少文件", "请先选择 Word 文件")
             return
 
@@ -46,13 +69,85 @@ class EventHandlers:
         # 保存配置到 JSON
         ConfigManager.save_config(config)
 
-        output_file = Path(self.output_dir) / ("格式化_" + Path(self.input_file).name)
+        # 不同目录下的同名文件、输出目录中已有的文件都不覆盖，输出时加序号
+        jobs = []
+        used = set()
+        out_dir = Path(self.output_dir)
+        for in_path in self.input_files:
+            name = "格式化_" + Path(in_path).name
+            n = 2
+            while name in used or (out_dir / name).exists():
+                name = f"格式化_{Path(in_path).stem}_{n}{Path(in_path).suffix}"
+                n += 1
+            used.add(name)
+            jobs.append((in_path, str(out_dir / name)))
+
+        workers = min(config["workers"], len(jobs))
+        self.jobs = [in_path for in_path, _ in jobs]
+        self.job_slots = {}
+        self.waiting = []
+        self.finished = {}
+        self.ui.reset_progress(workers, len(jobs))
+        self.ui.btn_start.config(state="disabled")
+        self.ui.btn_cancel.config(state="normal")
+        self.runner.start(jobs, config, workers)
+
+    def cancel_formatting(self):
+        self.runner.cancel()
+        self.ui.btn_cancel.config(state="disabled")
+        self.ui.set_overall(len(self.finished), len(self.jobs), "正在取消……")
+
+    def on_close(self):
+        if self.runner.running:
+            if not messagebox.askyesno("正在处理", "还有文件正在处理，确定取消并退出吗？"):
+                return
+            self.runner.shutdown()
+        self.ui.root.destroy()
+
+    # ----------------------------------------------------------------------
+    # 任务回调（界面线程中执行）
+    # ----------------------------------------------------------------------
+    def _on_job_start(self, job_id):
+        # 进度消息可能晚于完成结果到达，已完成的任务不再占用槽位
+        if job_id in self.finished:
+            return
+        used = set(self.job_slots.values())
+        slot = next((i for i in range(len(self.ui.slots)) if i not in used), None)
+        if slot is None:
+            # 同一进程的上一个任务的完成结果还没轮询到，槽位释放后再显示
+            self.waiting.append(job_id)
+            return
+        self.job_slots[job_id] = slot
+        self.ui.set_slot(slot, Path(self.jobs[job_id]).name)
+
+    def _on_job_progress(self, job_id, done, total):
+        slot = self.job_slots.get(job_id)
+        if slot is not None:
+            self.ui.set_slot(slot, Path(self.jobs[job_id]).name, done, total)
+
+    def _on_job_done(self, job_id, status, error):
+        self.finished[job_id] = (status, error)
+        if job_id in self.waiting:
+            self.waiting.remove(job_id)
+        slot = self.job_slots.pop(job_id, None)
+        if slot is not None:
+            self.ui.clear_slot(slot)
+            if self.waiting:
+                self._on_job_start(self.waiting.pop(0))
+        self.ui.set_overall(len(self.finished), len(self.jobs))
+
+    def _on_all_done(self):
+        self.ui.btn_start.config(state="normal")
+        self.ui.btn_cancel.config(state="disabled")
 
-        try:
-            formatter = WordFormatter(self.input_file, config)
-            formatter.save(str(output_file))
-            messagebox.showinfo("完成", f"文件已保存：{output_file}")
+        ok = [j for j, (status, _) in self.finished.items() if status == "ok"]
+        failed = [(j, error) for j, (status, error) in self.finished.items() if status == "failed"]
+        cancelled = len(self.finished) - len(ok) - len(failed)
+        summary = f"成功 {len(ok)} 个，失败 {len(failed)} 个，取消 {cancelled} 个"
+        self.ui.set_overall(len(self.finished), len(self.jobs), summary)
 
-        except Exception as e:
-            messagebox.showerror("错误", str(e))
-            raise e
+        if failed:
+            details = "\n".join(f"{Path(self.jobs[j]).name}：{error}" for j, error in failed[:10])
+            messagebox.showerror("完成（有失败）", f"{summary}\n\n{details}")
+        else:
+            messagebox.showinfo("完成", f"{summary}\n输出路径：{self.output_dir}")
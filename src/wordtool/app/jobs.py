@@ -0,0 +1,151 @@
+"""
+界面的后台格式化任务。
+
+选中的文件交给进程池并行处理（最多 workers 个同时进行），
+工作进程通过消息队列回报进度，界面线程用 root.after 定时轮询队列，
+处理过程中窗口保持响应。取消时置位共享的 Event，
+正在处理的文件在段落之间停止，尚未开始的文件直接撤销。
+"""
+import multiprocessing
+import queue
+from concurrent.futures import ProcessPoolExecutor
+
+# 轮询消息队列的间隔（毫秒）
+_POLL_MS = 100
+
+# 工作进程中的消息队列和取消标志，由进程池的 initializer 设置
+_messages = None
+_cancel = None
+
+
+# ----------------------------------------------------------------------
+# 工作进程中执行
+# ----------------------------------------------------------------------
+def _init_worker(messages, cancel):
+    global _messages, _cancel
+    _messages = messages
+    _cancel = cancel
+
+
+def _report_progress(job_id):
+    def progress(done, total):
+        _messages.put(("progress", job_id, done, total))
+    return progress
+
+
+def _run_job(job_id, in_path, out_path, config):
+    """格式化单个文件，返回 (job_id, 状态, 错误信息)，状态为 ok / failed / cancelled"""
+    from wordtool.core.formatter import WordFormatter
+
+    if _cancel.is_set():
+        return job_id, "cancelled", None
+    _messages.put(("start", job_id, 0, None))
+    try:
+        formatter = WordFormatter(in_path, config)
+    except Exception as e:  # 配置错误等
+        return job_id, "failed", f"{type(e).__name__}: {e}"
+    formatter.progress = _report_progress(job_id)
+    formatter.cancel_event = _cancel
+    if formatter.save(out_path):
+        return job_id, "ok", None
+    if formatter.cancelled:
+        return job_id, "cancelled", None
+    return job_id, "failed", formatter.last_error
+
+
+# ----------------------------------------------------------------------
+# 界面线程
+# ----------------------------------------------------------------------
+class JobRunner:
+    """
+    在进程池中运行一批格式化任务，回调都在界面线程中执行：
+    on_start(job_id)、on_progress(job_id, done, total)、
+    on_done(job_id, status, error)、on_finished()
+    """
+
+    def __init__(self, root, on_start, on_progress, on_done, on_finished):
+        self.root = root
+        self.on_start = on_start
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_finished = on_finished
+        self._executor = None
+        self._futures = {}
+        self._messages = None
+        self._cancel = None
+
+    @property
+    def running(self):
+        return self._executor is not None
+
+    def start(self, jobs, config: dict, workers=1):
+        """jobs: [(输入文件, 输出文件)]，任务编号即列表下标"""
+        if self.running:
+            raise RuntimeError("上一批任务尚未结束")
+        self._messages = multiprocessing.Queue()
+        self._cancel = multiprocessing.Event()
+        self._executor = ProcessPoolExecutor(
+            max_workers=max(1, min(workers, len(jobs))),
+            initializer=_init_worker,
+            initargs=(self._messages, self._cancel),
+        )
+        self._futures = {
+            self._executor.submit(_run_job, job_id, in_path, out_path, config): job_id
+            for job_id, (in_path, out_path) in enumerate(jobs)
+        }
+        self.root.after(_POLL_MS, self._poll)
+
+    def cancel(self):
+        if not self.running:
+            return
+        self._cancel.set()
+        for future in self._futures:
+            future.cancel()  # 只能撤销尚未开始的任务
+
+    def shutdown(self):
+        """退出程序时调用：取消全部任务并关闭进程池，不等待正在处理的文件"""
+        if not self.running:
+            return
+        self._cancel.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self._futures = {}
+        self._messages = None
+        self._cancel = None
+
+    def _drain_messages(self):
+        while True:
+            try:
+                kind, job_id, done, total = self._messages.get_nowait()
+            except queue.Empty:
+                return
+            if kind == "start":
+                self.on_start(job_id)
+            else:
+                self.on_progress(job_id, done, total)
+
+    def _poll(self):
+        if not self.running:  # 已经 shutdown()
+            return
+        self._drain_messages()
+
+        for future in [f for f in self._futures if f.done()]:
+            job_id = self._futures.pop(future)
+            if future.cancelled():
+                self.on_done(job_id, "cancelled", None)
+                continue
+            try:
+                _, status, error = future.result()
+            except Exception as e:  # 工作进程崩溃等
+                status, error = "failed", f"{type(e).__name__}: {e}"
+            self.on_done(job_id, status, error)
+
+        if self._futures:
+            self.root.after(_POLL_MS, self._poll)
+            return
+
+        self._executor.shutdown(wait=False)
+        self._executor = None
+        self._messages = None
+        self._cancel = None
+        self.on_finished()
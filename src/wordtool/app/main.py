@@ -1,7 +1,10 @@
-from wordtool.app.ui_components import WordFormatterUI
-from wordtool.app.event_handlers import EventHandlers
-
+import multiprocessing
 import sys,os
+
+# 界面模块（tkinter）在 main() 中才导入：
+# 打包后的 exe 每启动一个工作进程都会先执行到这里，工作进程不需要界面
+
+
 def resource_path(relative_path: str) -> str:
     """
     获取资源的绝对路径
@@ -14,6 +17,14 @@ def resource_path(relative_path: str) -> str:
     return os.path.join(base_path, relative_path)
 
 def main():
+    # 打包成 exe 后，后台任务的工作进程也从这里启动
+    multiprocessing.freeze_support()
+
+    from wordtool.app.event_handlers import EventHandlers
+    from wordtool.app.ui_components import WordFormatterUI
+    from wordtool.log import setup_logging
+
+    setup_logging()
     ui = WordFormatterUI()
     handlers = EventHandlers(ui)
     ui.run()
@@ -1,4 +1,5 @@
 import json
+import logging
 import os
 import sys
 import tkinter as tk
@@ -6,6 +7,9 @@ from tkinter import ttk
 from pathlib import Path
 from ..config import ConfigManager
 from ..config import CONFIG_PATH
+from ..core.matcher import TITLE_FORMATS
+
+logger = logging.getLogger(__name__)
 
 
 def resource_path(relative_path: str) -> str:
@@ -31,14 +35,10 @@ class WordFormatterUI:
         if os.path.exists(icon_path):
             self.root.iconbitmap(icon_path)
         else:
-            print(f"图标文件不存在: {icon_path}")
+            logger.warning("图标文件不存在: %s", icon_path)
 
-        # 可识别标题格式
-        self.title_formats = [
-            "一", "一、", "（一）", "（一）、", "（一）.",
-            "（1）", "（1）、", "（1）.", "1", "1.", "1、",
-            "a", "a.", "A", "A.", "①", "I", "I.", "（I）"
-        ]
+        # 可识别标题格式（内置格式 + 配置中的自定义格式）
+        self.title_formats = list(TITLE_FORMATS)
 
         # 字号映射
         self.font_size_map = {
@@ -57,6 +57,7 @@ class WordFormatterUI:
 
         # 加载配置
         self.config_data = self._load_config()
+        self.title_formats += list(self.config_data.get("custom_formats", {}))
 
         # 构建UI
         self._build_ui()
@@ -218,12 +219,70 @@ class WordFormatterUI:
         self.btn_output = ttk.Button(left_btn_frame, text="输出路径")
         self.btn_output.pack(side="left", padx=5)
 
+        # 同时处理的文件数
+        ttk.Label(left_btn_frame, text="并行数").pack(side="left", padx=(15, 2))
+        self.workers = ttk.Spinbox(left_btn_frame, from_=1, to=os.cpu_count() or 1, width=4)
+        self.workers.pack(side="left", padx=2)
+
         # 右侧按钮
         right_btn_frame = ttk.Frame(bottom)
         right_btn_frame.grid(row=0, column=1, sticky="e")
 
         self.btn_start = ttk.Button(right_btn_frame, text="开始格式化", width=20)
         self.btn_start.pack(side="right", padx=5)
+        self.btn_cancel = ttk.Button(right_btn_frame, text="取消", state="disabled")
+        self.btn_cancel.pack(side="right", padx=5)
+
+        self._build_progress(parent)
+
+    # 进度：总进度 + 每个并行槽位一条进度条
+    def _build_progress(self, parent):
+        pf = ttk.LabelFrame(parent, text="处理进度", padding=10)
+        pf.grid(row=2, column=0, columnspan=2, sticky="ew")
+        pf.grid_columnconfigure(1, weight=1)
+
+        self.overall_label = ttk.Label(pf, text="未开始", width=40)
+        self.overall_label.grid(row=0, column=0, sticky="w")
+        self.overall_bar = ttk.Progressbar(pf, mode="determinate")
+        self.overall_bar.grid(row=0, column=1, sticky="ew", padx=5)
+
+        self.slot_frame = ttk.Frame(pf)
+        self.slot_frame.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(5, 0))
+        self.slot_frame.grid_columnconfigure(1, weight=1)
+        self.slots = []
+
+    def reset_progress(self, slot_count, total_files):
+        """开始新一批任务：重建 slot_count 个文件进度条"""
+        for widget in self.slot_frame.winfo_children():
+            widget.destroy()
+        self.slots = []
+        for i in range(slot_count):
+            label = ttk.Label(self.slot_frame, text="", width=40)
+            label.grid(row=i, column=0, sticky="w")
+            bar = ttk.Progressbar(self.slot_frame, mode="determinate")
+            bar.grid(row=i, column=1, sticky="ew", padx=5, pady=2)
+            self.slots.append((label, bar))
+        self.set_overall(0, total_files)
+
+    def set_overall(self, finished, total_files, text=None):
+        self.overall_bar.configure(maximum=max(total_files, 1), value=finished)
+        self.overall_label.configure(text=text or f"已完成 {finished} / {total_files} 个文件")
+
+    def set_slot(self, slot, name, done=0, total=None):
+        """total 未知（流式引擎）时进度条改为往复滚动"""
+        label, bar = self.slots[slot]
+        if total:
+            bar.configure(mode="determinate", maximum=total, value=done)
+            label.configure(text=f"{name}（{done}/{total} 段）")
+        else:
+            bar.configure(mode="indeterminate")
+            bar.step(5)
+            label.configure(text=f"{name}（{done} 段）")
+
+    def clear_slot(self, slot):
+        label, bar = self.slots[slot]
+        label.configure(text="")
+        bar.configure(mode="determinate", value=0)
 
     # ---------------------- 填充配置 ----------------------
     def _apply_config_to_ui(self):
@@ -256,6 +315,9 @@ class WordFormatterUI:
         self.caption_spacing.delete(0, "end")
         self.caption_spacing.insert(0, caption_cfg.get("spacing", "1.25"))
 
+        # 并行数
+        self.workers.set(cfg.get("workers", min(4, os.cpu_count() or 1)))
+
     def get_config(self):
         cfg = {
             "titles": {},
@@ -263,6 +325,11 @@ class WordFormatterUI:
             "caption": {}
         }
 
+        # 界面不编辑的配置项（自定义编号格式、stage 开关等）原样保留
+        for key, value in self.config_data.items():
+            if key not in cfg:
+                cfg[key] = value
+
         # 标题 1-4
         for key, w in self.title_widgets.items():
             cfg["titles"][key] = {
@@ -290,6 +357,11 @@ class WordFormatterUI:
             "spacing": self.caption_spacing.get()
         }
 
+        try:
+            cfg["workers"] = max(1, int(self.workers.get()))
+        except ValueError:
+            cfg["workers"] = 1
+
         return cfg
 
     def run(self):
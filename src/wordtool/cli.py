@@ -0,0 +1,347 @@
+"""
+命令行入口：python -m wordtool <命令>
+
+    gui                                   启动图形界面（默认）
+    format IN OUT [--profile ...]         格式化单个文件（- 表示标准输入/输出），可输出各阶段耗时
+    batch IN_DIR OUT_DIR [--config ...]   批量格式化整个目录
+    analyze PATH... [--config ...]        只识别标题/图表标题，输出 JSON 报告，不写文件
+    verify IN OUT [--config ...]          校验输出与输入的文字、图片、表格结构一致，输出 JSON 报告
+    serve [--port ... | --unix PATH]      常驻格式化服务（HTTP，工作进程池预热）
+    watch DIR [--config ...]              监视目录，放入的 .docx 自动格式化（输出为 格式化_原名.docx）
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+# 退出码
+EXIT_OK = 0          # 全部成功
+EXIT_FAILED = 1      # 存在处理失败的文件
+EXIT_USAGE = 2       # 参数或配置错误、没有可处理的文件
+
+
+def _load_config(path):
+    from wordtool.config import ConfigManager
+
+    if path:
+        return ConfigManager.load_config_file(path)
+    return ConfigManager.load_config()
+
+
+# ----------------------------------------------------------------------
+# gui
+# ----------------------------------------------------------------------
+def cmd_gui(args):
+    from wordtool.app.main import main as gui_main
+
+    gui_main()
+    return EXIT_OK
+
+
+# ----------------------------------------------------------------------
+# format
+# ----------------------------------------------------------------------
+def _write_json(path, data):
+    text = json.dumps(data, ensure_ascii=False, indent=2)
+    if path == "-":
+        print(text)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+def cmd_format(args):
+    from wordtool.core.formatter import WordFormatter
+    from wordtool.core.instrument import Instrumentation
+
+    if args.output == "-" and args.profile == "-":
+        print("输出文件为 - 时 --profile 不能输出到标准输出", file=sys.stderr)
+        return EXIT_USAGE
+    # "-" 表示从标准输入读取 / 写到标准输出，全程不落盘
+    source = io.BytesIO(sys.stdin.buffer.read()) if args.input == "-" else args.input
+    output = sys.stdout.buffer if args.output == "-" else args.output
+
+    try:
+        config = _load_config(args.config)
+        if args.verify:
+            config["verify"] = True
+        formatter = WordFormatter(source, config)
+    except (OSError, ValueError) as e:
+        print(f"配置文件无效：{e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    if args.profile:
+        formatter.instrument = Instrumentation()
+    profiler = None
+    if args.cprofile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    start = time.perf_counter()
+    ok = formatter.save(output)
+    seconds = time.perf_counter() - start
+
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.cprofile)
+    if args.profile:
+        report = {
+            "file": args.input,
+            "output": args.output,
+            "status": "ok" if ok else "failed",
+            "seconds": round(seconds, 6),
+        }
+        report.update(formatter.instrument.report())
+        _write_json(args.profile, report)
+
+    if not ok:
+        print(f"处理失败：{formatter.last_error}", file=sys.stderr)
+        return EXIT_FAILED
+    return EXIT_OK
+
+
+# ----------------------------------------------------------------------
+# batch
+# ----------------------------------------------------------------------
+def _print_result(result):
+    # 每个文件一行，制表符分隔：状态 耗时 段落数 输入文件 [错误信息]
+    fields = [result.status, f"{result.seconds:.3f}s", str(result.paragraphs), result.path]
+    if result.error:
+        fields.append(result.error)
+    print("\t".join(fields), flush=True)
+
+
+def cmd_batch(args):
+    from wordtool.core.batch import run_batch
+
+    try:
+        config = _load_config(args.config)
+    except (OSError, ValueError) as e:
+        print(f"配置文件无效：{e}", file=sys.stderr)
+        return EXIT_USAGE
+    if args.cache:
+        config["cache"] = dict(config.get("cache") or {}, path=args.cache)
+    if args.verify:
+        config["verify"] = True
+
+    results = run_batch(
+        args.in_dir, args.out_dir, config,
+        jobs=args.jobs,
+        max_tasks_per_child=args.max_tasks_per_child,
+        timeout=args.timeout,
+        max_size=int(args.max_size_mb * 1024 * 1024) if args.max_size_mb else None,
+        on_result=_print_result,
+    )
+    if not results:
+        print(f"没有找到 .docx 文件：{args.in_dir}", file=sys.stderr)
+        return EXIT_USAGE
+
+    failed = sum(1 for r in results if r.status != "ok")
+    print(f"完成：{len(results) - failed} 成功，{failed} 失败/跳过", file=sys.stderr)
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+# ----------------------------------------------------------------------
+# analyze
+# ----------------------------------------------------------------------
+def cmd_analyze(args):
+    from wordtool.core.batch import analyze_documents
+
+    try:
+        config = _load_config(args.config)
+    except (OSError, ValueError) as e:
+        print(f"配置文件无效：{e}", file=sys.stderr)
+        return EXIT_USAGE
+    if args.cache:
+        config["cache"] = dict(config.get("cache") or {}, path=args.cache)
+
+    # 每个文件一行 JSON（JSON Lines），便于流水线逐行处理
+    count = failed = 0
+    for report in analyze_documents(args.paths, config, include_body=args.all, jobs=args.jobs):
+        count += 1
+        if "error" in report:
+            failed += 1
+        print(json.dumps(report, ensure_ascii=False, indent=args.indent), flush=True)
+
+    if not count:
+        print("没有找到 .docx 文件", file=sys.stderr)
+        return EXIT_USAGE
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+# ----------------------------------------------------------------------
+# verify
+# ----------------------------------------------------------------------
+def cmd_verify(args):
+    from wordtool.core.verify import verify_documents
+
+    try:
+        config = _load_config(args.config)
+    except (OSError, ValueError) as e:
+        print(f"配置文件无效：{e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    try:
+        report = verify_documents(args.input, args.output, config, expand_numbering=not args.no_numbering)
+    except Exception as e:
+        print(f"无法校验：{type(e).__name__}: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    print(json.dumps(report, ensure_ascii=False, indent=args.indent), flush=True)
+    return EXIT_OK if report["ok"] else EXIT_FAILED
+
+
+# ----------------------------------------------------------------------
+# serve
+# ----------------------------------------------------------------------
+def cmd_serve(args):
+    from wordtool.core.server import FormatServer, load_config_dir, serve
+
+    try:
+        config = _load_config(args.config)
+        configs = load_config_dir(args.config_dir) if args.config_dir else {}
+    except (OSError, ValueError) as e:
+        print(f"配置文件无效：{e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    server = FormatServer(
+        config, configs,
+        workers=args.workers,
+        max_queue=args.max_queue,
+        timeout=args.timeout or None,
+        max_size=int(args.max_size_mb * 1024 * 1024),
+        max_tasks_per_child=args.max_tasks_per_child,
+    )
+    serve(server, args.host, args.port, args.unix)
+    return EXIT_OK
+
+
+# ----------------------------------------------------------------------
+# watch
+# ----------------------------------------------------------------------
+def cmd_watch(args):
+    from wordtool.core.watch import FolderWatcher, watch
+
+    try:
+        config = _load_config(args.config)
+    except (OSError, ValueError) as e:
+        print(f"配置文件无效：{e}", file=sys.stderr)
+        return EXIT_USAGE
+    if args.verify:
+        config["verify"] = True
+    if not os.path.isdir(args.dir):
+        print(f"目录不存在：{args.dir}", file=sys.stderr)
+        return EXIT_USAGE
+
+    folder = FolderWatcher(
+        args.dir, config,
+        out_dir=args.out_dir,
+        jobs=args.jobs,
+        settle=args.settle,
+        polling=args.poll,
+        timeout=args.timeout,
+        max_tasks_per_child=args.max_tasks_per_child,
+        on_result=_print_result,
+    )
+    watch(folder)
+    return EXIT_OK
+
+
+# ----------------------------------------------------------------------
+# 参数解析
+# ----------------------------------------------------------------------
+def build_parser():
+    parser = argparse.ArgumentParser(prog="wordtool", description="Word 一键规范化排版工具")
+    parser.add_argument("--log-level", default="INFO",
+                        choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="日志级别，默认 INFO")
+    parser.add_argument("--log-json", action="store_true", help="日志以 JSON 行输出（写到 stderr）")
+    sub = parser.add_subparsers(dest="command")
+
+    p_gui = sub.add_parser("gui", help="启动图形界面")
+    p_gui.set_defaults(func=cmd_gui)
+
+    p_format = sub.add_parser("format", help="格式化单个 .docx 文件")
+    p_format.add_argument("input", help="输入文件，- 表示标准输入")
+    p_format.add_argument("output", help="输出文件，- 表示标准输出")
+    p_format.add_argument("--config", help="JSON 配置文件，默认使用界面保存的配置")
+    p_format.add_argument("--profile", metavar="JSON",
+                          help="写出各阶段/stage 的耗时、计数和峰值内存（- 表示输出到终端）")
+    p_format.add_argument("--cprofile", metavar="FILE", help="同时写出 cProfile 数据（可用 snakeviz 等查看）")
+    p_format.add_argument("--verify", action="store_true", help="写出后校验输出结构，不通过时视为失败")
+    p_format.set_defaults(func=cmd_format)
+
+    p_batch = sub.add_parser("batch", help="批量格式化目录下的所有 .docx")
+    p_batch.add_argument("in_dir", help="输入目录（递归查找 .docx）")
+    p_batch.add_argument("out_dir", help="输出目录，保持相对路径")
+    p_batch.add_argument("--config", help="JSON 配置文件，默认使用界面保存的配置")
+    p_batch.add_argument("--jobs", "-j", type=int, default=None, help="工作进程数，默认 CPU 核数")
+    p_batch.add_argument("--max-tasks-per-child", type=int, default=None,
+                         help="每个工作进程处理多少个文件后重建")
+    p_batch.add_argument("--timeout", type=float, default=None, help="单个文件超时秒数")
+    p_batch.add_argument("--max-size-mb", type=float, default=None, help="单个文件大小上限（MB）")
+    p_batch.add_argument("--cache", help="段落分类缓存文件（sqlite），重复处理同一批文档时更快")
+    p_batch.add_argument("--verify", action="store_true", help="逐个校验输出结构，不通过的文件记为失败并删除输出")
+    p_batch.set_defaults(func=cmd_batch)
+
+    p_analyze = sub.add_parser("analyze", help="分析标题/图表标题识别结果，不写文件")
+    p_analyze.add_argument("paths", nargs="+", help=".docx 文件或目录（递归查找）")
+    p_analyze.add_argument("--config", help="JSON 配置文件，默认使用界面保存的配置")
+    p_analyze.add_argument("--all", action="store_true", help="列出全部段落（默认只列出标题和图表标题）")
+    p_analyze.add_argument("--jobs", "-j", type=int, default=1, help="工作进程数，默认 1")
+    p_analyze.add_argument("--indent", type=int, default=None, help="JSON 缩进（默认每个文件一行）")
+    p_analyze.add_argument("--cache", help="段落分类缓存文件（sqlite）")
+    p_analyze.set_defaults(func=cmd_analyze)
+
+    p_verify = sub.add_parser("verify", help="校验格式化输出与输入的结构一致（文字、图片、表格）")
+    p_verify.add_argument("input", help="原始 .docx")
+    p_verify.add_argument("output", help="格式化后的 .docx")
+    p_verify.add_argument("--config", help="格式化时使用的 JSON 配置文件，默认使用界面保存的配置")
+    p_verify.add_argument("--no-numbering", action="store_true",
+                          help="输入已是展开自动编号后的文件（numbering_backend 为 com 时）")
+    p_verify.add_argument("--indent", type=int, default=None, help="JSON 缩进（默认一行）")
+    p_verify.set_defaults(func=cmd_verify)
+
+    p_serve = sub.add_parser("serve", help="常驻格式化服务（POST /format 上传 .docx）")
+    p_serve.add_argument("--host", default="127.0.0.1", help="监听地址，默认 127.0.0.1")
+    p_serve.add_argument("--port", type=int, default=8765, help="监听端口，默认 8765（0 表示随机端口）")
+    p_serve.add_argument("--unix", metavar="PATH", help="改为监听 Unix socket")
+    p_serve.add_argument("--config", help="默认配置（JSON 文件），默认使用界面保存的配置")
+    p_serve.add_argument("--config-dir", help="命名配置目录：ID.json 可用 /format?config=ID 引用")
+    p_serve.add_argument("--workers", "-j", type=int, default=None, help="工作进程数，默认 CPU 核数")
+    p_serve.add_argument("--max-queue", type=int, default=64, help="排队请求数上限，超过返回 503，默认 64")
+    p_serve.add_argument("--timeout", type=float, default=120, help="单个文档处理超时秒数，0 表示不限，默认 120")
+    p_serve.add_argument("--max-size-mb", type=float, default=100, help="上传文件大小上限（MB），默认 100")
+    p_serve.add_argument("--max-tasks-per-child", type=int, default=None,
+                         help="每个工作进程处理多少个文档后重建")
+    p_serve.set_defaults(func=cmd_serve)
+
+    p_watch = sub.add_parser("watch", help="监视目录，放入的 .docx 自动格式化")
+    p_watch.add_argument("dir", help="监视的目录（不含子目录）")
+    p_watch.add_argument("--config", help="JSON 配置文件，默认使用界面保存的配置")
+    p_watch.add_argument("--out-dir", help="输出目录，默认与监视目录相同")
+    p_watch.add_argument("--jobs", "-j", type=int, default=None, help="工作进程数，默认 CPU 核数")
+    p_watch.add_argument("--settle", type=float, default=1.0,
+                         help="文件持续多少秒不变后才处理（等待复制/保存完成），默认 1")
+    p_watch.add_argument("--poll", action="store_true", help="不使用 inotify，改为定时扫描（如网络共享目录）")
+    p_watch.add_argument("--timeout", type=float, default=None, help="单个文件超时秒数")
+    p_watch.add_argument("--max-tasks-per-child", type=int, default=None,
+                         help="每个工作进程处理多少个文件后重建")
+    p_watch.add_argument("--verify", action="store_true", help="逐个校验输出结构，不通过的文件记为失败")
+    p_watch.set_defaults(func=cmd_watch)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    from wordtool.log import setup_logging
+
+    setup_logging(args.log_level, args.log_json)
+    if args.command is None:
+        return cmd_gui(args)
+    return args.func(args)
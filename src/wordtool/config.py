@@ -1,25 +1,116 @@
 import json
+import logging
 from pathlib import Path
 
+from wordtool.core.matcher import TITLE_FORMATS, compile_custom_formats
+
+logger = logging.getLogger(__name__)
+
 # JSON 配置文件路径
 CONFIG_PATH = Path(__file__).resolve().parent / "resources" / "ui_config.json"
 
+# 标题 / 正文 / 图表标题配置中各字段允许的类型
+_STYLE_FIELDS = {
+    "format": str,
+    "font": str,
+    "size": str,
+    "bold": (bool, int),
+    "line_rule": str,
+    "spacing": (int, float, str),
+}
+
+
+def _check_style(name, value, errors):
+    if not isinstance(value, dict):
+        errors.append(f"{name} 必须是对象")
+        return
+    for key, types in _STYLE_FIELDS.items():
+        if key in value and not isinstance(value[key], types):
+            errors.append(f"{name}.{key} 类型错误")
+    if isinstance(value.get("spacing"), str):
+        try:
+            float(value["spacing"])
+        except ValueError:
+            errors.append(f"{name}.spacing 不是数字")
+
+
+def check_config_shape(config: dict):
+    """检查 titles / body / caption / custom_formats 的结构和字段类型，不合法时抛出 ValueError"""
+    errors = []
+    titles = config.get("titles", {})
+    if not isinstance(titles, dict):
+        errors.append("titles 必须是对象")
+    else:
+        for level in range(1, 5):
+            key = f"title{level}"
+            if key in titles:
+                _check_style(f"titles.{key}", titles[key], errors)
+    for section in ("body", "caption"):
+        if section in config:
+            _check_style(section, config[section], errors)
+    custom = config.get("custom_formats")
+    if custom is not None and not isinstance(custom, dict):
+        errors.append("custom_formats 必须是对象")
+    if errors:
+        raise ValueError("配置格式无效：" + "；".join(errors))
+
+
+def _unknown_title_formats(config: dict):
+    """titleN.format 既不是内置格式也不是自定义格式的标题：[(titleN, 格式名)]"""
+    known = set(TITLE_FORMATS) | set(config.get("custom_formats") or {})
+    unknown = []
+    for key, style in config.get("titles", {}).items():
+        fmt = style.get("format", "") if isinstance(style, dict) else ""
+        if fmt and fmt not in known:
+            unknown.append((key, fmt))
+    return unknown
+
+
+def _drop_invalid_custom_formats(config: dict):
+    """逐个校验自定义编号格式，去掉无效的并记录警告，其余保留"""
+    custom = config.get("custom_formats")
+    if not custom:
+        return
+    valid = {}
+    for name, pattern in custom.items():
+        try:
+            valid.update(compile_custom_formats({name: pattern}))
+        except ValueError as e:
+            logger.warning("%s，已忽略", e)
+    config["custom_formats"] = valid
+
 
 class ConfigManager:
     @staticmethod
     def load_config():
         """
         从 ui_config.json 读取配置；
-        若不存在或 JSON 错误，则返回默认配置。
+        若不存在、无法读取或结构不对，记录警告并返回默认配置。
+        无效的自定义编号格式单独去掉，引用未定义格式的标题恢复为默认格式，其余设置保留。
         """
-        if CONFIG_PATH.exists():
-            try:
-                with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except Exception:
-                pass  # JSON 错误则重置为默认配置
+        if not CONFIG_PATH.exists():
+            return ConfigManager.default_config()
+        try:
+            with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+                config = json.load(f)
+            if not isinstance(config, dict):
+                raise ValueError("配置必须是 JSON 对象")
+            check_config_shape(config)
+        except (OSError, ValueError) as e:
+            logger.warning("无法读取配置 %s，使用默认配置：%s", CONFIG_PATH, e)
+            return ConfigManager.default_config()
 
-        # ========== 默认配置结构 ==========
+        _drop_invalid_custom_formats(config)
+        defaults = ConfigManager.default_config()["titles"]
+        for key, fmt in _unknown_title_formats(config):
+            default = defaults.get(key, {}).get("format", "")
+            logger.warning("%s 的编号格式未定义：%s，改用默认格式 %s", key, fmt, default or "（无）")
+            config["titles"][key]["format"] = default
+        return config
+
+    @staticmethod
+    def default_config():
+        """默认配置"""
         return {
             "titles": {
                 "title1": {"format": "一、", "font": "黑体", "size": "四号 (14pt)", "bold": False},
@@ -43,6 +134,31 @@ class ConfigManager:
             }
         }
 
+    @staticmethod
+    def load_config_file(path):
+        """
+        从指定的 JSON 文件读取配置（命令行 --config 使用）。
+        与 load_config 不同，文件不存在或格式错误时直接抛出异常。
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            return ConfigManager.validate_config(json.load(f))
+
+    @staticmethod
+    def validate_config(config: dict):
+        """
+        加载时校验配置：各部分的结构和字段类型不对、自定义编号格式 "custom_formats"
+        （{格式名: 以 ^ 开头的正则}）无法编译，或 titleN.format 引用了未定义的格式时
+        直接抛出 ValueError，而不是等到逐段匹配时才出错。
+        """
+        if not isinstance(config, dict):
+            raise ValueError("配置必须是 JSON 对象")
+        check_config_shape(config)
+        compile_custom_formats(config.get("custom_formats"))
+        unknown = _unknown_title_formats(config)
+        if unknown:
+            raise ValueError("标题编号格式未定义：" + "；".join(f"{key}: {fmt}" for key, fmt in unknown))
+        return config
+
     @staticmethod
     def save_config(config: dict):
         """
@@ -0,0 +1,38 @@
+"""
+业务代码（Word 处理逻辑），不依赖图形界面和 Word COM。
+
+常用对象可以直接从包中导入，首次访问时才加载对应模块（python-docx、lxml 较重）：
+
+    from wordtool.core import WordFormatter
+"""
+from importlib import import_module
+
+# 名称 -> 所在模块
+_EXPORTS = {
+    "WordFormatter": "formatter",
+    "FormatError": "formatter",
+    "format_bytes": "formatter",
+    "format_stream": "formatter",
+    "FormatCancelled": "pipeline",
+    "Instrumentation": "instrument",
+    "TitleMatcher": "matcher",
+    "TITLE_FORMATS": "matcher",
+    "run_batch": "batch",
+    "analyze_documents": "batch",
+    "FormatServer": "server",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{module}", __name__), name)
+    globals()[name] = value  # 之后直接命中，不再经过 __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
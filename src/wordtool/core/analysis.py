@@ -0,0 +1,120 @@
+"""
+分析模式（dry-run）：只做文本层面的处理，不写任何文件。
+
+直接从 zip 中读取 document.xml / numbering.xml / styles.xml，
+执行 自动编号展开 -> 编号空格清理 -> 标题等级识别 -> 图题/表题判断，
+跳过所有样式写入和 .docx 重新打包，返回一份紧凑的报告（可直接序列化为 JSON）：
+
+    {
+        "file": "...",
+        "paragraphs": 段落数,
+        "levels": [正文数, 一级标题数, ..., 四级标题数],
+        "captions": {"figure": 图题数, "table": 表题数},
+        "numbering_expanded": 展开的自动编号段落数,
+        "seconds": {"load": ..., "numbering": ..., "classify": ..., "total": ...},
+        "columns": ["index", "level", "prefix", "caption"],
+        "items": [[段落序号, 标题等级, 匹配到的编号, "figure"/"table"/null], ...]
+    }
+
+items 默认只列出标题和图表标题，include_body=True 时列出全部段落。
+"""
+import time
+import zipfile
+
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml.ns import qn
+from docx.oxml.parser import parse_xml
+
+from .blocks import BlockModel
+from .index import DocumentIndex
+from .numbering import NumberingExpander
+from .package import read_rels
+from .textedit import paragraph_text
+
+COLUMNS = ["index", "level", "prefix", "caption"]
+
+
+def _read_part(zin, name):
+    if not name:
+        return None
+    try:
+        return parse_xml(zin.read(name))
+    except KeyError:
+        return None
+
+
+def analyze_document(formatter, include_body=False):
+    """按 formatter 的配置分析 formatter.file_path，返回报告字典"""
+    start = time.perf_counter()
+    switches = formatter.config.get("stages", {}) or {}
+
+    # ----------------- 1. 只解析需要的部件 -----------------
+    with zipfile.ZipFile(formatter.file_path) as zin:
+        main_part = read_rels(zin, None).get(RT.OFFICE_DOCUMENT, "word/document.xml")
+        doc_rels = read_rels(zin, main_part)
+        document = _read_part(zin, main_part)
+        if document is None:
+            raise ValueError(f"文档中没有找到主文档部件：{main_part}")
+        styles_element = _read_part(zin, doc_rels.get(RT.STYLES))
+        numbering_element = _read_part(zin, doc_rels.get(RT.NUMBERING))
+    body = document.find(qn("w:body"))
+    if body is None:
+        raise ValueError("文档中没有正文（w:body）")
+    loaded = time.perf_counter()
+
+    # ----------------- 2. 展开自动编号（只改内存中的树） -----------------
+    expanded = 0
+    if numbering_element is not None:
+        expanded = NumberingExpander(numbering_element, styles_element).expand_tree(body)
+    numbered = time.perf_counter()
+
+    # ----------------- 3. 编号空格清理、标题等级、图表标题 -----------------
+    formatter.doc_index = DocumentIndex.build(body)
+    formatter.blocks = BlockModel.build(body, formatter.doc_index)
+
+    levels = [0] * 5
+    captions = {"figure": 0, "table": 0}
+    items = []
+    index = -1
+    p_tag = qn("w:p")
+    for block, elm in enumerate(body.iterchildren()):
+        if elm.tag != p_tag:
+            continue
+        index += 1
+        text = paragraph_text(elm)
+        if switches.get("clean_numbering", True) and text.strip():
+            text = formatter._clean_numbering_text(text)
+
+        level, prefix = 0, None
+        if switches.get("style", True):
+            normalized, m = formatter._match_title(text)
+            if m is not None:
+                level, prefix = m.level, normalized[m.span[0]:m.span[1]]
+        formatter.blocks.levels[block] = level
+        levels[level] += 1
+
+        caption = None
+        if switches.get("captions", True):
+            caption = formatter._caption_kind(text, block)
+            if caption is not None:
+                captions[caption] += 1
+
+        if include_body or level or caption:
+            items.append([index, level, prefix, caption])
+    done = time.perf_counter()
+
+    return {
+        "file": str(formatter.file_path),
+        "paragraphs": index + 1,
+        "levels": levels,
+        "captions": captions,
+        "numbering_expanded": expanded,
+        "seconds": {
+            "load": round(loaded - start, 6),
+            "numbering": round(numbered - loaded, 6),
+            "classify": round(done - numbered, 6),
+            "total": round(done - start, 6),
+        },
+        "columns": COLUMNS,
+        "items": items,
+    }
@@ -0,0 +1,339 @@
+"""
+无界面的批量格式化：把目录下的 .docx 分发到进程池中并行处理。
+批量分析（analyze）同样在这里分发。
+"""
+import glob
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# 单个文件的处理结果
+# status: "ok" / "failed" / "skipped"
+BatchResult = namedtuple("BatchResult", "path output status seconds paragraphs error")
+
+
+class FormatTimeout(Exception):
+    """单个文件处理超时"""
+
+
+def find_documents(in_dir):
+    """
+    递归查找 in_dir 下的 .docx 文件，跳过 Word 的锁文件（~$*.docx）。
+    """
+    return sorted(
+        p for p in Path(in_dir).rglob("*.docx")
+        if p.is_file() and not p.name.startswith("~$")
+    )
+
+
+# ----------------------------------------------------------------------
+# 子进程中执行
+# ----------------------------------------------------------------------
+def _on_timeout(signum, frame):
+    raise FormatTimeout("处理超时")
+
+
+def temp_path(out_path):
+    """out_path 同目录下本进程使用的隐藏临时文件（不以 .docx 结尾，不会被当作输入）"""
+    directory, name = os.path.split(out_path)
+    return os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+
+
+def _format_one(in_path, out_path, config, timeout):
+    """
+    在工作进程中格式化单个文件，返回 BatchResult。
+    支持 SIGALRM 的平台上由子进程自行中断超时任务。
+    先写入同目录的临时文件，成功后 os.replace 为 out_path：超时、崩溃时不会留下不完整的输出。
+    in_path 也可以是文件对象（见 watch.py）。
+    """
+    from .formatter import WordFormatter
+
+    start = time.perf_counter()
+    tmp_path = temp_path(out_path)
+    use_alarm = bool(timeout) and hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        formatter = WordFormatter(in_path, config)
+        os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+        ok = formatter.save(tmp_path)
+        if ok:
+            os.replace(tmp_path, out_path)
+        error = None if ok else formatter.last_error
+        paragraphs = formatter.paragraph_count
+    except Exception as e:
+        ok, error, paragraphs = False, f"{type(e).__name__}: {e}", 0
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return BatchResult(
+        in_path, out_path, "ok" if ok else "failed",
+        time.perf_counter() - start, paragraphs, error,
+    )
+
+
+def _analyze_one(in_path, config, include_body):
+    """在工作进程中分析单个文件，失败时返回 {"file": ..., "error": ...}"""
+    from .formatter import WordFormatter
+
+    try:
+        return WordFormatter(in_path, config).analyze(include_body)
+    except Exception as e:
+        return {"file": str(in_path), "error": f"{type(e).__name__}: {e}"}
+
+
+# 工作进程开始执行任务时向主进程报告的队列（见 WorkerPool）
+_started = None
+
+
+def _init_pool_worker(started, initializer, initargs):
+    global _started
+    _started = started
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _run_task(token, fn, args):
+    if _started is not None:
+        _started.put(token)
+    return fn(*args)
+
+
+# ----------------------------------------------------------------------
+# 主进程调度
+# ----------------------------------------------------------------------
+def _make_executor(jobs, max_tasks_per_child, **kwargs):
+    # kwargs 原样传给 ProcessPoolExecutor（如 initializer）
+    kwargs["max_workers"] = jobs
+    if max_tasks_per_child:
+        if sys.version_info >= (3, 11):
+            kwargs["max_tasks_per_child"] = max_tasks_per_child
+        else:
+            logger.warning("提示：Python 3.11 以下不支持按任务数回收工作进程，已忽略 --max-tasks-per-child")
+    return ProcessPoolExecutor(**kwargs)
+
+
+def grace_period(timeout):
+    """主进程兜底的超时：工作进程无法自行中断时（如 Windows、卡在 C 代码中），超过该时间即终止"""
+    return timeout * 1.5 + 5 if timeout else None
+
+
+class WorkerPool:
+    """
+    可以强行终止的进程池。
+
+    提交的任务在工作进程中真正开始执行时，通过队列向主进程报告，
+    hung() 据此找出执行时间超过 grace 的任务（仍在进程池队列中等待的任务不计时）。
+    卡住的工作进程无法撤回，restart() 终止本进程池自己的工作进程后换一个新的进程池，
+    不影响同一进程中的其他进程池。
+    track=False 时不报告开始时间（调用方自己计时，如 serve）。
+    """
+
+    def __init__(self, jobs, max_tasks_per_child=None, initializer=None, initargs=(), track=True):
+        self.jobs = jobs
+        self._options = (max_tasks_per_child, initializer, initargs, track)
+        self._start()
+
+    def _start(self):
+        max_tasks_per_child, initializer, initargs, track = self._options
+        self._started = multiprocessing.SimpleQueue() if track else None
+        self.executor = _make_executor(self.jobs, max_tasks_per_child, initializer=_init_pool_worker,
+                                       initargs=(self._started, initializer, initargs))
+        self._tokens = {}       # 任务编号 -> 尚未开始执行的 future
+        self._start_times = {}  # 已开始执行的 future -> 主进程收到报告的时间
+        self._next_token = 0
+
+    def submit(self, fn, *args):
+        token = self._next_token
+        self._next_token += 1
+        future = self.executor.submit(_run_task, token, fn, args)
+        if self._started is not None:
+            self._tokens[token] = future
+        return future
+
+    def hung(self, grace):
+        """开始执行后超过 grace 秒仍未完成的任务：[(future, 已执行秒数)]"""
+        self._collect()
+        now = time.monotonic()
+        hung = []
+        for future, started in list(self._start_times.items()):
+            if future.done():
+                del self._start_times[future]
+            elif now - started > grace:
+                hung.append((future, now - started))
+        return hung
+
+    def _collect(self):
+        if self._started is None:
+            return
+        now = time.monotonic()
+        while not self._started.empty():
+            future = self._tokens.pop(self._started.get(), None)
+            if future is not None and not future.done():
+                self._start_times[future] = now
+
+    def restart(self):
+        """终止全部工作进程（不等待运行中的任务），换一个新的进程池；未完成的 future 由调用方重新提交"""
+        self.terminate()
+        self._start()
+
+    def terminate(self):
+        # 只结束本进程池的工作进程：ProcessPoolExecutor 没有公开接口，取其 _processes（pid -> Process）。
+        # 先取字典本身再 shutdown：shutdown 会把属性置为 None，之前补充创建的进程也在字典中
+        processes = self.executor._processes or {}
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        workers = list(processes.values())
+        for process in workers:
+            process.terminate()
+        for process in workers:
+            process.join(5)
+        if self._started is not None:
+            self._started.close()
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+        if self._started is not None:
+            self._started.close()
+
+
+def run_batch(in_dir, out_dir, config: dict, jobs=None, max_tasks_per_child=None,
+              timeout=None, max_size=None, on_result=None):
+    """
+    批量格式化 in_dir 下的所有 .docx，按相对路径写入 out_dir。
+
+    jobs: 工作进程数，默认 CPU 核数
+    max_tasks_per_child: 每个工作进程处理多少个文件后重建（防止内存累积）
+    timeout: 单个文件超时秒数
+    max_size: 单个文件大小上限（字节），超过则跳过
+    on_result: 每完成一个文件回调一次 on_result(BatchResult)
+
+    返回全部 BatchResult 列表。
+    """
+    jobs = jobs or os.cpu_count() or 1
+    in_dir = Path(in_dir)
+    out_dir = Path(out_dir)
+    results = []
+
+    def emit(result):
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
+
+    tasks = []
+    for path in find_documents(in_dir):
+        out_path = out_dir / path.relative_to(in_dir)
+        if max_size and path.stat().st_size > max_size:
+            emit(BatchResult(str(path), str(out_path), "skipped", 0.0, 0,
+                             f"文件大小超过上限 {max_size} 字节"))
+            continue
+        tasks.append((str(path), str(out_path)))
+
+    if not tasks:
+        return results
+
+    grace = grace_period(timeout)
+    queue = deque(tasks)
+    pending = {}  # future -> 任务
+    pool = WorkerPool(jobs, max_tasks_per_child)
+
+    def submit_next():
+        if not queue:
+            return False
+        task = queue.popleft()
+        pending[pool.submit(_format_one, task[0], task[1], config, timeout)] = task
+        return True
+
+    def fill():
+        # 只保持 jobs*2 个在途任务，避免一次性提交上千个 future
+        while len(pending) < jobs * 2 and submit_next():
+            pass
+
+    def restart():
+        """终止当前进程池，尚未完成的任务重新排队，换一个新的进程池"""
+        queue.extendleft(reversed(list(pending.values())))
+        pending.clear()
+        pool.restart()
+
+    try:
+        fill()
+        while pending:
+            done, _ = wait(pending, timeout=1.0 if grace else None, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                in_path, out_path = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:  # 工作进程崩溃等
+                    broken = broken or isinstance(e, BrokenProcessPool)
+                    result = BatchResult(in_path, out_path, "failed", 0.0, 0, f"{type(e).__name__}: {e}")
+                emit(result)
+
+            hung = pool.hung(grace) if grace else []
+            abandoned = []
+            for future, seconds in hung:
+                in_path, out_path = pending.pop(future)
+                abandoned.append(out_path)
+                emit(BatchResult(in_path, out_path, "failed", seconds, 0, "处理超时"))
+
+            if hung or broken:
+                # 卡住的工作进程无法撤回，进程池崩溃后也不能再提交：重建进程池，其余在途任务重新执行
+                logger.warning("终止并重建进程池（%s）", "处理超时" if hung else "工作进程异常退出",
+                               extra={"event": "batch_pool_restart"})
+                restart()
+                for out_path in abandoned:
+                    remove_temp(out_path)
+            fill()
+    finally:
+        if pending:  # 异常退出（如 Ctrl+C）时不等待运行中的任务
+            pool.terminate()
+        else:
+            pool.shutdown(wait=True)
+
+    return results
+
+
+def remove_temp(out_path):
+    """删除 out_path 的临时文件：被终止的工作进程来不及删除自己的临时文件"""
+    directory, name = os.path.split(out_path)
+    for path in glob.glob(os.path.join(glob.escape(directory), glob.escape(f".{name}.") + "*.tmp")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def analyze_documents(paths, config: dict, include_body=False, jobs=1):
+    """
+    逐个分析 paths 中的文件（目录会递归查找 .docx），按输入顺序生成报告字典。
+    jobs 为 1 时在当前进程中执行，省去进程池的启动开销。
+    """
+    files = []
+    for path in paths:
+        path = Path(path)
+        files.extend(find_documents(path) if path.is_dir() else [path])
+    files = [str(p) for p in files]
+
+    if (jobs or 1) <= 1 or len(files) <= 1:
+        for path in files:
+            yield _analyze_one(path, config, include_body)
+        return
+
+    with _make_executor(jobs, None) as executor:
+        n = len(files)
+        yield from executor.map(
+            _analyze_one, files, [config] * n, [include_body] * n,
+            chunksize=max(1, min(32, n // (jobs * 4))),
+        )
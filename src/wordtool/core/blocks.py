@@ -0,0 +1,185 @@
+"""
+正文块模型与样式索引。
+
+BlockModel 把正文的顶层块（段落 / 表格 / 图片段落）按顺序记录在紧凑数组中：
+块类型、标题等级、样式 id，以及跳过空段落的前后链接。
+图题/表题配对、标题大纲等判断只需按下标查询，不再反复 getnext() 或创建代理对象。
+
+StyleMap 缓存 styles.xml 中 样式 id -> (名称, 类型)，
+代替逐段落的 p.style.name（python-docx 每次都会遍历整个样式表查找默认样式）。
+"""
+from array import array
+
+from docx.oxml.ns import qn
+from docx.styles import BabelFish
+
+from .index import IMAGE
+
+# 块类型
+PARAGRAPH = 0    # 普通段落
+TABLE = 1        # 表格（包括内容控件 w:sdt 中的表格）
+IMAGE_PARA = 2   # 含图片的段落
+OTHER = 3        # 其他顶层元素（sectPr、不含表格的内容控件等）
+
+_P = qn("w:p")
+_TBL = qn("w:tbl")
+_SDT = qn("w:sdt")
+_SDT_CONTENT = qn("w:sdtContent")
+_T = qn("w:t")
+_STYLE = qn("w:style")
+_STYLE_ID = qn("w:styleId")
+_TYPE = qn("w:type")
+_DEFAULT = qn("w:default")
+_NAME = qn("w:name")
+_VAL = qn("w:val")
+
+_TRUE_VALUES = ("1", "true", "on")
+
+
+# ----------------------------------------------------------------------
+# 样式 id -> 名称/类型
+# ----------------------------------------------------------------------
+class StyleMap:
+    """
+    一次读取样式表，按 id 查询样式名称（与 python-docx 的 style.name 一致，
+    如 "heading 1" 显示为 "Heading 1"）。
+    样式表在样式模式下会被修改，必须在 StyleSheet.apply() 之后建立。
+    """
+
+    def __init__(self, styles_element=None):
+        self._styles = {}            # style_id -> (名称, 类型)
+        self._defaults = {}          # 类型 -> 默认样式 id（同类型取最后一个）
+        if styles_element is None:
+            return
+        for style in styles_element.iterchildren(_STYLE):
+            style_id = style.get(_STYLE_ID)
+            style_type = style.get(_TYPE)
+            name = style.find(_NAME)
+            name = BabelFish.internal2ui(name.get(_VAL) or "") if name is not None else ""
+            # 重复 id 以第一个为准（与 python-docx 的 get_by_id 一致）
+            self._styles.setdefault(style_id, (name, style_type))
+            if (style.get(_DEFAULT) or "").lower() in _TRUE_VALUES:
+                self._defaults[style_type] = style_id
+
+    def resolve(self, style_id, style_type="paragraph"):
+        """不存在或类型不符的样式 id 回落到该类型的默认样式"""
+        if style_id is not None:
+            entry = self._styles.get(style_id)
+            if entry is not None and entry[1] == style_type:
+                return style_id
+        return self._defaults.get(style_type)
+
+    def name(self, style_id, style_type="paragraph"):
+        entry = self._styles.get(self.resolve(style_id, style_type))
+        return entry[0] if entry is not None else ""
+
+    def is_heading(self, style_id):
+        name = self.name(style_id)
+        return "标题" in name or "Heading" in name
+
+
+# ----------------------------------------------------------------------
+# 块模型
+# ----------------------------------------------------------------------
+def _is_blank(p):
+    for t in p.iter(_T):
+        if t.text and t.text.strip():
+            return False
+    return True
+
+
+def _block_kind(elm, doc_index):
+    tag = elm.tag
+    if tag == _P:
+        return IMAGE_PARA if doc_index is not None and doc_index.flags(elm) & IMAGE else PARAGRAPH
+    if tag == _TBL:
+        return TABLE
+    if tag == _SDT:
+        content = elm.find(_SDT_CONTENT)
+        if content is not None and content.find(_TBL) is not None:
+            return TABLE
+    return OTHER
+
+
+class BlockModel:
+    """
+    kinds[i]    块类型
+    levels[i]   标题等级（由 style stage 写入，0 为正文）
+    styles[i]   段落样式 id 在 style_table 中的下标（0 表示未设置）
+    prev[i]     上一个非空块的下标（空段落和 OTHER 块被跳过），没有为 -1
+    next[i]     下一个非空块的下标，没有（或尚未读到）为 -1
+
+    可以对整个正文 build()，也可以在流式引擎中逐块 append()。
+    """
+
+    def __init__(self, doc_index=None):
+        self.doc_index = doc_index
+        self.kinds = array("b")
+        self.levels = array("b")
+        self.styles = array("H")
+        self.prev = array("i")
+        self.next = array("i")
+        self.style_table = [None]
+        self._style_refs = {None: 0}
+        self._last_content = -1
+
+    @classmethod
+    def build(cls, body, doc_index=None):
+        model = cls(doc_index)
+        for elm in body.iterchildren():
+            model.append(elm)
+        return model
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def paragraph_count(self):
+        return self.kinds.count(PARAGRAPH) + self.kinds.count(IMAGE_PARA)
+
+    def _style_ref(self, p):
+        pPr = p.pPr
+        style_id = pPr.style if pPr is not None else None
+        ref = self._style_refs.get(style_id)
+        if ref is None:
+            ref = self._style_refs[style_id] = len(self.style_table)
+            self.style_table.append(style_id)
+        return ref
+
+    def append(self, elm):
+        """追加一个顶层块，返回它的下标"""
+        i = len(self.kinds)
+        kind = _block_kind(elm, self.doc_index)
+        self.kinds.append(kind)
+        self.levels.append(0)
+        self.styles.append(self._style_ref(elm) if elm.tag == _P else 0)
+        self.prev.append(self._last_content)
+        self.next.append(-1)
+
+        if kind == OTHER or (kind == PARAGRAPH and _is_blank(elm)):
+            return i
+        # 非空块：回填前面尚未确定的 next 链接（上一个非空块及其后的空段落）
+        k = i - 1
+        while k >= 0 and self.next[k] == -1:
+            self.next[k] = i
+            k -= 1
+        self._last_content = i
+        return i
+
+    # ---------------------- 查询 ----------------------
+    def kind(self, i):
+        return self.kinds[i] if 0 <= i < len(self.kinds) else None
+
+    def style_id(self, i):
+        return self.style_table[self.styles[i]]
+
+    def prev_kind(self, i):
+        """跳过空段落后上一个块的类型"""
+        return self.kind(self.prev[i])
+
+    def next_kind(self, i):
+        """跳过空段落后下一个块的类型"""
+        return self.kind(self.next[i])
+
+    def outline(self):
+        """标题大纲：[(块下标, 标题等级)]"""
+        return [(i, level) for i, level in enumerate(self.levels) if level > 0]
@@ -0,0 +1,151 @@
+"""
+段落分类缓存（可选，配置 "cache": {"path": "...", "max_entries": 100000} 开启）。
+
+同一篇文档反复修订、反复排版时，大部分段落文本没有变化。
+把标题编号匹配结果按 (配置指纹, 文本哈希) 存进 sqlite，
+再次处理时只有改动过的段落才需要重新匹配。
+
+- 配置指纹：TitleMatcher 组合正则的哈希，标题格式或自定义格式变化后自然不命中
+- 版本戳：内置格式表 _FORMAT_TO_REGEX 与 RULES_VERSION 的哈希，变化时清空整个缓存
+- 容量：超过 max_entries 时按最近使用（代数）淘汰最旧的记录
+"""
+import hashlib
+import sqlite3
+
+from .matcher import _FORMAT_TO_REGEX, RULES_VERSION, TitleMatch
+
+DEFAULT_MAX_ENTRIES = 100_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    name  TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    config     BLOB NOT NULL,
+    text       BLOB NOT NULL,
+    level      INTEGER NOT NULL,
+    start      INTEGER NOT NULL,
+    prefix_end INTEGER NOT NULL,
+    body_start INTEGER NOT NULL,
+    used       INTEGER NOT NULL,
+    PRIMARY KEY (config, text)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_used ON entries (used);
+"""
+
+
+def rules_stamp():
+    """内置格式表和匹配规则的版本戳"""
+    h = hashlib.sha1(str(RULES_VERSION).encode())
+    for name, regex in sorted(_FORMAT_TO_REGEX.items()):
+        h.update(f"\0{name}\0{regex}".encode("utf-8"))
+    return h.hexdigest()
+
+
+class ClassificationCache:
+    """
+    与 TitleMatcher 接口相同（match / detect_level），未命中时调用 matcher 并记录结果。
+    新记录和命中信息先留在内存中，close() 时在一个事务里写回。
+    """
+
+    def __init__(self, path, matcher, max_entries=DEFAULT_MAX_ENTRIES):
+        self.matcher = matcher
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._config = hashlib.blake2b(matcher.pattern.encode("utf-8"), digest_size=16).digest()
+        self._memo = {}       # 文本哈希 -> TitleMatch 或 None（本次运行已查过的）
+        self._new = {}        # 文本哈希 -> TitleMatch 或 None（待写入）
+        self._used = set()    # 命中的文本哈希（待更新使用代数）
+
+        self._db = sqlite3.connect(path, timeout=30)
+        # 批量处理时多个进程共用同一个缓存文件
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        with self._db:
+            stamp = rules_stamp()
+            if self._meta("version") != stamp:
+                self._db.execute("DELETE FROM entries")
+                self._set_meta("version", stamp)
+            self.generation = int(self._meta("generation") or 0) + 1
+            self._set_meta("generation", str(self.generation))
+
+    @classmethod
+    def from_config(cls, config: dict, matcher):
+        """未配置缓存时返回 None"""
+        cache_cfg = config.get("cache") or {}
+        path = cache_cfg.get("path")
+        if not path:
+            return None
+        return cls(path, matcher, int(cache_cfg.get("max_entries", DEFAULT_MAX_ENTRIES)))
+
+    # ---------------------- meta ----------------------
+    def _meta(self, name):
+        row = self._db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name, value):
+        self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    # ---------------------- 查询 ----------------------
+    def match(self, text):
+        # 首字符就能排除的文本（绝大多数正文）比查缓存更快，直接返回
+        if not text or not self.matcher.could_match(text[0]):
+            return None
+
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        try:
+            return self._memo[key]
+        except KeyError:
+            pass
+
+        row = self._db.execute(
+            "SELECT level, start, prefix_end, body_start FROM entries WHERE config = ? AND text = ?",
+            (self._config, key),
+        ).fetchone()
+        if row is not None:
+            self.hits += 1
+            self._used.add(key)
+            level, start, prefix_end, body_start = row
+            m = TitleMatch(level, (start, prefix_end), body_start) if level else None
+        else:
+            self.misses += 1
+            m = self._new[key] = self.matcher.match(text)
+        self._memo[key] = m
+        return m
+
+    def detect_level(self, text):
+        m = self.match(text)
+        return m.level if m is not None else 0
+
+    # ---------------------- 写回 ----------------------
+    def close(self):
+        """写回新结果、更新命中记录的使用代数，并按容量淘汰"""
+        if self._db is None:
+            return
+        gen = self.generation
+        try:
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        (self._config, key, m.level, m.span[0], m.span[1], m.body_start, gen)
+                        if m is not None else (self._config, key, 0, 0, 0, 0, gen)
+                        for key, m in self._new.items()
+                    ),
+                )
+                self._db.executemany(
+                    "UPDATE entries SET used = ? WHERE config = ? AND text = ?",
+                    ((gen, self._config, key) for key in self._used),
+                )
+                count = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+                if count > self.max_entries:
+                    self._db.execute(
+                        "DELETE FROM entries WHERE (config, text) IN ("
+                        "SELECT config, text FROM entries ORDER BY used LIMIT ?)",
+                        (count - self.max_entries,),
+                    )
+        finally:
+            self._db.close()
+            self._db = None
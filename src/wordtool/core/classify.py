@@ -0,0 +1,189 @@
+"""
+正文段落批量分类：段首空白、编号前缀、标题等级。
+
+流水线原本在 clean_numbering / style / captions 三个 stage 中各读一次 para.text
+（python-docx 对每个段落、每个 run 各执行一次 XPath），再逐段匹配正则。
+现在流水线开始前一次性取出全部正文顶层段落的文本（拼成一个字符串 + 偏移数组），
+分类结果保存在紧凑数组中，stage 只按段落序号查表：
+
+- lead:      段首空格/Tab 的长度，空白段落为 -1（clean_numbering 不处理）
+- cut / end: 编号前缀结束位置、编号后空白结束位置（相对去掉段首空白后的文本），无编号为 -1
+- levels:    清理编号空格之后的标题等级（array('b')）
+
+段落数达到阈值（配置 "parallel": {"threshold": 50000, "workers": 4}）时分块交给进程池，
+小文档在当前进程中完成，不付出进程池启动开销。XML 的修改仍由流水线按顺序执行。
+"""
+import logging
+import os
+import re
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from docx.oxml.ns import qn
+
+from .textedit import BRACKETS, paragraph_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 50_000
+
+# 段首空白和隐藏控制字符
+LEADING_JUNK = re.compile(r'^[\s\x00-\x1f]+')
+
+# 每个工作进程分到的块数（块太大时进程间负载不均）
+_CHUNKS_PER_WORKER = 4
+
+_P = qn("w:p")
+
+
+# ----------------------------------------------------------------------
+# 文本规则（WordFormatter 的对应方法也调用这里）
+# ----------------------------------------------------------------------
+def normalize_brackets(text):
+    """英文括号转中文括号（长度不变）"""
+    return BRACKETS(text)
+
+
+def clean_numbering(text, match):
+    """
+    去掉段首空格/Tab 以及编号后的空白，返回 (段首空白长度, 编号前缀结束, 编号后空白结束)；
+    没有编号时后两项为 -1。括号规范化前后长度不变，用规范化后的文本匹配，位置可直接用于原文本。
+    """
+    stripped = text.lstrip(" \t")
+    m = match(normalize_brackets(stripped))
+    if m is None:
+        return len(text) - len(stripped), -1, -1
+    return len(text) - len(stripped), m.span[1], m.body_start
+
+
+def apply_clean(text, lead, cut, end):
+    """按 clean_numbering 的结果生成清理后的文本"""
+    text = text[lead:]
+    return text if cut < 0 else text[:cut] + text[end:]
+
+
+def numbering_ranges(lead, cut, end):
+    """clean_numbering 的结果对应的删除区间（原文字中的位置），不需要修改时为空"""
+    ranges = []
+    if lead > 0:
+        ranges.append((0, lead))
+    if end > cut >= 0:
+        ranges.append((lead + cut, lead + end))
+    return ranges
+
+
+def match_title(text, match):
+    """返回 (规范化后的文本, TitleMatch 或 None)"""
+    normalized = LEADING_JUNK.sub('', normalize_brackets(text.strip()))
+    if not normalized:
+        return normalized, None
+    return normalized, match(normalized)
+
+
+# ----------------------------------------------------------------------
+# 分类
+# ----------------------------------------------------------------------
+def classify_chunk(data, offsets, match, clean=True):
+    """
+    分类 data 中的段落（offsets[i]:offsets[i+1] 为第 i 段），返回 (lead, cut, end, levels) 四个数组。
+    clean 为 False 时不清理编号空格（clean_numbering stage 已关闭），lead 全为 -1。
+    """
+    n = len(offsets) - 1
+    lead = array("i", [-1]) * n
+    cut = array("i", [-1]) * n
+    end = array("i", [-1]) * n
+    levels = array("b", bytes(n))
+    for i in range(n):
+        text = data[offsets[i]:offsets[i + 1]]
+        if clean and text.strip():
+            lead[i], cut[i], end[i] = clean_numbering(text, match)
+            text = apply_clean(text, lead[i], cut[i], end[i])
+        m = match_title(text, match)[1]
+        if m is not None:
+            levels[i] = m.level
+    return lead, cut, end, levels
+
+
+def _classify_in_worker(data, offsets, matcher, clean):
+    return classify_chunk(data, offsets, matcher.match, clean)
+
+
+class Classification:
+    """全部正文顶层段落的文本和分类结果（按段落序号，与流水线的 ctx.index 一致）"""
+
+    def __init__(self, data, offsets, lead, cut, end, levels):
+        self.data = data
+        self.offsets = offsets
+        self.lead = lead
+        self.cut = cut
+        self.end = end
+        self.levels = levels
+
+    def __len__(self):
+        return len(self.levels)
+
+    @classmethod
+    def build(cls, body, match, matcher=None, clean=True, threshold=DEFAULT_THRESHOLD, workers=None):
+        """
+        取出 body 下所有顶层段落的文本并分类。
+        match: 当前进程中使用的匹配函数（可能带分类缓存）；
+        matcher: 可以交给工作进程的 TitleMatcher，为 None 时不并行。
+        """
+        texts = [paragraph_text(p) for p in body.iterchildren(_P)]
+        offsets = array("l", [0])
+        total = 0
+        for text in texts:
+            total += len(text)
+            offsets.append(total)
+        data = "".join(texts)
+        del texts
+
+        n = len(offsets) - 1
+        workers = workers or os.cpu_count() or 1
+        if matcher is not None and threshold and n >= threshold and workers > 1:
+            try:
+                return cls(data, offsets, *_classify_parallel(data, offsets, matcher, clean, workers))
+            except (OSError, RuntimeError, AssertionError) as e:
+                # 无法创建进程池（如在守护进程中）时退回单进程
+                logger.warning("并行分类不可用，改为单进程：%s", e, extra={"event": "classify_serial"})
+        return cls(data, offsets, *classify_chunk(data, offsets, match, clean))
+
+    def text(self, i):
+        return self.data[self.offsets[i]:self.offsets[i + 1]]
+
+    def edits(self, i):
+        """clean_numbering 要删除的区间，见 numbering_ranges"""
+        lead = self.lead[i]
+        if lead < 0:
+            return []
+        return numbering_ranges(lead, self.cut[i], self.end[i])
+
+    def cleaned_text(self, i):
+        """clean_numbering 之后的文本；空白段落（不清理）返回 None"""
+        lead = self.lead[i]
+        if lead < 0:
+            return None
+        return apply_clean(self.text(i), lead, self.cut[i], self.end[i])
+
+
+def _classify_parallel(data, offsets, matcher, clean, workers):
+    n = len(offsets) - 1
+    size = max(1, -(-n // (workers * _CHUNKS_PER_WORKER)))
+    lead, cut, end = array("i"), array("i"), array("i")
+    levels = array("b")
+    with ProcessPoolExecutor(workers) as pool:
+        futures = []
+        for start in range(0, n, size):
+            stop = min(n, start + size)
+            base = offsets[start]
+            # 每块只传自己的文本切片和以 0 为起点的偏移
+            chunk_offsets = array("l", (o - base for o in offsets[start:stop + 1]))
+            futures.append(pool.submit(
+                _classify_in_worker, data[base:offsets[stop]], chunk_offsets, matcher, clean))
+        for future in futures:
+            a, b, c, d = future.result()
+            lead.extend(a)
+            cut.extend(b)
+            end.extend(c)
+            levels.extend(d)
+    return lead, cut, end, levels
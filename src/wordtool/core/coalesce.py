@@ -0,0 +1,118 @@
+"""
+合并碎片化的 run。
+
+多次编辑过的 Word 文档会因为修订标记（rsid）、拼写检查标记（w:proofErr）、
+语言标记等把一段文字拆成几十个 run。排版前把相邻、格式等价的纯文本 run 合并，
+后续逐 run 的处理次数减少，输出也更小。
+"""
+from lxml import etree
+
+from docx.oxml.ns import qn
+
+_R = qn("w:r")
+_RPR = qn("w:rPr")
+_T = qn("w:t")
+_TAB = qn("w:tab")
+_PROOF_ERR = qn("w:proofErr")
+_LANG = qn("w:lang")
+_TYPE = qn("w:type")
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+# 可以合并的 run 只能包含这些内容（图片、域代码、换行等都不合并）
+_MERGEABLE_CONTENT = frozenset((_T, _TAB))
+
+# 拼写 / 语法检查标记成对出现：起始类型 -> 结束类型
+_PROOF_PAIRS = {"spellStart": "spellEnd", "gramStart": "gramEnd"}
+
+
+def _rpr_key(r):
+    """
+    run 格式的比较键：rPr 子元素的规范化序列化。
+    语言标记（w:lang）只影响拼写检查，不参与比较。
+    """
+    rPr = r.find(_RPR)
+    if rPr is None:
+        return b""
+    return b"".join(
+        etree.tostring(child, method="c14n")
+        for child in rPr if child.tag != _LANG
+    )
+
+
+def _is_mergeable(r):
+    for child in r:
+        if child.tag != _RPR and child.tag not in _MERGEABLE_CONTENT:
+            return False
+    return True
+
+
+def _append_content(target, source):
+    """把 source 的文本内容接到 target 末尾，相邻的 w:t 直接拼接"""
+    for child in list(source):
+        if child.tag == _RPR:
+            continue
+        last = target[-1] if len(target) else None
+        if child.tag == _T and last is not None and last.tag == _T:
+            last.text = (last.text or "") + (child.text or "")
+            if last.text != last.text.strip():
+                last.set(_XML_SPACE, "preserve")
+        else:
+            target.append(child)
+
+
+def _proof_partners(p):
+    """段落内拼写 / 语法检查标记的起止配对：{标记: 与之配对的标记}"""
+    partners = {}
+    starts = {}
+    for mark in p.iter(_PROOF_ERR):
+        kind = mark.get(_TYPE)
+        if kind in _PROOF_PAIRS:
+            starts[_PROOF_PAIRS[kind]] = mark
+        else:
+            start = starts.pop(kind, None)
+            if start is not None:
+                partners[start] = mark
+                partners[mark] = start
+    return partners
+
+
+def coalesce_runs(p):
+    """
+    合并段落 p 中相邻且格式等价的纯文本 run（只处理段落的直接子 run）。
+    夹在两个被合并的 run 之间的拼写检查标记连同与之配对的标记一并去掉，
+    其他位置的保持原样。返回减少的 run 数。
+    """
+    removed = 0
+    prev = None
+    prev_key = None
+    marks = []    # prev 之后、下一个 run 之前的 w:proofErr
+    dropped = []  # 随 run 合并要删除的 w:proofErr
+    for child in list(p):
+        tag = child.tag
+        if tag == _PROOF_ERR:
+            if prev is not None:
+                marks.append(child)
+            continue
+        if tag != _R or not _is_mergeable(child):
+            prev = None
+            marks = []
+            continue
+
+        key = _rpr_key(child)
+        if prev is not None and key == prev_key:
+            _append_content(prev, child)
+            p.remove(child)
+            removed += 1
+            dropped.extend(marks)
+        else:
+            prev = child
+            prev_key = key
+        marks = []
+
+    if dropped:
+        partners = _proof_partners(p)
+        for mark in dropped + [partners.get(mark) for mark in dropped]:
+            parent = mark.getparent() if mark is not None else None
+            if parent is not None:
+                parent.remove(mark)
+    return removed
@@ -1,51 +1,44 @@
 from docx import Document
 from docx.shared import Pt
 from docx.oxml.ns import qn
-from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-from docx.oxml import OxmlElement
-from docx.shared import RGBColor
-from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-from docx.enum.text import WD_LINE_SPACING
-import win32com.client as win32
+from docx.enum.style import WD_STYLE_TYPE
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.oxml import serialize_part_xml
+from docx.opc.part import XmlPart
+from docx.oxml.parser import parse_xml
+import logging
+import multiprocessing
+import os
+import io
 import re
+import tempfile
+from contextlib import nullcontext
 
+# analysis / cache（sqlite3）/ streaming 只在用到时导入，
+# 普通的 docx 引擎格式化不需要为它们付出启动时间
+from .blocks import IMAGE_PARA, TABLE, BlockModel, StyleMap
+from .classify import (DEFAULT_THRESHOLD, Classification, apply_clean, clean_numbering, match_title,
+                       normalize_brackets, numbering_ranges)
+from .coalesce import coalesce_runs
+from .index import DocumentIndex
+from .loader import LazyLoadError, PackageSource, open_document
+# TITLE_FORMATS / _FORMAT_TO_REGEX 已移到 matcher.py，这里保留导入只为兼容
+# 旧的 from wordtool.core.formatter import TITLE_FORMATS 写法
+from .matcher import TITLE_FORMATS, _FORMAT_TO_REGEX, TitleMatcher  # noqa: F401
+from .numbering import NumberingExpander
+from .package import DEFAULT_COMPRESSLEVEL, default_workers, save_document
+from .pipeline import FormatCancelled, Pipeline, register_stage
+from .plan import FormatPlan
+from .stories import BODY, iter_story_parts
+from .styles import StyleSheet, set_paragraph_style, strip_direct_formatting
+from .textedit import BRACKETS, TextMap, paragraph_text, translate_text
 
+logger = logging.getLogger(__name__)
 
 
-TITLE_FORMATS = [
-    "一", "一、", "（一）", "（一）、", "（一）.",
-    "（1）", "（1）、", "（1）.", "1", "1.", "1、",
-    "a", "a.", "A", "A.", "①", "I", "I.", "（I）"
-]
+# 不改变分类结果的内置 stage：正文只经过这些 stage 时，才使用流水线开始前的批量分类结果
+_CLASSIFY_STAGES = frozenset(("coalesce_runs", "clean_numbering", "brackets", "style", "indent", "captions"))
 
-_FORMAT_TO_REGEX = {
-    # ------------------ 中文大写数字类 -------------------
-    "一": r"^[一二三四五六七八九十]+\s*",  # 匹配 "一 " 或 "二 " (无标点)
-    "一、": r"^[一二三四五六七八九十]+[、\.]\s*",  # 匹配 "一、", "二.", "三 " (带顿号或点号)
-    "（一）": r"^（[一二三四五六七八九十]+）\s*",  # 匹配 "(一) ", "(二) "
-    "（一）、": r"^（[一二三四五六七八九十]+）[、\.]?\s*",  # 匹配 "(一) 、", "(二) ", "(三)."
-    "（一）\.": r"^（[一二三四五六七八九十]+）[、\.]\s*",  # 同上，匹配带点号或顿号
-
-    # ------------------ 阿拉伯数字类 ----------------------
-    "1": r"^\d+\s*",  # 匹配 "1 " 或 "2 " (无标点)
-    "1.": r"^\d+[、\.]\s*",  # 匹配 "1.", "2、", "3 " (带点号或顿号)
-    "1、": r"^\d+[、\.]\s*",  # 同上
-    "（1）": r"^（\d+）\s*",  # 匹配 "(1) ", "(2) "
-    "（1）、": r"^（\d+）[、\.]?\s*",  # 匹配 "(1) 、", "(2) ", "(3)."
-    "（1）\.": r"^（\d+）[、\.]\s*",  # 同上
-
-    # ------------------ 字母和罗马数字类 --------------------
-    "a": r"^[a-z]{1,2}\s*",  # 匹配 "a " 或 "b "
-    "a.": r"^[a-z]{1,2}[、\.]\s*",  # 匹配 "a.", "b、"
-    "A": r"^[A-Z]{1,2}\s*",  # 匹配 "A " 或 "B "
-    "A.": r"^[A-Z]{1,2}[、\.]\s*",  # 匹配 "A.", "B、"
-    "I": r"^[IVXLCDM]+\s*",  # 匹配 "I " 或 "II "
-    "I.": r"^[IVXLCDM]+[、\.]\s*",  # 匹配 "I.", "II、"
-    "（I）": r"^（[IVXLCDM]+）\s*",  # 匹配 "(I) ", "(II) "
-
-    # ------------------ 特殊符号类 -------------------------
-    "①": r"^[①②③④⑤⑥⑦⑧⑨⑩]+\s*",  # 匹配带圈数字
-}
 
 
 def extract_pt(size_str: str) -> float:
@@ -64,8 +57,35 @@ def extract_pt(size_str: str) -> float:
 
     return 12.0
 
+
+def _is_path(f):
+    return isinstance(f, (str, os.PathLike))
+
+
+def _file_size(f):
+    """文件路径或可 seek 的文件对象的大小，无法得知时返回 None"""
+    if _is_path(f):
+        return os.path.getsize(f)
+    if f.seekable():
+        return f.seek(0, os.SEEK_END)
+    return None
+
+
+def _display_name(f):
+    """日志中显示的文件名；内存中的文件对象没有名字"""
+    if _is_path(f):
+        return str(f)
+    name = getattr(f, "name", None)
+    return name if isinstance(name, str) else "<stream>"
+
+
+class FormatError(Exception):
+    """format_bytes / format_stream 处理失败"""
+
+
 class WordFormatter:
     def __init__(self, file_path, config: dict):
+        # file_path 可以是路径，也可以是可 seek 的二进制文件对象（见 format_stream）
         self.file_path = file_path
         self.config = config
         self.titles = config.get("titles", {})
@@ -73,14 +93,95 @@ class WordFormatter:
         self.figure = config.get("figure", {})
         self.table = config.get("table", {})
 
-        # ----------------------------------------------------------------------
-        # 使用 win32com 展开 Word 自动编号 这里需要关闭word编辑器
-        # ----------------------------------------------------------------------
-    def _expand_numbering(self, input_path, output_path):
+        # 自动编号展开方式："native"（默认，纯 OOXML）或 "com"（调用 Word，仅 Windows）
+        self.numbering_backend = config.get("numbering_backend", "native")
+
+        # 处理引擎："docx"（默认，python-docx 加载整个文档）
+        # 或 "streaming"（逐块流式处理 document.xml，适合超大文档）
+        self.engine = config.get("engine", "docx")
+
+        # 格式写入方式："direct"（默认，逐个 run/段落写直接格式）
+        # 或 "styles"（只修改 Normal/Heading 1~4/Caption 样式，段落引用样式）
+        self.style_mode = config.get("style_mode", "direct")
+        self.style_ids = None
+
+        # 编译后的格式方案（字号解析、rPr/pPr 模板），save() 开始时按配置取用；
+        # 相同配置的 WordFormatter 共用同一个方案
+        self.plan = None
+        # 当前文档中 "Heading N" 对应的样式 id，save() 时重建
+        self.heading_ids = None
+
+        # 输出包压缩："package": {"compresslevel": 0~9, "workers": 并行压缩线程数}
+        # 未修改的部件（图片等）总是原样复制，不受影响
+        package_cfg = config.get("package") or {}
+        self.compresslevel = int(package_cfg.get("compresslevel", DEFAULT_COMPRESSLEVEL))
+        self.compress_workers = int(package_cfg.get("workers", default_workers()))
+        # 输入包惰性读取（见 loader.py）；"lazy": false 时改用 python-docx 一次读入全部部件，用于对比内存
+        self.lazy_load = bool(package_cfg.get("lazy", True))
+        # 保存后重新读取输入和输出做结构校验（见 verify.py），不通过时视为处理失败
+        self.verify = bool(config.get("verify", False))
+        self.verify_report = None
+
+        # 当前文档的元素索引（图片、域代码、表格、分节符），save() 时建立
+        self.doc_index = None
+        # 正文块模型（块类型、标题等级、前后链接）和样式 id -> 名称缓存，save() 时建立
+        self.blocks = None
+        self.style_map = None
+        # 要处理的页眉/页脚/脚注/尾注部件 [(区域, 部件, 根元素)]，save() 时建立
+        self.story_parts = []
+
+        # 标题编号匹配器：配置加载时编译一次，非法的自定义格式在这里直接报错
+        self.matcher = TitleMatcher.from_config(config)
+        # 可选的段落分类缓存，save() 期间打开
+        self.cache = None
+
+        # 正文段落的批量分类结果（见 classify.py），save() 时在流水线开始前建立；
+        # 正文段落数达到 threshold 时分块交给进程池："parallel": {"threshold": 50000, "workers": 4}，
+        # false 为始终在当前进程中分类
+        parallel_cfg = config.get("parallel", {})
+        if parallel_cfg is False:
+            parallel_cfg = {"threshold": 0}
+        self.classify_threshold = int(parallel_cfg.get("threshold", DEFAULT_THRESHOLD) or 0)
+        self.classify_workers = parallel_cfg.get("workers")
+        self.classification = None
+
+        # 最近一次 save() 处理的段落数、合并掉的 run 数，以及失败时的错误信息
+        self.paragraph_count = 0
+        self.runs_removed = 0
+        self.last_error = None
+
+        # 可选：进度回调 progress(已处理段落数, 段落总数或 None) 和取消标志（Event），
+        # 取消时 save() 在段落之间停止并返回 False，cancelled 置为 True
+        self.progress = None
+        self.cancel_event = None
+        self.cancelled = False
+
+        # 可选：性能统计（Instrumentation），为 None 时不计时
+        self.instrument = None
+
+    # ----------------------------------------------------------------------
+    # 展开 Word 自动编号
+    # ----------------------------------------------------------------------
+    def _expand_numbering(self, doc):
+        """
+        读取 numbering.xml，把段落的自动编号直接写成段首文本（内存中完成）
+        返回展开的段落数
+        """
+        expander = NumberingExpander.from_document(doc)
+        if expander is None:
+            return 0
+        return expander.expand_tree(doc.element.body)
+
+    # ----------------------------------------------------------------------
+    # 使用 win32com 展开 Word 自动编号 这里需要关闭word编辑器
+    # ----------------------------------------------------------------------
+    def _expand_numbering_com(self, input_path, output_path):
         """
-        调用 Word COM 将自动编号转成真实文本
+        调用 Word COM 将自动编号转成真实文本（可选后端，仅 Windows）
         """
         try:
+            import win32com.client as win32
+
             word = win32.Dispatch("Word.Application")
             word.Visible = False
             doc = word.Documents.Open(input_path)
@@ -90,90 +191,62 @@ class WordFormatter:
             word.Quit()
             return output_path
         except Exception as e:
-            print(f"Error expanding numbering: {e}")
+            logger.warning("Error expanding numbering: %s", e, extra={"event": "numbering_com_failed"})
             return input_path  # 出错就返回原文件
 
     # ----------------------------------------------------------------------
     # 设置文本 run 样式（图片 run 跳过）
     # ----------------------------------------------------------------------
-    def _set_run_style(self, run, font_name, size, bold):
-        if run._element.xpath(".//w:drawing"):
+    def _set_run_style(self, r, fmt):
+        # 字体、东亚字体、字号、加粗、黑色，一次写入预先生成的 rPr（见 plan.py）
+        if self.doc_index.has_image(r):
             return
-        run.font.name = font_name
-        run._element.rPr.rFonts.set(qn('w:eastAsia'), font_name)
-        run.font.size = Pt(size)
-        run.bold = bold
-        run.font.color.rgb = RGBColor(0, 0, 0)
+        self.plan.apply_run(r, fmt)
 
 
-    def _clean_numbering_spaces(self, doc):
+    def _clean_numbering_spaces(self, para):
         """
-        遍历段落，根据配置里的 title1~title4 编号格式，删除编号和标题文本之间多余空格
-        会删除所有段落的前缀空格
+        根据配置里的 title1~title4 编号格式，删除编号和标题文本之间多余空格
+        会删除段落的前缀空格
         """
-        import re
-
-        for para in doc.paragraphs:
-            text = para.text
-            if not text.strip():
-                continue
-
-            # 清理段首空格/Tab
-            text = text.lstrip(" \t")
-
-            # 遍历 title1~title4
-            for i in range(1, 5):
-                key = f"title{i}"
-                fmt = self.titles.get(key, {}).get("format", "")
-                if not fmt:
-                    continue
-
-                regex = _FORMAT_TO_REGEX.get(fmt)
-                if regex:
-                    # 用 re.sub 把编号后的空格去掉
-                    # 假设编号是开头连续匹配的部分
-                    try:
-                        text = re.sub(f"({regex})\\s+", r"\1", text)
-                        # 如果匹配成功就不再尝试低级别标题
-                        break
-                    except re.error as e:
-                        print(f"Invalid regex for {key}: {regex}, {e}")
-                        continue
-
-            para.text = text
-
+        # 按拼接后的文字计算删除区间，只改动涉及的 w:t，图片、域代码和各 run 的格式保持不变
+        text_map = TextMap(para._p)
+        if not text_map.text.strip():
+            return
+        text_map.delete(numbering_ranges(*clean_numbering(text_map.text, self._match)))
 
+    def _clean_numbering_text(self, text):
+        """返回去掉段首空格/Tab 以及编号后空白的文本（不修改段落）"""
+        # 按 title1~title4 的优先级匹配编号，去掉编号后的空白
+        return apply_clean(text, *clean_numbering(text, self._match))
 
+    # ----------------------------------------------------------------------
+    # 将 run 中的英文括号转中文括号（图片 run 跳过）
+    # ----------------------------------------------------------------------
+    def _normalize_run_brackets(self, para):
+        for r in para._p.r_lst:
+            if self.doc_index.has_image(r):  # 检查run是否包含图片
+                continue
+            # 只改 w:t 中的文字：制表符、换行、域代码、脚注引用等 run 内容保持不动
+            translate_text(r, BRACKETS)
 
     # ----------------------------------------------------------------------
     # 标题层级检测
     # ----------------------------------------------------------------------
     def _detect_level(self, text):
-        # 1. 预处理文本：标准化括号和去除隐藏字符
-        normalized_text = self._normalize_brackets(text.strip())
-        normalized_text = re.sub(r'^[\s\x00-\x1f]+', '', normalized_text)
-        if not normalized_text:
-            return 0
+        _, m = self._match_title(text)
+        return m.level if m is not None else 0
 
-        for i in range(1, 5):
-            key = f"title{i}"
-            # 2. 从 JSON 配置中获取用户设定的标识 (例如 "（1）" 或 "1.")
-            format_key = self.titles.get(key, {}).get("format", "")
-
-            # 3. 查表获取对应的正则表达式字符串
-            # 注意：这里我们使用全局的 _FORMAT_TO_REGEX 字典
-            regex_pattern = _FORMAT_TO_REGEX.get(format_key)
-
-            if regex_pattern:
-                # 4. 使用 re.match 进行匹配（执行前缀匹配）
-                try:
-                    if re.match(regex_pattern, normalized_text):
-                        return i
-                except re.error as e:
-                    # 提示配置中正则错误
-                    print(f"Warning: Invalid regex pattern used for {key}: {e}")
-                    continue
-        return 0
+    def _match_title(self, text):
+        """返回 (规范化后的文本, TitleMatch 或 None)"""
+        # 标准化括号、去除隐藏字符后，用预编译的匹配器按 title1~title4 的优先级做前缀匹配
+        return match_title(text, self._match)
+
+    def _match(self, text):
+        # 启用分类缓存时先查缓存，未命中才执行正则
+        if self.cache is not None:
+            return self.cache.match(text)
+        return self.matcher.match(text)
 
     # ----------------------------------------------------------------------
     # 获取样式
@@ -194,158 +267,444 @@ class WordFormatter:
         level: 标题等级，0 表示正文或图表标题
         caption_type: 可选 "caption"，表示图表标题
         """
-        # ---------------- 获取样式配置 ----------------
+        if self.style_mode == "styles":
+            self._apply_style_ref(paragraph, level, heading_style, caption_type)
+            return
+
+        # ---------------- 取编译好的级别格式 ----------------
+        # 图表标题使用 caption 配置（行距 + 居中），正文为行距，标题为左对齐、零缩进
         if level == 0 and caption_type == "caption":
-            # 使用 caption 配置
-            style_cfg = self.config.get("caption", {})
-            # # 保证图题不会和图片重叠
-            # paragraph.paragraph_format.space_before = Pt(6)  # 图题上方空白
-            # paragraph.paragraph_format.space_after = Pt(3)  # 图题下方空白
+            fmt = self.plan.levels["caption"]
         else:
-            style_cfg = self._get_style(level)
-
-        # 字体与字号
-        font_name = style_cfg.get("font", "宋体")
-        size_str = style_cfg.get("size", "12")
-        m = re.search(r"\(([\d.]+)pt\)", size_str)
-        size = float(m.group(1)) if m else 12
-        bold = bool(style_cfg.get("bold", False))
+            fmt = self.plan.levels[level]
+        p = paragraph._p
 
         # 设置段落样式（标题等级大于0才使用 Heading）
         if heading_style and level > 0:
-            paragraph.style = f'Heading {level}'
+            p.style = self._heading_id(paragraph, level)
 
         # 设置 run 样式
-        for run in paragraph.runs:
-            self._set_run_style(run, font_name, size, bold)
+        for r in p.r_lst:
+            self._set_run_style(r, fmt)
+
+        # 行距 / 对齐和缩进
+        self.plan.apply_paragraph(p, fmt)
+
+    def _heading_id(self, paragraph, level):
+        # 与 paragraph.style = "Heading N" 相同，但每个文档只查一次样式表
+        if level not in self.heading_ids:
+            self.heading_ids[level] = paragraph.part.get_style_id(
+                f"Heading {level}", WD_STYLE_TYPE.PARAGRAPH)
+        return self.heading_ids[level]
 
-        # ---------------- 设置行距 ----------------
-        if level == 0:
-            line_rule = style_cfg.get("line_rule", "多倍行距")
-            spacing = float(style_cfg.get("spacing", 1.25))
-
-            if line_rule == "多倍行距":
-                paragraph.paragraph_format.line_spacing_rule = WD_LINE_SPACING.MULTIPLE
-                paragraph.paragraph_format.line_spacing = spacing
-            else:  # 固定值（磅）
-                paragraph.paragraph_format.line_spacing_rule = WD_LINE_SPACING.EXACTLY
-                paragraph.paragraph_format.line_spacing = Pt(spacing)
-
-        # -------- 4. 标题对齐和缩进 --------
-        if level > 0:
-            paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
-            paragraph.paragraph_format.first_line_indent = Pt(0)
-            paragraph.paragraph_format.left_indent = Pt(0)
         # ----------------------------------------------------------------------
+    # 样式模式：段落只引用样式，去掉冲突的直接格式
+    # ----------------------------------------------------------------------
+    def _apply_style_ref(self, paragraph, level, heading_style=True, caption_type=None):
+        p = paragraph._p
+        if level == 0 and caption_type == "caption":
+            set_paragraph_style(p, self.style_ids["caption"])
+        elif level > 0 and heading_style:
+            set_paragraph_style(p, self.style_ids[level])
+        elif p.style == self.style_ids["caption"]:
+            # 只重置本工具管理的样式：不再是图表标题的段落回到默认的 Normal 样式；
+            # 作者设置的标题、列表段落、引用和自定义样式都保留
+            set_paragraph_style(p, None)
+        strip_direct_formatting(p, self.doc_index.has_image)
+
+    def _is_heading_style(self, p):
+        # 读取段落当前的 pStyle（style stage 可能刚改过），名称从缓存中查
+        return self.style_map.is_heading(p._p.style)
+
+    # ----------------------------------------------------------------------
     # 将英文括号转中文括号
     # ----------------------------------------------------------------------
     def _normalize_brackets(self, text):
-        text = text.replace("(", "（").replace(")", "）")
-        return text
+        return normalize_brackets(text)
 
     # ----------------------------------------------------------------------
     # 处理图题和表题
     # ----------------------------------------------------------------------
-    def _preprocess_captions(self, doc):
+    def _preprocess_captions(self, para, block, text=None):
         """
-        处理已有图题和表题：
-        - 图片下方图题
-        - 表格上方表题
+        处理已有图题和表题（block 为段落在 BlockModel 中的下标，text 为已知的段落文本）：
+        - 图片下方图题：上一个非空块是图片段落，本段以“图”开头
+        - 表格上方表题：下一个非空块是表格，本段以“表”开头
+        中间的空段落不影响配对。
         """
-        paragraphs = doc.paragraphs
-        for i, para in enumerate(paragraphs):
-            # 图片下方图题
-            if para._element.xpath(".//w:drawing"):
-                if i + 1 < len(paragraphs) and paragraphs[i + 1].text.strip().startswith("图"):
-                    caption_para = paragraphs[i + 1]
-                    self._apply_style(caption_para, level=0, caption_type="caption")
-                    caption_para.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-
-            # 表格上方表题
-            next_elem = para._element.getnext()
-            if next_elem is not None and next_elem.tag.endswith("tbl"):
-                if para.text.strip().startswith("表"):
-                    caption_para = para
-                    self._apply_style(caption_para, level=0, caption_type="caption")
-                    caption_para.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-
-    def _normalize_paragraph_indent(self, doc):
-
-        for p in doc.paragraphs:
-            # 跳过标题
-            if "标题" in p.style.name or "Heading" in p.style.name:
-                continue
-
-            fmt = p.paragraph_format
-
-            # ---- 自动读取正文字号 ----
-            # 尝试从 run 中找字号（通常 run.font.size 才有真实值）
-            font_size = None
-            for run in p.runs:
-                if run.font.size:
-                    font_size = run.font.size
-                    break
-
-            # 如果整段都没有设置字号（极少见），用默认 16pt
-            if font_size is None:
-                font_size = Pt(16)
+        if self._caption_kind(paragraph_text(para._p) if text is None else text, block) is None:
+            return
 
-            # ---- Word 的“2 字符缩进”计算方式 ----
-            # 1 字符 ≈ 字号
-            # 2 字符 = 字号 × 2
-            two_char_indent = font_size * 2
+        # 直接格式模式下居中写在 caption 的段落格式里；样式模式下由 Caption 样式居中
+        self._apply_style(para, level=0, caption_type="caption")
+
+    def _caption_kind(self, text, block):
+        """返回 "figure"（图题）、"table"（表题）或 None"""
+        text = text.strip()
+        if text.startswith("图") and self.blocks.prev_kind(block) == IMAGE_PARA:
+            return "figure"
+        if text.startswith("表") and self.blocks.next_kind(block) == TABLE:
+            return "table"
+        return None
+
+    def _normalize_paragraph_indent(self, p):
+        # 样式模式下首行缩进写在 Normal 样式里，段落上的缩进已被清除
+        if self.style_mode == "styles":
+            return
 
-            # -------------------------
-            # 应用格式
-            # -------------------------
+        # 跳过标题
+        if self._is_heading_style(p):
+            return
 
-            # 顶格：清空左缩进
-            fmt.left_indent = Pt(0)
+        # ---- 自动读取正文字号 ----
+        # 尝试从 run 中找字号（通常 run.font.size 才有真实值）
+        font_size = None
+        for r in p._p.r_lst:
+            rPr = r.rPr
+            if rPr is not None and rPr.sz_val:
+                font_size = rPr.sz_val
+                break
+
+        # 如果整段都没有设置字号（极少见），用默认 16pt
+        if font_size is None:
+            font_size = Pt(16)
+
+        # ---- Word 的“2 字符缩进”计算方式 ----
+        # 1 字符 ≈ 字号
+        # 2 字符 = 字号 × 2
+        # 顶格（左缩进 0）、首行缩进 2 字符、统一左对齐，按字号预先生成（见 plan.py）
+        self.plan.apply_indent(p._p, font_size)
 
-            # 首行缩进 = 2 字符宽度
-            fmt.first_line_indent = two_char_indent
+    # ----------------------------------------------------------------------
+    # 分析（不写文件）
+    # ----------------------------------------------------------------------
+    def analyze(self, include_body=False):
+        """
+        只执行文本层面的处理（编号展开、编号空格清理、标题等级、图表标题），
+        不写样式、不生成 .docx，返回报告字典（格式见 analysis.py）。
+        自动编号总是用内置的 native 方式展开。
+        """
+        from .analysis import analyze_document
 
-            # 统一左对齐
-            p.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+        self.cache = self._open_cache()
+        try:
+            return analyze_document(self, include_body)
+        finally:
+            if self.cache is not None:
+                self.cache.close()
+                self.cache = None
 
     # ----------------------------------------------------------------------
     # 保存文档
     # ----------------------------------------------------------------------
 
     def save(self, output_path):
+        """
+        output_path 可以是路径，也可以是可写的二进制文件对象；
+        输入和输出都是文件对象时整个过程不产生任何临时文件。
+        """
+        expanded_path = None
+        package_source = None
         try:
-
-            # ----------------- 1. 先展开自动编号 -----------------
-            expanded_path = self._expand_numbering(self.file_path, output_path.replace(".docx", "_expanded.docx"))
-            # ----------------- 2. 用 python-docx 打开展开后的文档 -----------------
-            doc = Document(expanded_path)
-
-            # 清理编号和标题间多余空格
-            self._clean_numbering_spaces(doc)
-
-
-            # ----------------- 3. 标题括号规范化 -----------------
-            for para in doc.paragraphs:
-                for run in para.runs:
-                    if not run._element.xpath(".//w:drawing"): # 检查run是否包含图片
-                        run.text = self._normalize_brackets(run.text) # 对纯文本进行处理
-
-
-            # ----------------- 4. 应用样式（标题/正文） -----------------
-            for para in doc.paragraphs:
-                level = self._detect_level(para.text)
-                self._apply_style(para, level)
-
-
-            self._normalize_paragraph_indent(doc)
-            # ----------------- 5. 处理已有图题/表题 -----------------
-            self._preprocess_captions(doc)
-
-            # ----------------- 6. 保存最终文档 -----------------
-            doc.save(output_path)
-            print(f"文档保存成功：{output_path}")
+            pipeline = Pipeline.from_config(self.config)
+            self.plan = FormatPlan.from_config(self.config)
+            self.heading_ids = {}
+            self.story_parts = []
+            self.classification = None
+            if self.instrument is not None:
+                pipeline = pipeline.instrumented(self.instrument)
+            source = self.file_path
+            self.cache = self._open_cache()
+
+            # ----------------- 1. 可选：用 Word COM 展开自动编号 -----------------
+            if self.numbering_backend == "com":
+                if not _is_path(self.file_path):
+                    raise ValueError("numbering_backend 为 com 时输入必须是文件路径")
+                fd, expanded_path = tempfile.mkstemp(suffix=".docx")
+                os.close(fd)
+                with self._phase("numbering_com"):
+                    source = self._expand_numbering_com(self.file_path, expanded_path)
+
+            if self.engine == "streaming":
+                # ----------------- 流式引擎：逐块处理 document.xml -----------------
+                from .streaming import StreamingEngine
+
+                with self._phase("streaming"):
+                    ctx = StreamingEngine(self, pipeline).run(
+                        source, output_path, expand_numbering=self.numbering_backend != "com")
+                self._verify_output(source, output_path, pipeline)
+                self._finish(ctx, source, output_path)
+                return True
+
+            # ----------------- 2. 打开文档并展开自动编号 -----------------
+            with self._phase("load"):
+                doc = None
+                if self.lazy_load:
+                    package_source = PackageSource(source)
+                    try:
+                        doc = open_document(package_source)
+                    except LazyLoadError as e:
+                        logger.warning("无法惰性读取，改用 python-docx 读取全部部件：%s", e,
+                                       extra={"event": "lazy_load_fallback", "error": str(e)})
+                        package_source.close()
+                        package_source = None
+                if doc is None:
+                    doc = Document(source)
+            with self._phase("numbering"):
+                if self.numbering_backend != "com":
+                    self._expand_numbering(doc)
+            if self.style_mode == "styles":
+                with self._phase("stylesheet"):
+                    self.style_ids = StyleSheet(doc.styles.element, self.config).apply()
+            self._check_cancel()
+
+            # 一次扫描建立图片/域/表格索引和正文块模型，供所有 stage 查询
+            with self._phase("index"):
+                body = doc.element.body
+                self.doc_index = DocumentIndex.build(body)
+                self.blocks = BlockModel.build(body, self.doc_index)
+                self.style_map = StyleMap(doc.styles.element)
+                self.story_parts = self._load_story_parts(doc, pipeline)
+            with self._phase("classify"):
+                self.classification = self._classify_body(body, pipeline)
+
+            # ----------------- 3. 单次遍历执行所有段落 stage -----------------
+            # 清理编号空格 -> 括号规范化 -> 标题/正文样式 -> 段落缩进 -> 图题/表题
+            if self.instrument is not None:
+                self.instrument.count("runs", sum(1 for _ in body.iter(qn("w:r"))))
+            with self._phase("paragraphs"):
+                ctx = pipeline.run(self, doc, total=self.blocks.paragraph_count(),
+                                   parts=[(story, root) for story, _, root in self.story_parts])
+
+            # ----------------- 4. 保存最终文档 -----------------
+            self._check_cancel()
+            with self._phase("save"):
+                self._store_story_parts()
+                writer = save_document(doc, source, output_path, self._modified_parts(doc),
+                                       self.compresslevel, self.compress_workers)
+            if self.instrument is not None:
+                if writer is not None:
+                    self.instrument.count("parts_copied", writer.copied)
+                    self.instrument.count("parts_written", writer.written)
+                if package_source is not None:
+                    self.instrument.count("members_read", package_source.reads)
+            self._verify_output(source, output_path, pipeline)
+            self._finish(ctx, source, output_path)
             return True
 
+        except FormatCancelled:
+            self.cancelled = True
+            self.last_error = "已取消"
+            name = _display_name(self.file_path)
+            logger.info("已取消：%s", name, extra={"event": "cancelled", "file": name})
+            # 流式引擎边处理边写出，取消时删掉不完整的输出
+            if self.engine == "streaming" and _is_path(output_path) and os.path.exists(output_path):
+                os.remove(output_path)
+            return False
+
         except Exception as e:
-            print(f"Error saving document: {e}")
-            return False
\ No newline at end of file
+            self.last_error = f"{type(e).__name__}: {e}"
+            logger.error("Error saving document: %s", e,
+                         extra={"event": "failed", "file": _display_name(self.file_path), "error": self.last_error})
+            return False
+
+        finally:
+            # 先关闭映射，再删除临时文件（Windows 上映射中的文件不能删除）
+            if package_source is not None:
+                package_source.close()
+            if expanded_path is not None and os.path.exists(expanded_path):
+                os.remove(expanded_path)
+            if self.cache is not None:
+                logger.info("分类缓存：命中 %d，重新匹配 %d", self.cache.hits, self.cache.misses,
+                            extra={"event": "cache", "hits": self.cache.hits, "misses": self.cache.misses})
+                self.cache.close()
+                self.cache = None
+
+    def _modified_parts(self, doc):
+        """保存时需要重新序列化的部件，其余部件从原文件原样复制"""
+        parts = {doc.part.partname}
+        if self.style_mode == "styles":
+            parts.add(doc.part.part_related_by(RT.STYLES).partname)
+        parts.update(part.partname for _, part, _ in self.story_parts)
+        return parts
+
+    def _load_story_parts(self, doc, pipeline):
+        """有 stage 要执行的页眉/页脚/脚注/尾注部件，同时加入元素索引"""
+        parts = []
+        for story, part in iter_story_parts(doc.part):
+            if not pipeline.handles(story):
+                continue
+            # python-docx 把页眉页脚解析为 XmlPart，脚注/尾注部件只保存原始数据
+            root = part.element if isinstance(part, XmlPart) else parse_xml(part.blob)
+            self.doc_index.add(root)
+            parts.append((story, part, root))
+        return parts
+
+    def _store_story_parts(self):
+        """把处理后的脚注/尾注写回部件（XmlPart 保存时自己序列化）"""
+        for _, part, root in self.story_parts:
+            if not isinstance(part, XmlPart):
+                part._blob = serialize_part_xml(root)
+
+    def _classify_body(self, body, pipeline):
+        """
+        一次取出全部正文顶层段落的文本并分类（大文档并行），返回 Classification；
+        正文要执行自定义 stage（可能改动文字）时返回 None，各 stage 逐段读取 para.text。
+        """
+        names = {name for name, _ in pipeline.stages_for(BODY)}
+        if not names <= _CLASSIFY_STAGES or not names & {"clean_numbering", "style", "captions"}:
+            return None
+        # 工作进程（批量、服务、界面任务）已经按文件并行，不再嵌套进程池；
+        # 分类缓存只能在当前进程中查询
+        parallel = multiprocessing.parent_process() is None and self.cache is None
+        return Classification.build(
+            body, self._match, self.matcher if parallel else None,
+            clean="clean_numbering" in names,
+            threshold=self.classify_threshold, workers=self.classify_workers,
+        )
+
+    def _verify_output(self, source, output_path, pipeline):
+        """
+        "verify": true 时比较输入和刚写出的输出（文字、图片、域、表格形状、关系），
+        不通过时删除输出文件并抛出 VerifyError。输出不能重新读取（如标准输出）时跳过。
+        """
+        self.verify_report = None
+        if not self.verify:
+            return
+        if not _is_path(output_path) and not (output_path.readable() and output_path.seekable()):
+            logger.warning("输出不能重新读取，跳过结构校验：%s", _display_name(output_path),
+                           extra={"event": "verify_skipped"})
+            return
+        from .verify import VerifyError, verify_documents
+
+        with self._phase("verify"):
+            report = verify_documents(source, output_path, self.config,
+                                      expand_numbering=self.numbering_backend != "com", pipeline=pipeline)
+        self.verify_report = report
+        if not report["ok"]:
+            if _is_path(output_path) and os.path.exists(output_path):
+                os.remove(output_path)
+            raise VerifyError(report)
+
+    def _phase(self, name):
+        # 未启用统计时返回空的上下文管理器
+        if self.instrument is None:
+            return nullcontext()
+        return self.instrument.phase(name)
+
+    def _finish(self, ctx, source, output_path):
+        """记录处理结果和统计计数"""
+        self.paragraph_count = ctx.stats["paragraphs"]
+        self.runs_removed = ctx.stats["runs_removed"]
+        if self.instrument is not None:
+            self.instrument.counters.update(ctx.stats)
+            self.instrument.count("images", self.doc_index.image_count)
+            self.instrument.count("tables", self.doc_index.table_count)
+            self.instrument.count("fields", self.doc_index.field_count)
+            for name, f in (("bytes_read", source), ("bytes_written", output_path)):
+                size = _file_size(f)
+                if size is not None:
+                    self.instrument.count(name, size)
+        logger.info("文档保存成功：%s", _display_name(output_path), extra={
+            "event": "saved", "file": _display_name(self.file_path), "output": _display_name(output_path),
+            "paragraphs": self.paragraph_count,
+        })
+
+    def _check_cancel(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise FormatCancelled()
+
+    def _open_cache(self):
+        if not (self.config.get("cache") or {}).get("path"):
+            return None
+        import sqlite3
+
+        from .cache import ClassificationCache
+
+        try:
+            return ClassificationCache.from_config(self.config, self.matcher)
+        except sqlite3.Error as e:
+            # 缓存只影响速度，打不开（损坏、被锁）时照常处理
+            logger.warning("分类缓存不可用：%s", e, extra={"event": "cache_unavailable"})
+            return None
+
+
+# ----------------------------------------------------------------------
+# 注册段落 stage（按执行顺序），可通过配置 "stages": {"<name>": false} 关闭
+# ----------------------------------------------------------------------
+@register_stage("coalesce_runs")
+def _stage_coalesce_runs(formatter, para, ctx):
+    # 先合并碎片 run，后续逐 run 的处理都会更快
+    ctx.stats["runs_removed"] += coalesce_runs(para._p)
+
+
+@register_stage("clean_numbering")
+def _stage_clean_numbering(formatter, para, ctx):
+    # 正文段落直接使用批量分类的结果（见 classify.py）
+    if ctx.story == BODY and formatter.classification is not None:
+        ranges = formatter.classification.edits(ctx.index)
+        if ranges:  # 不需要修改的段落不再扫描
+            TextMap(para._p).delete(ranges)
+    else:
+        formatter._clean_numbering_spaces(para)
+
+
+@register_stage("brackets")
+def _stage_brackets(formatter, para, ctx):
+    formatter._normalize_run_brackets(para)
+
+
+@register_stage("style")
+def _stage_style(formatter, para, ctx):
+    if ctx.story == BODY and formatter.classification is not None:
+        ctx.level = formatter.classification.levels[ctx.index]
+    else:
+        ctx.level = formatter._detect_level(paragraph_text(para._p))
+    if ctx.block >= 0:  # 非正文段落不在块模型中
+        formatter.blocks.levels[ctx.block] = ctx.level
+    formatter._apply_style(para, ctx.level)
+
+
+@register_stage("indent")
+def _stage_indent(formatter, para, ctx):
+    formatter._normalize_paragraph_indent(para)
+
+
+@register_stage("captions", stories=(BODY,))  # 依赖正文块模型中的前后块
+def _stage_captions(formatter, para, ctx):
+    text = None
+    if formatter.classification is not None:
+        classification = formatter.classification
+        text = classification.cleaned_text(ctx.index)
+        if text is None:
+            text = classification.text(ctx.index)
+    formatter._preprocess_captions(para, ctx.block, text)
+
+
+# ----------------------------------------------------------------------
+# 内存中格式化（不写任何中间文件）
+# ----------------------------------------------------------------------
+def format_stream(in_fp, out_fp, config: dict, **options):
+    """
+    从二进制文件对象 in_fp 读取文档，格式化后写入 out_fp，返回 WordFormatter（可读取统计信息）。
+    in_fp 不能 seek 时先整体读入内存；out_fp 可以是不能 seek 的流（如管道）。
+    options 设置同名的 WordFormatter 属性（progress、cancel_event、instrument）。
+    失败时抛出 FormatError，取消时抛出 FormatCancelled。
+    """
+    if not in_fp.seekable():
+        in_fp = io.BytesIO(in_fp.read())
+    formatter = WordFormatter(in_fp, config)
+    for name, value in options.items():
+        setattr(formatter, name, value)
+    if not formatter.save(out_fp):
+        if formatter.cancelled:
+            raise FormatCancelled()
+        raise FormatError(formatter.last_error)
+    return formatter
+
+
+def format_bytes(data, config: dict, **options) -> bytes:
+    """格式化内存中的 .docx 数据，返回格式化后的 .docx 数据"""
+    out = io.BytesIO()
+    format_stream(io.BytesIO(data), out, config, **options)
+    return out.getvalue()
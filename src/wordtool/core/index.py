@@ -0,0 +1,95 @@
+"""
+文档元素索引。
+
+一次扫描记录哪些段落 / run 含有图片（DrawingML 的 w:drawing 和 VML 的 w:pict）、
+域代码、表格和分节符，之后各 stage 只需 O(1) 查询，
+不再对每个 run、每个段落反复执行未编译的 XPath。
+"""
+from lxml import etree
+
+from docx.oxml.ns import nsmap, qn
+
+_NS = {"w": nsmap["w"]}
+
+# 预编译 XPath
+_XP_OBJECTS = etree.XPath(
+    ".//w:drawing | .//w:pict | .//w:fldChar | .//w:fldSimple | .//w:instrText"
+    " | .//w:tbl | .//w:pPr/w:sectPr",
+    namespaces=_NS,
+)
+_XP_OWNERS = etree.XPath("ancestor::w:p | ancestor::w:r", namespaces=_NS)
+
+# 标志位
+DRAWING = 1      # DrawingML 图片/图形
+PICTURE = 2      # VML 图片（w:pict）
+FIELD = 4        # 域代码
+TABLE = 8        # 包含表格（如文本框中的表格）
+SECTION = 16     # 段落带分节符
+
+IMAGE = DRAWING | PICTURE
+
+_TBL = qn("w:tbl")
+_MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+_FLAG_BY_TAG = {
+    qn("w:drawing"): DRAWING,
+    qn("w:pict"): PICTURE,
+    qn("w:fldChar"): FIELD,
+    qn("w:fldSimple"): FIELD,
+    qn("w:instrText"): FIELD,
+    qn("w:tbl"): TABLE,
+    qn("w:sectPr"): SECTION,
+}
+
+
+class DocumentIndex:
+    def __init__(self):
+        self._flags = {}     # 段落/run 元素 -> 标志位
+        self.image_count = 0
+        self.table_count = 0
+        self.field_count = 0
+
+    @classmethod
+    def build(cls, root):
+        index = cls()
+        index.add(root)
+        return index
+
+    def add(self, subtree):
+        """扫描 subtree（正文或流式引擎中的单个块）并记录标志"""
+        flags = self._flags
+        if subtree.tag == _TBL:
+            self.table_count += 1
+        for elm in _XP_OBJECTS(subtree):
+            flag = _FLAG_BY_TAG[elm.tag]
+            if flag & IMAGE:
+                # mc:Fallback 中的 VML 是同一张图的兼容副本，不重复计数
+                if elm.getparent().tag != _MC_FALLBACK:
+                    self.image_count += 1
+            elif flag == TABLE:
+                self.table_count += 1
+            elif flag == FIELD:
+                self.field_count += 1
+            for owner in _XP_OWNERS(elm):
+                flags[owner] = flags.get(owner, 0) | flag
+
+    def forget(self, subtree):
+        """移除 subtree 中元素的记录（流式引擎处理完的块），计数保留"""
+        flags = self._flags
+        for elm in _XP_OBJECTS(subtree):
+            for owner in _XP_OWNERS(elm):
+                flags.pop(owner, None)
+
+    # ---------------------- 查询 ----------------------
+    def flags(self, elm):
+        return self._flags.get(elm, 0)
+
+    def has_image(self, elm):
+        """段落或 run 是否包含图片（w:drawing 或 w:pict）"""
+        return bool(self._flags.get(elm, 0) & IMAGE)
+
+    def has_field(self, elm):
+        return bool(self._flags.get(elm, 0) & FIELD)
+
+    def has_section_break(self, p):
+        return bool(self._flags.get(p, 0) & SECTION)
@@ -0,0 +1,93 @@
+"""
+性能统计（可选）。
+
+WordFormatter.instrument 默认为 None，此时 save() 只多几次 None 判断；
+设置为 Instrumentation 后记录：
+
+- 各阶段（读取、编号展开、建索引、段落处理、保存）的墙钟时间和 CPU 时间，
+  开始/结束时回调 on_start(name) / on_end(name, wall, cpu)
+- 每个段落 stage 的累计耗时和调用次数（只累加，不逐段回调）
+- 段落、run、图片、表格等计数，读写字节数，进程峰值内存
+"""
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss():
+    """进程峰值常驻内存（字节），平台不支持时返回 None"""
+    if resource is None:
+        return None
+    import sys
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class Instrumentation:
+    def __init__(self, on_start=None, on_end=None):
+        self.on_start = on_start
+        self.on_end = on_end
+        self.phases = {}      # 阶段名 -> [墙钟秒, CPU 秒]
+        self.stages = {}      # 段落 stage 名 -> [墙钟秒, CPU 秒, 调用次数]
+        self.counters = Counter()
+
+    # ---------------------- 阶段 ----------------------
+    @contextmanager
+    def phase(self, name):
+        if self.on_start is not None:
+            self.on_start(name)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            total = self.phases.setdefault(name, [0.0, 0.0])
+            total[0] += wall
+            total[1] += cpu
+            if self.on_end is not None:
+                self.on_end(name, wall, cpu)
+
+    # ---------------------- 段落 stage ----------------------
+    def wrap_stage(self, name, func):
+        """返回累计耗时的 stage 包装函数（只在启用统计时使用）"""
+        total = self.stages.setdefault(name, [0.0, 0.0, 0])
+        perf_counter = time.perf_counter
+        process_time = time.process_time
+
+        def timed(formatter, para, ctx):
+            wall = perf_counter()
+            cpu = process_time()
+            func(formatter, para, ctx)
+            total[0] += perf_counter() - wall
+            total[1] += process_time() - cpu
+            total[2] += 1
+
+        return timed
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    # ---------------------- 报告 ----------------------
+    def report(self):
+        """可直接序列化为 JSON 的统计结果"""
+        return {
+            "phases": {
+                name: {"wall": round(wall, 6), "cpu": round(cpu, 6)}
+                for name, (wall, cpu) in self.phases.items()
+            },
+            "stages": {
+                name: {"wall": round(wall, 6), "cpu": round(cpu, 6), "calls": calls}
+                for name, (wall, cpu, calls) in self.stages.items()
+            },
+            "counters": dict(self.counters),
+            "peak_rss": peak_rss(),
+        }
@@ -0,0 +1,207 @@
+"""
+输入包的惰性读取：代替 docx.Document(path)。
+
+python-docx 打开文档时把包中每个部件都读进内存（包括 word/media 下的全部图片），
+XML 部件还会立即解析。格式化只用到 document.xml、styles.xml、numbering.xml 等少数部件，
+图片等其余部件保存时由 package.save_document 从原文件原样复制，根本不需要读取。
+
+open_document() 按 python-docx 相同的方式遍历关系图、选择部件类型，但部件只记录成员名：
+- 二进制部件（图片、嵌入对象等）第一次读取 blob 时才解压，只是原样复制时永远不读
+- XML 部件第一次访问 element 时才解压、解析
+源文件是路径时用 mmap 映射，zip 目录和用到的成员按需换入，不占用额外的堆内存；
+文件对象（如服务收到的上传数据）直接使用。
+
+遍历关系图用到 python-docx 的内部接口（_ContentTypeMap、_SerializedRelationships、
+PartFactory._part_cls_for）。这些接口不存在或行为变化时 open_document() 抛出 LazyLoadError，
+调用方退回公开的 docx.Document()。
+"""
+import mmap
+import zipfile
+
+from docx.document import Document
+from docx.opc.constants import CONTENT_TYPE as CT
+from docx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI
+from docx.opc.part import PartFactory, XmlPart
+from docx.oxml.parser import parse_xml
+from docx.package import Package
+
+try:
+    from docx.opc.pkgreader import _ContentTypeMap, _SerializedRelationships
+except ImportError:  # python-docx 内部接口变化
+    _ContentTypeMap = _SerializedRelationships = None
+
+
+class LazyLoadError(Exception):
+    """当前 python-docx 版本不支持惰性读取"""
+
+
+class _MappedFile(mmap.mmap):
+    """只读映射的文件，补上 zipfile 需要的 seekable()"""
+
+    def seekable(self):
+        return True
+
+
+class PackageSource:
+    """源 zip 包：路径时 mmap 映射，文件对象直接读取。close() 之后不能再读取未加载的部件"""
+
+    def __init__(self, source):
+        self._file = None
+        self._map = None
+        if isinstance(source, (str, bytes)) or hasattr(source, "__fspath__"):
+            self._file = open(source, "rb")
+            try:
+                self._map = _MappedFile(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # 空文件等无法映射时按普通文件读取（随后由 zipfile 报告格式错误）
+                self._map = None
+            source = self._map if self._map is not None else self._file
+        self.zip = zipfile.ZipFile(source)
+        self.reads = 0  # 实际解压的成员数（含关系部件）
+
+    def read(self, membername):
+        data = self.zip.read(membername)
+        self.reads += 1
+        return data
+
+    def read_optional(self, membername):
+        try:
+            return self.read(membername)
+        except KeyError:
+            return None
+
+    def close(self):
+        self.zip.close()
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ----------------------------------------------------------------------
+# 惰性部件
+# ----------------------------------------------------------------------
+class _LazyBlob:
+    """_blob 在第一次读取时才从源包中解压"""
+
+    @property
+    def _blob(self):
+        blob = self.__dict__.get("_lazy_blob")
+        if blob is None:
+            blob = self.__dict__["_lazy_blob"] = self._source.read(self.partname.membername)
+        return blob
+
+    @_blob.setter
+    def _blob(self, value):
+        self.__dict__["_lazy_blob"] = value
+
+
+class _LazyElement:
+    """_element 在第一次访问时才解压、解析"""
+
+    @property
+    def _element(self):
+        element = self.__dict__.get("_lazy_element")
+        if element is None:
+            element = parse_xml(self._source.read(self.partname.membername))
+            self.__dict__["_lazy_element"] = element
+        return element
+
+    @_element.setter
+    def _element(self, value):
+        self.__dict__["_lazy_element"] = value
+
+
+_LAZY_CLASSES = {}
+
+
+def _lazy_class(cls):
+    """cls 的惰性版本（每个部件类型只生成一次）"""
+    lazy = _LAZY_CLASSES.get(cls)
+    if lazy is None:
+        mixin = _LazyElement if issubclass(cls, XmlPart) else _LazyBlob
+        lazy = _LAZY_CLASSES[cls] = type(f"Lazy{cls.__name__}", (mixin, cls), {})
+    return lazy
+
+
+def _part_class(content_type, reltype):
+    # 与 PartFactory 的选择顺序相同：先 part_class_selector，再按内容类型
+    cls = None
+    if PartFactory.part_class_selector is not None:
+        cls = PartFactory.part_class_selector(content_type, reltype)
+    return cls or PartFactory._part_cls_for(content_type)
+
+
+def _load_part(source, partname, content_type, reltype, package):
+    cls = _lazy_class(_part_class(content_type, reltype))
+    if issubclass(cls, XmlPart):
+        part = cls(partname, content_type, None, package)
+    else:
+        # ImagePart.load 等与 python-docx 打开时的构造方式保持一致
+        part = cls.load(partname, content_type, None, package)
+    part._source = source
+    return part
+
+
+# ----------------------------------------------------------------------
+# 打开文档
+# ----------------------------------------------------------------------
+def _rels_for(source, uri):
+    return _SerializedRelationships.load_from_xml(uri.baseURI, source.read_optional(uri.rels_uri.membername))
+
+
+def _walk(source, srels, content_types, package, parts, found):
+    # 与 PackageReader._walk_phys_parts 相同的深度优先顺序
+    for srel in srels:
+        if srel.is_external or srel.target_partname in parts:
+            continue
+        partname = srel.target_partname
+        parts[partname] = _load_part(source, partname, content_types[partname], srel.reltype, package)
+        part_srels = _rels_for(source, partname)
+        found.append((partname, part_srels))
+        _walk(source, part_srels, content_types, package, parts, found)
+
+
+def open_package(source):
+    """按关系图加载 source 中的部件（不读取部件内容），返回 python-docx 的 Package"""
+    content_types = _ContentTypeMap.from_xml(source.read(CONTENT_TYPES_URI.membername))
+    package = Package()
+    parts = {}
+    found = [(PACKAGE_URI, _rels_for(source, PACKAGE_URI))]
+    _walk(source, found[0][1], content_types, package, parts, found)
+
+    for uri, srels in found:
+        owner = package if uri == PACKAGE_URI else parts[uri]
+        for srel in srels:
+            target = srel.target_ref if srel.is_external else parts[srel.target_partname]
+            owner.load_rel(srel.reltype, target, srel.rId, srel.is_external)
+    for part in parts.values():
+        part.after_unmarshal()
+    package.after_unmarshal()
+    return package
+
+
+def open_document(source) -> Document:
+    """
+    代替 docx.Document(source)，source 为 PackageSource。
+    文档使用期间（直到保存完成）不能关闭 source。
+    python-docx 的内部接口不可用时抛出 LazyLoadError。
+    """
+    if _ContentTypeMap is None or not hasattr(PartFactory, "_part_cls_for"):
+        raise LazyLoadError("python-docx 缺少惰性读取需要的内部接口")
+    try:
+        package = open_package(source)
+    except (AttributeError, TypeError) as e:
+        raise LazyLoadError(f"{type(e).__name__}: {e}") from e
+    document_part = package.main_document_part
+    if document_part.content_type != CT.WML_DOCUMENT_MAIN:
+        raise ValueError(f"不是 Word 文档，内容类型为 '{document_part.content_type}'")
+    return document_part.document
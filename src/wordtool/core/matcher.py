@@ -0,0 +1,280 @@
+"""
+标题编号匹配器。
+
+根据配置里的 titles（title1~title4 的 format）一次性编译出一个带命名分组的
+组合正则，并按“首字符”建立分派表：绝大多数正文段落的首字符不可能是编号，
+查表即可直接排除，不必逐级执行正则。
+"""
+import re
+from collections import namedtuple
+
+try:  # Python 3.11+
+    import re._parser as _sre_parse
+    import re._constants as _sre_c
+except ImportError:  # pragma: no cover - Python < 3.11
+    import sre_parse as _sre_parse
+    import sre_constants as _sre_c
+
+
+# 匹配规则版本：修改匹配语义（预处理、前缀/空白的判定方式等）时加 1，
+# 使 ClassificationCache 中的旧结果失效
+RULES_VERSION = 1
+
+TITLE_FORMATS = [
+    "一", "一、", "（一）", "（一）、", "（一）.",
+    "（1）", "（1）、", "（1）.", "1", "1.", "1、",
+    "a", "a.", "A", "A.", "①", "I", "I.", "（I）"
+]
+
+_FORMAT_TO_REGEX = {
+    # ------------------ 中文大写数字类 -------------------
+    "一": r"^[一二三四五六七八九十]+\s*",  # 匹配 "一 " 或 "二 " (无标点)
+    "一、": r"^[一二三四五六七八九十]+[、\.]\s*",  # 匹配 "一、", "二.", "三 " (带顿号或点号)
+    "（一）": r"^（[一二三四五六七八九十]+）\s*",  # 匹配 "(一) ", "(二) "
+    "（一）、": r"^（[一二三四五六七八九十]+）[、\.]?\s*",  # 匹配 "(一) 、", "(二) ", "(三)."
+    "（一）.": r"^（[一二三四五六七八九十]+）[、\.]\s*",  # 同上，匹配带点号或顿号
+
+    # ------------------ 阿拉伯数字类 ----------------------
+    "1": r"^\d+\s*",  # 匹配 "1 " 或 "2 " (无标点)
+    "1.": r"^\d+[、\.]\s*",  # 匹配 "1.", "2、", "3 " (带点号或顿号)
+    "1、": r"^\d+[、\.]\s*",  # 同上
+    "（1）": r"^（\d+）\s*",  # 匹配 "(1) ", "(2) "
+    "（1）、": r"^（\d+）[、\.]?\s*",  # 匹配 "(1) 、", "(2) ", "(3)."
+    "（1）.": r"^（\d+）[、\.]\s*",  # 同上
+
+    # ------------------ 字母和罗马数字类 --------------------
+    "a": r"^[a-z]{1,2}\s*",  # 匹配 "a " 或 "b "
+    "a.": r"^[a-z]{1,2}[、\.]\s*",  # 匹配 "a.", "b、"
+    "A": r"^[A-Z]{1,2}\s*",  # 匹配 "A " 或 "B "
+    "A.": r"^[A-Z]{1,2}[、\.]\s*",  # 匹配 "A.", "B、"
+    "I": r"^[IVXLCDM]+\s*",  # 匹配 "I " 或 "II "
+    "I.": r"^[IVXLCDM]+[、\.]\s*",  # 匹配 "I.", "II、"
+    "（I）": r"^（[IVXLCDM]+）\s*",  # 匹配 "(I) ", "(II) "
+
+    # ------------------ 特殊符号类 -------------------------
+    "①": r"^[①②③④⑤⑥⑦⑧⑨⑩]+\s*",  # 匹配带圈数字
+}
+
+# 匹配结果：
+# level      标题等级 1~4
+# span       编号前缀（不含其后空白）的 (start, end)
+# body_start 标题正文开始的位置（编号后空白之后）
+TitleMatch = namedtuple("TitleMatch", "level span body_start")
+
+
+# ----------------------------------------------------------------------
+# 自定义编号格式
+# ----------------------------------------------------------------------
+def compile_custom_formats(custom: dict) -> dict:
+    """
+    校验配置里的 "custom_formats"：{格式名: 正则}。
+    正则必须能编译、以 ^ 开头做前缀匹配，且不能匹配空字符串；
+    不能引用分组（\\1、(?(1)...)）：格式放进组合正则后分组编号会整体后移，引用会指向别的分组。
+    返回 {格式名: 正则字符串}；存在非法格式时抛出 ValueError。
+    """
+    formats = {}
+    errors = []
+    for name, pattern in (custom or {}).items():
+        if not isinstance(pattern, str) or not pattern.startswith("^"):
+            errors.append(f"{name}: 正则必须以 ^ 开头")
+            continue
+        try:
+            compiled = re.compile(pattern)
+        except re.error as e:
+            errors.append(f"{name}: {e}")
+            continue
+        if compiled.groupindex:
+            errors.append(f"{name}: 不支持命名分组")
+            continue
+        if _has_group_reference(_sre_parse.parse(pattern)):
+            errors.append(f"{name}: 不支持引用分组（\\1、(?(1)...)）")
+            continue
+        if compiled.match(""):
+            errors.append(f"{name}: 不能匹配空字符串")
+            continue
+        formats[name] = pattern
+    if errors:
+        raise ValueError("自定义编号格式无效：" + "；".join(errors))
+    return formats
+
+
+def _has_group_reference(items):
+    """解析树中是否有反向引用或条件分组"""
+    for op, av in items:
+        if op in (_sre_c.GROUPREF, _sre_c.GROUPREF_EXISTS, _sre_c.GROUPREF_IGNORE):
+            return True
+        for value in av if isinstance(av, (tuple, list)) else ():
+            if isinstance(value, _sre_parse.SubPattern):
+                if _has_group_reference(value):
+                    return True
+            elif isinstance(value, list):  # BRANCH 的各分支
+                if any(isinstance(b, _sre_parse.SubPattern) and _has_group_reference(b) for b in value):
+                    return True
+    return False
+
+
+# ----------------------------------------------------------------------
+# 首字符集合推导
+# ----------------------------------------------------------------------
+_DIGIT = "digit"      # \d 开头，用 str.isdecimal 判断
+_RANGE_LIMIT = 4096   # 字符区间过大时放弃建表
+
+
+def _first_chars(pattern):
+    """
+    推导正则可能匹配到的首字符集合。
+    返回 (chars, digit)；无法确定时返回 None（该级别每段都需要尝试）。
+    """
+    try:
+        parsed = _sre_parse.parse(pattern)
+    except re.error:
+        return None
+    result = _first_of(list(parsed))
+    if result is None or result[2]:
+        # 可能匹配空串时首字符不确定
+        return None
+    return result[0], result[1]
+
+
+def _first_of(items):
+    """返回 (chars, digit, nullable)"""
+    chars = set()
+    digit = False
+    for op, av in items:
+        if op is _sre_c.AT:
+            continue
+        if op is _sre_c.LITERAL:
+            chars.add(chr(av))
+            return chars, digit, False
+        if op is _sre_c.IN:
+            sub = _in_chars(av)
+            if sub is None:
+                return None
+            chars |= sub[0]
+            return chars, digit or sub[1], False
+        if op in (_sre_c.MAX_REPEAT, _sre_c.MIN_REPEAT) or getattr(op, "name", "") == "POSSESSIVE_REPEAT":
+            low, _, sub_items = av
+            sub = _first_of(list(sub_items))
+            if sub is None:
+                return None
+            chars |= sub[0]
+            digit = digit or sub[1]
+            if low > 0 and not sub[2]:
+                return chars, digit, False
+            continue
+        if op is _sre_c.SUBPATTERN:
+            sub = _first_of(list(av[-1]))
+            if sub is None:
+                return None
+            chars |= sub[0]
+            digit = digit or sub[1]
+            if not sub[2]:
+                return chars, digit, False
+            continue
+        if op is _sre_c.BRANCH:
+            nullable = False
+            for branch in av[1]:
+                sub = _first_of(list(branch))
+                if sub is None:
+                    return None
+                chars |= sub[0]
+                digit = digit or sub[1]
+                nullable = nullable or sub[2]
+            if not nullable:
+                return chars, digit, False
+            continue
+        return None
+    return chars, digit, True
+
+
+def _in_chars(av):
+    chars = set()
+    digit = False
+    for op, value in av:
+        if op is _sre_c.LITERAL:
+            chars.add(chr(value))
+        elif op is _sre_c.RANGE:
+            low, high = value
+            if high - low > _RANGE_LIMIT:
+                return None
+            chars.update(chr(c) for c in range(low, high + 1))
+        elif op is _sre_c.CATEGORY and value is _sre_c.CATEGORY_DIGIT:
+            digit = True
+        else:
+            return None
+    return chars, digit
+
+
+# ----------------------------------------------------------------------
+# 匹配器
+# ----------------------------------------------------------------------
+class TitleMatcher:
+    """
+    由 titles 配置一次性构建：
+    - 一个组合正则 (?P<t1>...)|(?P<t2>...)|...，按等级顺序尝试，与逐级 re.match 等价
+    - 首字符分派表：首字符不可能是任何编号时直接返回 None
+    """
+
+    def __init__(self, titles: dict, custom_formats: dict = None):
+        formats = dict(_FORMAT_TO_REGEX)
+        formats.update(compile_custom_formats(custom_formats))
+
+        self.levels = {}   # level -> 格式名
+        parts = []
+        dispatch = {}
+        digit_levels = []
+        any_levels = []
+        for level in range(1, 5):
+            fmt = (titles.get(f"title{level}", {}) or {}).get("format", "")
+            if not fmt:
+                continue
+            regex = formats.get(fmt)
+            if regex is None:
+                raise ValueError(f"title{level} 的编号格式未定义：{fmt}")
+            self.levels[level] = fmt
+            parts.append(f"(?P<t{level}>{regex})")
+
+            first = _first_chars(regex)
+            if first is None:
+                any_levels.append(level)
+                continue
+            chars, digit = first
+            for ch in chars:
+                dispatch.setdefault(ch, []).append(level)
+            if digit:
+                digit_levels.append(level)
+
+        # 组合正则的源码，同时作为分类缓存的配置指纹
+        self.pattern = "|".join(parts)
+        self._regex = re.compile(self.pattern) if parts else None
+        self._dispatch = {ch: tuple(v) for ch, v in dispatch.items()}
+        self._digit_levels = tuple(digit_levels)
+        self._any_levels = tuple(any_levels)
+
+    @classmethod
+    def from_config(cls, config: dict):
+        return cls(config.get("titles", {}), config.get("custom_formats"))
+
+    def could_match(self, ch):
+        """首字符 ch 是否可能是某级编号的开头（O(1)）"""
+        if self._any_levels:
+            return True
+        return ch in self._dispatch or (bool(self._digit_levels) and ch.isdecimal())
+
+    def match(self, text):
+        """
+        对 text 做前缀匹配，返回 TitleMatch；不是标题时返回 None。
+        """
+        if not text or self._regex is None or not self.could_match(text[0]):
+            return None
+        m = self._regex.match(text)
+        if m is None:
+            return None
+        level = int(m.lastgroup[1:])
+        end = m.end()
+        prefix_end = len(text[:end].rstrip())
+        return TitleMatch(level, (m.start(), prefix_end), end)
+
+    def detect_level(self, text):
+        m = self.match(text)
+        return m.level if m is not None else 0
@@ -0,0 +1,407 @@
+"""
+纯 OOXML 的自动编号展开器。
+
+读取 numbering.xml（abstractNum / num / lvl、lvlText、numFmt、start、
+lvlRestart、lvlOverride/startOverride）以及每个段落的 w:numPr，
+按文档顺序计算编号文本，并把编号作为普通文本直接写回段落，
+效果等同 Word 的 ConvertNumbersToText，但不需要启动 Word。
+"""
+from copy import deepcopy
+
+from lxml import etree
+
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+
+
+_P = qn("w:p")
+
+
+# ----------------------------------------------------------------------
+# 编号格式渲染
+# ----------------------------------------------------------------------
+_CN_DIGITS = "零一二三四五六七八九"
+_CN_UNITS = ["", "十", "百", "千"]
+_IDEOGRAPH_TRADITIONAL = "甲乙丙丁戊己庚辛壬癸"
+_IDEOGRAPH_ZODIAC = "子丑寅卯辰巳午未申酉戌亥"
+_ROMAN = [
+    (1000, "M"), (900, "CM"), (500, "D"), (400, "CD"),
+    (100, "C"), (90, "XC"), (50, "L"), (40, "XL"),
+    (10, "X"), (9, "IX"), (5, "V"), (4, "IV"), (1, "I"),
+]
+
+
+def _to_roman(n: int) -> str:
+    if n <= 0:
+        return str(n)
+    out = []
+    for value, numeral in _ROMAN:
+        while n >= value:
+            out.append(numeral)
+            n -= value
+    return "".join(out)
+
+
+def _to_letter(n: int) -> str:
+    # Word 的字母编号：a..z, aa..zz, aaa..
+    if n <= 0:
+        return str(n)
+    return chr(ord("a") + (n - 1) % 26) * ((n - 1) // 26 + 1)
+
+
+def _to_chinese(n: int) -> str:
+    """1 -> 一, 10 -> 十, 21 -> 二十一, 105 -> 一百零五"""
+    if n <= 0:
+        return _CN_DIGITS[0] if n == 0 else str(n)
+    if n >= 10000:
+        return str(n)
+    digits = [int(c) for c in str(n)]
+    out = []
+    zero_pending = False
+    for pos, d in enumerate(digits):
+        unit = _CN_UNITS[len(digits) - pos - 1]
+        if d == 0:
+            zero_pending = bool(out)
+            continue
+        if zero_pending:
+            out.append(_CN_DIGITS[0])
+            zero_pending = False
+        out.append(_CN_DIGITS[d] + unit)
+    text = "".join(out)
+    # 10~19 习惯写作 "十"、"十一"
+    if text.startswith("一十"):
+        text = text[1:]
+    return text
+
+
+def _to_circled(n: int) -> str:
+    if 1 <= n <= 20:
+        return chr(0x2460 + n - 1)
+    return str(n)
+
+
+def _to_fullwidth(n: int) -> str:
+    return "".join(chr(ord(c) - ord("0") + 0xFF10) for c in str(n))
+
+
+_FORMATTERS = {
+    "decimal": str,
+    "decimalZero": lambda n: f"{n:02d}",
+    "decimalFullWidth": _to_fullwidth,
+    "decimalFullWidth2": _to_fullwidth,
+    "decimalHalfWidth": str,
+    "upperRoman": _to_roman,
+    "lowerRoman": lambda n: _to_roman(n).lower(),
+    "upperLetter": lambda n: _to_letter(n).upper(),
+    "lowerLetter": _to_letter,
+    "chineseCounting": _to_chinese,
+    "chineseCountingThousand": _to_chinese,
+    "chineseLegalSimplified": _to_chinese,
+    "japaneseCounting": _to_chinese,
+    "taiwaneseCounting": _to_chinese,
+    "ideographDigital": _to_chinese,
+    "decimalEnclosedCircle": _to_circled,
+    "decimalEnclosedCircleChinese": _to_circled,
+    "decimalEnclosedFullstop": lambda n: f"{n}.",
+    "decimalEnclosedParen": lambda n: f"({n})",
+    "ideographTraditional": lambda n: _IDEOGRAPH_TRADITIONAL[(n - 1) % 10] if n > 0 else str(n),
+    "ideographZodiac": lambda n: _IDEOGRAPH_ZODIAC[(n - 1) % 12] if n > 0 else str(n),
+    "none": lambda n: "",
+}
+
+
+def format_number(n: int, num_fmt: str) -> str:
+    """
+    把计数值按 numFmt 渲染成文本，未知格式按阿拉伯数字处理。
+    """
+    return _FORMATTERS.get(num_fmt, str)(n)
+
+
+# ----------------------------------------------------------------------
+# 编号定义
+# ----------------------------------------------------------------------
+def _val(elm, tag, default=None):
+    """读取 elm 下子元素 tag 的 w:val 属性"""
+    if elm is None:
+        return default
+    child = elm.find(qn(tag))
+    if child is None:
+        return default
+    value = child.get(qn("w:val"))
+    return default if value is None else value
+
+
+def _int(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class _Level:
+    __slots__ = ("start", "num_fmt", "lvl_text", "restart", "is_lgl", "suffix", "rPr")
+
+    def __init__(self, lvl):
+        self.start = _int(_val(lvl, "w:start"), 1)
+        self.num_fmt = _val(lvl, "w:numFmt", "decimal")
+        self.lvl_text = _val(lvl, "w:lvlText", "")
+        self.restart = _int(_val(lvl, "w:lvlRestart"), None)
+        self.is_lgl = lvl.find(qn("w:isLgl")) is not None
+        self.suffix = {"space": " ", "nothing": ""}.get(_val(lvl, "w:suff"), "\t")
+        self.rPr = lvl.find(qn("w:rPr"))
+
+
+class NumberingExpander:
+    """
+    按文档顺序逐段调用 expand(p)，即可把自动编号展开成文本。
+
+    计数器按 abstractNum 维护（Word 中共用同一 abstractNum 的 num 会连续编号），
+    num 上的 startOverride 会在该 num 第一次出现时重置对应级别。
+    """
+
+    def __init__(self, numbering_element, styles_element=None):
+        self._abstracts = {}     # abstractNumId -> {ilvl: _Level}
+        self._style_links = {}   # abstractNumId -> numStyleLink 样式 id
+        self._nums = {}          # numId -> (abstractNumId, {ilvl: start override}, {ilvl: _Level})
+        self._style_numpr = {}   # 段落样式 id -> (numId, ilvl)
+        self._counters = {}      # abstractNumId -> [计数值] * 9
+        self._seen_nums = set()
+
+        if styles_element is not None:
+            self._load_styles(styles_element)
+        if numbering_element is not None:
+            self._load_numbering(numbering_element)
+
+    @classmethod
+    def from_document(cls, doc):
+        """
+        从 python-docx 的 Document 构建；文档没有 numbering 部件时返回 None。
+        注意不能访问 doc.part.numbering_part，它会在缺失时新建部件。
+        """
+        from docx.opc.constants import RELATIONSHIP_TYPE as RT
+
+        try:
+            numbering_part = doc.part.part_related_by(RT.NUMBERING)
+        except KeyError:
+            return None
+        return cls(numbering_part.element, doc.styles.element)
+
+    # ---------------------- 解析 ----------------------
+    def _load_styles(self, styles_element):
+        based_on = {}
+        direct = {}
+        for style in styles_element.iterfind(qn("w:style")):
+            if style.get(qn("w:type")) not in ("paragraph", "numbering"):
+                continue
+            style_id = style.get(qn("w:styleId"))
+            based_on[style_id] = _val(style, "w:basedOn")
+            numPr = style.find(f"{qn('w:pPr')}/{qn('w:numPr')}")
+            if numPr is not None:
+                direct[style_id] = (_val(numPr, "w:numId"), _int(_val(numPr, "w:ilvl"), 0))
+
+        # 沿 basedOn 链继承编号
+        for style_id in based_on:
+            seen = set()
+            current = style_id
+            while current is not None and current not in seen:
+                if current in direct:
+                    self._style_numpr[style_id] = direct[current]
+                    break
+                seen.add(current)
+                current = based_on.get(current)
+
+    def _load_numbering(self, numbering_element):
+        for abstract in numbering_element.iterfind(qn("w:abstractNum")):
+            abstract_id = abstract.get(qn("w:abstractNumId"))
+            self._abstracts[abstract_id] = {
+                _int(lvl.get(qn("w:ilvl")), 0): _Level(lvl)
+                for lvl in abstract.iterfind(qn("w:lvl"))
+            }
+            link = _val(abstract, "w:numStyleLink")
+            if link:
+                self._style_links[abstract_id] = link
+
+        for num in numbering_element.iterfind(qn("w:num")):
+            num_id = num.get(qn("w:numId"))
+            abstract_id = _val(num, "w:abstractNumId")
+            starts = {}
+            levels = {}
+            for override in num.iterfind(qn("w:lvlOverride")):
+                ilvl = _int(override.get(qn("w:ilvl")), 0)
+                start = _val(override, "w:startOverride")
+                if start is not None:
+                    starts[ilvl] = _int(start, 1)
+                lvl = override.find(qn("w:lvl"))
+                if lvl is not None:
+                    levels[ilvl] = _Level(lvl)
+            self._nums[num_id] = (abstract_id, starts, levels)
+
+    def _resolve_abstract(self, abstract_id):
+        """处理 numStyleLink：定义实际位于编号样式引用的 num 上"""
+        seen = set()
+        while abstract_id in self._style_links and abstract_id not in seen:
+            seen.add(abstract_id)
+            linked = self._style_numpr.get(self._style_links[abstract_id])
+            if linked is None or linked[0] not in self._nums:
+                break
+            abstract_id = self._nums[linked[0]][0]
+        return abstract_id
+
+    # ---------------------- 计算编号 ----------------------
+    def _numpr_of(self, p):
+        """返回 (numId, ilvl)，段落没有编号时返回 None"""
+        pPr = p.find(qn("w:pPr"))
+        numPr = pPr.find(qn("w:numPr")) if pPr is not None else None
+        style_id = _val(pPr, "w:pStyle")
+        style_numpr = self._style_numpr.get(style_id)
+
+        if numPr is not None:
+            num_id = _val(numPr, "w:numId")
+            ilvl = _val(numPr, "w:ilvl")
+            if num_id is None and style_numpr is not None:
+                num_id = style_numpr[0]
+            if ilvl is None:
+                ilvl = style_numpr[1] if style_numpr is not None else 0
+            return num_id, _int(ilvl, 0)
+        if style_numpr is not None:
+            return style_numpr
+        return None
+
+    def render(self, p):
+        """
+        计算段落的编号文本（含后缀），不修改段落。
+        会推进计数器，因此必须按文档顺序调用。
+        返回 (text, suffix, level)，没有编号时返回 None。
+        """
+        numpr = self._numpr_of(p)
+        if numpr is None:
+            return None
+        num_id, ilvl = numpr
+        if num_id in (None, "0") or num_id not in self._nums:
+            return None
+
+        abstract_id, starts, overrides = self._nums[num_id]
+        abstract_id = self._resolve_abstract(abstract_id)
+        base_levels = self._abstracts.get(abstract_id, {})
+        levels = {**base_levels, **overrides}
+        level = levels.get(ilvl)
+        if level is None:
+            return None
+
+        counters = self._counters.get(abstract_id)
+        if counters is None:
+            counters = self._counters[abstract_id] = [None] * 9
+
+        # num 第一次出现时应用 startOverride
+        if num_id not in self._seen_nums:
+            self._seen_nums.add(num_id)
+            for o_ilvl, start in starts.items():
+                if 0 <= o_ilvl < 9:
+                    counters[o_ilvl] = start - 1
+
+        # 推进当前级别
+        if counters[ilvl] is None:
+            counters[ilvl] = level.start
+        else:
+            counters[ilvl] += 1
+
+        # 重置更深的级别
+        for deeper in range(ilvl + 1, 9):
+            deeper_level = levels.get(deeper)
+            restart = deeper_level.restart if deeper_level is not None else None
+            if restart == 0:
+                continue
+            if restart is None or ilvl < restart:
+                counters[deeper] = None
+
+        # 渲染 lvlText 中的 %1..%9
+        text = level.lvl_text
+        if level.num_fmt != "bullet":
+            for n in range(ilvl + 1, 0, -1):
+                placeholder = f"%{n}"
+                if placeholder not in text:
+                    continue
+                ref_level = levels.get(n - 1)
+                value = counters[n - 1]
+                if value is None:
+                    value = ref_level.start if ref_level is not None else 1
+                num_fmt = ref_level.num_fmt if ref_level is not None else "decimal"
+                if level.is_lgl and n - 1 < ilvl:
+                    num_fmt = "decimal"
+                text = text.replace(placeholder, format_number(value, num_fmt))
+        return text, level.suffix, level
+
+    # ---------------------- 写回段落 ----------------------
+    def expand(self, p):
+        """
+        展开单个段落的编号：在段首插入编号文本 run，并移除/屏蔽 numPr。
+        返回是否展开。
+        """
+        rendered = self.render(p)
+        if rendered is None:
+            return False
+        text, suffix, level = rendered
+
+        pPr = p.find(qn("w:pPr"))
+        numPr = pPr.find(qn("w:numPr"))
+        if numPr is not None:
+            pPr.remove(numPr)
+        if _val(pPr, "w:pStyle") in self._style_numpr:
+            # 段落样式自带编号：写入 numId=0 屏蔽样式编号
+            numPr = OxmlElement("w:numPr")
+            num_id = OxmlElement("w:numId")
+            num_id.set(qn("w:val"), "0")
+            numPr.append(num_id)
+            _insert_numpr(pPr, numPr)
+
+        if not text and not suffix:
+            return True
+
+        r = OxmlElement("w:r")
+        if level.rPr is not None:
+            r.append(deepcopy(level.rPr))
+        if text:
+            t = OxmlElement("w:t")
+            t.text = text
+            t.set("{http://www.w3.org/XML/1998/namespace}space", "preserve")
+            r.append(t)
+        if suffix == "\t":
+            r.append(OxmlElement("w:tab"))
+        elif suffix:
+            t = OxmlElement("w:t")
+            t.text = suffix
+            t.set("{http://www.w3.org/XML/1998/namespace}space", "preserve")
+            r.append(t)
+        pPr.addnext(r)
+        return True
+
+    def expand_all(self, paragraphs):
+        """按顺序展开一组段落元素，返回展开的段落数"""
+        count = 0
+        for p in paragraphs:
+            if self.expand(p):
+                count += 1
+        return count
+
+    def expand_tree(self, root):
+        """
+        展开 root 下（含 root 本身）的全部段落：正文、表格单元格、内容控件和文本框中的段落都参与计数，
+        与 Word 显示的编号一致。按段落结束的顺序（文本框中的段落在所在段落之前，与 verify.py 相同）。
+        """
+        return self.expand_all([p for _, p in etree.iterwalk(root, events=("end",), tag=_P)])
+
+
+def _insert_numpr(pPr, numPr):
+    # numPr 在 pPr 中位于 pStyle/keepNext/keepLines/pageBreakBefore/framePr/widowControl 之后
+    preceding = {qn(t) for t in (
+        "w:pStyle", "w:keepNext", "w:keepLines", "w:pageBreakBefore",
+        "w:framePr", "w:widowControl",
+    )}
+    anchor = None
+    for child in pPr:
+        if child.tag in preceding:
+            anchor = child
+    if anchor is None:
+        pPr.insert(0, numPr)
+    else:
+        anchor.addnext(numPr)
@@ -0,0 +1,374 @@
+"""
+输出包写入：未修改的部件直接复制 zip 中的压缩数据，不解压也不重新压缩。
+
+python-docx 的 doc.save() 会重新序列化、重新压缩包中的每一个部件，
+图片多的文档大部分保存时间都花在逐字节不变的 word/media/* 上。
+save_document() 只重新写入实际修改过的部件（document.xml、样式模式下的 styles.xml）
+和很小的 [Content_Types].xml、关系部件，其余部件从原文件原样复制：
+本地文件头按原成员的压缩方式、CRC、大小重新生成，压缩数据逐块复制，中央目录由写入器自己生成。
+PackageWriter 直接写出 zip 格式，不借用 zipfile 的内部状态；读取只用到 ZipInfo 的公开字段。
+
+重新压缩的大部件按 1MB 分块并行 deflate：zlib 压缩时释放 GIL，
+每块以前一块末尾 32KB 作为预设字典，压缩率与单线程基本相同。
+
+另有直接读取 zip 中关系部件（*.rels）的函数，供不经过 python-docx 的流式引擎、分析、校验使用。
+"""
+import os
+import posixpath
+import struct
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from lxml import etree
+
+from docx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI
+
+try:
+    from docx.opc.pkgwriter import _ContentTypesItem
+except ImportError:  # python-docx 内部接口变化时退回 doc.save()
+    _ContentTypesItem = None
+
+DEFAULT_COMPRESSLEVEL = 6
+
+_DEFLATE_CHUNK = 1024 * 1024
+_WINDOW = 32 * 1024
+_COPY_CHUNK = 64 * 1024
+
+# zip 本地文件头：签名、所需版本、标志、压缩方式、时间、日期、CRC、压缩后大小、原大小、文件名长度、扩展字段长度
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+# 中央目录项：签名、创建版本、所需版本、标志、压缩方式、时间、日期、CRC、压缩后大小、原大小、
+# 文件名长度、扩展字段长度、注释长度、起始磁盘、内部属性、外部属性、本地文件头偏移
+_CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+_CENTRAL_HEADER_SIGNATURE = b"PK\x01\x02"
+# 中央目录结束记录：签名、磁盘号、目录所在磁盘、本盘项数、总项数、目录大小、目录偏移、注释长度
+_END_RECORD = struct.Struct("<4s4H2LH")
+_END_RECORD_SIGNATURE = b"PK\x05\x06"
+# 数据描述符（大小事先未知的成员）：签名、CRC、压缩后大小、原大小
+_DATA_DESCRIPTOR = struct.Struct("<4s3L")
+_DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+_VERSION = 20                      # 2.0：deflate
+_CREATE_VERSION = (3 << 8) | _VERSION  # 3 = Unix，外部属性为权限位
+_LIMIT = 0xFFFFFFFF
+
+_RELATIONSHIP = "{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"
+
+
+def default_workers():
+    return min(4, os.cpu_count() or 1)
+
+
+def deflate(data, level=DEFAULT_COMPRESSLEVEL, workers=1):
+    """raw deflate 压缩，返回压缩数据块列表（按顺序拼接即为完整的 deflate 流）"""
+    view = memoryview(data)
+    if workers <= 1 or len(view) < 2 * _DEFLATE_CHUNK:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        return [compressor.compress(view), compressor.flush()]
+
+    starts = range(0, len(view), _DEFLATE_CHUNK)
+    last = starts[-1]
+
+    def compress(start):
+        if start:
+            compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=view[start - _WINDOW:start])
+        else:
+            compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        out = compressor.compress(view[start:start + _DEFLATE_CHUNK])
+        # 中间块用同步刷新结束（字节对齐且不是最后一块），拼接后仍是合法的 deflate 流
+        return out + compressor.flush(zlib.Z_FINISH if start == last else zlib.Z_SYNC_FLUSH)
+
+    with ThreadPoolExecutor(workers) as pool:
+        return list(pool.map(compress, starts))
+
+
+def _iter_raw(fp, size):
+    while size > 0:
+        chunk = fp.read(min(_COPY_CHUNK, size))
+        if not chunk:
+            raise zipfile.BadZipFile("压缩数据不完整")
+        size -= len(chunk)
+        yield chunk
+
+
+def _dos_time(date_time):
+    year, month, day, hour, minute, second = date_time
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+
+@contextmanager
+def open_source(source):
+    """以二进制方式打开源包（路径或可 seek 的文件对象），供 PackageWriter.copy() 读取原始压缩数据"""
+    if isinstance(source, (str, bytes)) or hasattr(source, "__fspath__"):
+        with open(source, "rb") as f:
+            yield f
+    else:
+        yield source
+
+
+# ----------------------------------------------------------------------
+# 关系部件
+# ----------------------------------------------------------------------
+def rels_name(part_name):
+    """部件的关系部件名；part_name 为 None 时为包关系 _rels/.rels"""
+    if not part_name:
+        return "_rels/.rels"
+    directory, name = posixpath.split(part_name)
+    return posixpath.join(directory, "_rels", name + ".rels")
+
+
+def iter_relationships(zin, part_name):
+    """生成部件的全部关系 (关系类型, 目标, 是否外部)；内部关系的目标解析为成员名"""
+    try:
+        data = zin.read(rels_name(part_name))
+    except KeyError:
+        return
+    base = posixpath.dirname(part_name) if part_name else ""
+    for rel in etree.fromstring(data).iter(_RELATIONSHIP):
+        target = rel.get("Target", "")
+        external = rel.get("TargetMode") == "External"
+        if not external:
+            target = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join(base, target))
+        yield rel.get("Type"), target, external
+
+
+def iter_rels(zin, part_name):
+    """生成 (关系类型, 目标部件名)（只取内部关系）"""
+    for rel_type, name, external in iter_relationships(zin, part_name):
+        if not external:
+            yield rel_type, name
+
+
+def read_rels(zin, part_name):
+    """返回 {关系类型: 目标部件名}，同一类型有多个目标时取第一个"""
+    rels = {}
+    for rel_type, name in iter_rels(zin, part_name):
+        rels.setdefault(rel_type, name)
+    return rels
+
+
+# ----------------------------------------------------------------------
+# 写入器
+# ----------------------------------------------------------------------
+class _Entry:
+    """已写出的成员，关闭时写入中央目录"""
+
+    __slots__ = ("name", "date_time", "external_attr", "flags", "method", "crc",
+                 "compress_size", "file_size", "offset")
+
+    def __init__(self, name, date_time, external_attr, flags, method):
+        self.name = name.encode("utf-8")
+        self.date_time = date_time
+        self.external_attr = external_attr
+        self.flags = flags | (0 if name.isascii() else _FLAG_UTF8)
+        self.method = method
+        self.crc = 0
+        self.compress_size = 0
+        self.file_size = 0
+        self.offset = 0
+
+
+class _EntryStream:
+    """PackageWriter.open() 返回的写入对象：逐块压缩，结束时写数据描述符"""
+
+    def __init__(self, writer, entry, level):
+        self._writer = writer
+        self._entry = entry
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+
+    def write(self, data):
+        entry = self._entry
+        entry.crc = zlib.crc32(data, entry.crc)
+        entry.file_size += len(data)
+        out = self._compressor.compress(data)
+        if out:
+            entry.compress_size += len(out)
+            self._writer._write(out)
+        return len(data)
+
+    def close(self):
+        if self._compressor is None:
+            return
+        entry = self._entry
+        out = self._compressor.flush()
+        self._compressor = None
+        entry.compress_size += len(out)
+        self._writer._write(out)
+        self._writer._check_size(entry)
+        self._writer._write(_DATA_DESCRIPTOR.pack(
+            _DATA_DESCRIPTOR_SIGNATURE, entry.crc, entry.compress_size, entry.file_size))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PackageWriter:
+    """
+    直接写出 zip 包，三种写法：
+    copy() 原样复制另一个 zip 成员的压缩数据；write() 用并行 deflate 压缩写入；
+    open() 逐步写入大小事先未知的成员。不支持 zip64（单个成员或整个包超过 4GB）。
+    """
+
+    def __init__(self, file, compresslevel=DEFAULT_COMPRESSLEVEL, workers=1):
+        self.compresslevel = DEFAULT_COMPRESSLEVEL if compresslevel is None else compresslevel
+        self.workers = workers
+        if isinstance(file, (str, bytes)) or hasattr(file, "__fspath__"):
+            self._fp = open(file, "wb")
+            self._own = True
+        else:
+            self._fp = file
+            self._own = False
+        try:
+            self._start = self._fp.tell()
+        except (AttributeError, OSError):  # 不可 seek 的流（如标准输出）
+            self._start = 0
+        self._offset = 0
+        self._entries = []
+        self._closed = False
+        self.copied = 0    # 原样复制的成员数
+        self.written = 0   # 重新压缩写入的成员数
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        elif self._own:
+            self._fp.close()
+
+    def close(self):
+        """写入中央目录和结束记录"""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            directory_offset = self._offset
+            for entry in self._entries:
+                hour_minute, date = _dos_time(entry.date_time)
+                self._write(_CENTRAL_HEADER.pack(
+                    _CENTRAL_HEADER_SIGNATURE, _CREATE_VERSION, _VERSION, entry.flags, entry.method,
+                    hour_minute, date, entry.crc, entry.compress_size, entry.file_size,
+                    len(entry.name), 0, 0, 0, 0, entry.external_attr, entry.offset,
+                ))
+                self._write(entry.name)
+            if len(self._entries) > 0xFFFF or self._offset > _LIMIT:
+                raise zipfile.LargeZipFile("输出包过大（需要 zip64）")
+            count = len(self._entries)
+            self._write(_END_RECORD.pack(
+                _END_RECORD_SIGNATURE, 0, 0, count, count,
+                self._offset - directory_offset, directory_offset, 0,
+            ))
+            self._fp.flush()
+        finally:
+            if self._own:
+                self._fp.close()
+
+    def copy(self, src, info):
+        """
+        复制 src（源包的二进制文件，见 open_source）中成员 info 的压缩数据，
+        压缩方式、CRC、大小、时间、属性都与原成员相同，不解压。
+        """
+        src.seek(info.header_offset)
+        header = _LOCAL_HEADER.unpack(src.read(_LOCAL_HEADER.size))
+        if header[0] != _LOCAL_HEADER_SIGNATURE:
+            raise zipfile.BadZipFile(f"成员文件头损坏：{info.filename}")
+        # 本地文件头中的文件名、扩展字段长度可能与中央目录不同，以本地文件头为准
+        src.seek(info.header_offset + _LOCAL_HEADER.size + header[9] + header[10])
+
+        # 大小已知，写在文件头中，不再需要数据描述符
+        entry = _Entry(info.filename, info.date_time, info.external_attr,
+                       info.flag_bits & ~(_FLAG_DATA_DESCRIPTOR | _FLAG_UTF8), info.compress_type)
+        entry.crc = info.CRC
+        entry.compress_size = info.compress_size
+        entry.file_size = info.file_size
+        self._add(entry, _iter_raw(src, info.compress_size))
+        self.copied += 1
+
+    def write(self, name, data, date_time=None):
+        entry = _Entry(name, date_time or time.localtime(time.time())[:6], 0o600 << 16, 0, zipfile.ZIP_DEFLATED)
+        entry.crc = zlib.crc32(data)
+        entry.file_size = len(data)
+        chunks = deflate(data, self.compresslevel, self.workers)
+        entry.compress_size = sum(len(chunk) for chunk in chunks)
+        self._add(entry, chunks)
+        self.written += 1
+
+    def open(self, name, date_time=None):
+        """逐步写入的成员（流式引擎的 document.xml），按 compresslevel 单线程压缩"""
+        entry = _Entry(name, date_time or time.localtime(time.time())[:6], 0o600 << 16,
+                       _FLAG_DATA_DESCRIPTOR, zipfile.ZIP_DEFLATED)
+        self._add(entry, ())
+        self.written += 1
+        return _EntryStream(self, entry, self.compresslevel)
+
+    # ---------------------- 内部 ----------------------
+    def _add(self, entry, chunks):
+        self._check_size(entry)
+        entry.offset = self._offset
+        if entry.offset > _LIMIT:
+            raise zipfile.LargeZipFile("输出包过大（需要 zip64）")
+        hour_minute, date = _dos_time(entry.date_time)
+        self._write(_LOCAL_HEADER.pack(
+            _LOCAL_HEADER_SIGNATURE, _VERSION, entry.flags, entry.method, hour_minute, date,
+            entry.crc, entry.compress_size, entry.file_size, len(entry.name), 0,
+        ))
+        self._write(entry.name)
+        for chunk in chunks:
+            self._write(chunk)
+        self._entries.append(entry)
+
+    def _write(self, data):
+        self._fp.write(data)
+        self._offset += len(data)
+
+    @staticmethod
+    def _check_size(entry):
+        if entry.file_size > _LIMIT or entry.compress_size > _LIMIT:
+            raise zipfile.LargeZipFile(f"成员过大（需要 zip64）：{entry.name.decode('utf-8')}")
+
+
+# ----------------------------------------------------------------------
+# 保存 python-docx 文档
+# ----------------------------------------------------------------------
+def save_document(doc, source, output, modified=(), compresslevel=DEFAULT_COMPRESSLEVEL, workers=1):
+    """
+    代替 doc.save(output)。source 为 doc 读取自的原始包（路径或文件对象），
+    modified 为需要重新序列化的部件名（如 "/word/document.xml"）；
+    原包中没有的部件（python-docx 新建的）同样重新写入，其余部件原样复制。
+    与 doc.save() 一样只写出关系图中可达的部件。返回 PackageWriter（带 copied / written 计数）；
+    python-docx 内部接口不可用、退回 doc.save() 时返回 None。
+    """
+    if _ContentTypesItem is None:
+        doc.save(output)
+        return None
+
+    package = doc.part.package
+    parts = list(package.iter_parts())
+    for part in parts:
+        part.before_marshal()
+    modified = set(modified)
+
+    with zipfile.ZipFile(source) as zin, open_source(source) as raw, \
+            PackageWriter(output, compresslevel, workers) as writer:
+        members = {info.filename: info for info in zin.infolist()}
+        writer.write(CONTENT_TYPES_URI.membername, _ContentTypesItem.from_parts(parts).blob)
+        writer.write(PACKAGE_URI.rels_uri.membername, package.rels.xml)
+        for part in parts:
+            name = part.partname.membername
+            info = members.get(name)
+            if info is None or part.partname in modified:
+                writer.write(name, part.blob)
+            else:
+                writer.copy(raw, info)
+            if len(part.rels):
+                writer.write(part.partname.rels_uri.membername, part.rels.xml)
+    return writer
@@ -0,0 +1,221 @@
+"""
+段落处理流水线。
+
+每个处理步骤注册为一个“逐段落 stage”，Pipeline 只遍历一次正文，
+对每个段落依次执行所有启用的 stage，避免多次调用 doc.paragraphs
+反复创建 Paragraph 代理对象、重复执行 XPath。
+
+表格、文本框、页眉页脚、脚注尾注中的段落（见 stories.py）在同一次遍历中
+交给同一组 stage，按区域（ctx.story）选择执行哪些。
+"""
+from collections import Counter
+
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+
+from .stories import BODY, TABLE, TEXTBOX, iter_paragraphs, iter_part_paragraphs, story_config
+
+
+# 每处理多少个段落回调一次进度
+_PROGRESS_EVERY = 50
+
+
+class FormatCancelled(Exception):
+    """处理过程中收到取消请求"""
+
+
+# ----------------------------------------------------------------------
+# stage 注册表
+# ----------------------------------------------------------------------
+# name -> func(formatter, para, ctx)，按注册顺序执行
+_STAGES = {}
+# name -> 只能在哪些区域执行（依赖正文块模型的 stage），未登记的不限
+_STAGE_STORIES = {}
+
+_P = qn("w:p")
+_TBL = qn("w:tbl")
+
+
+def register_stage(name, before=None, stories=None):
+    """
+    注册一个逐段落 stage（装饰器）。
+    before: 可选，插入到已注册的某个 stage 之前；默认追加到末尾。
+    stories: 可选，限定只在这些区域执行（如只对正文有意义的 stage）。
+    """
+    def decorator(func):
+        if stories:
+            _STAGE_STORIES[name] = frozenset(stories)
+        else:
+            _STAGE_STORIES.pop(name, None)
+        items = [(k, v) for k, v in _STAGES.items() if k != name]
+        names = [k for k, _ in items]
+        pos = names.index(before) if before in names else len(items)
+        items.insert(pos, (name, func))
+        _STAGES.clear()
+        _STAGES.update(items)
+        return func
+
+    return decorator
+
+
+def registered_stages():
+    """返回按执行顺序排列的 stage 名称"""
+    return list(_STAGES)
+
+
+# ----------------------------------------------------------------------
+# 遍历上下文
+# ----------------------------------------------------------------------
+class PipelineContext:
+    """
+    一次遍历中共享的状态：
+    - index: 当前段落序号（正文顶层段落）
+    - block: 当前段落在 BlockModel 中的块下标（包括表格等非段落块），非正文段落为 -1
+    - story: 当前段落所在区域（"body"、"table"、"header" 等，见 stories.py）
+    - prev: 上一个段落（用于图片下方图题等相邻判断）
+    - level: 当前段落检测出的标题等级，由 style stage 写入
+    - stats: 各 stage 可以累加的计数器
+    - progress: 可选的进度回调 progress(已处理段落数, 段落总数或 None)
+    - cancel: 可选的取消标志（threading.Event / multiprocessing.Event），
+      每个段落开始前检查，已置位时抛出 FormatCancelled
+    """
+
+    def __init__(self, doc, progress=None, cancel=None, total=None):
+        self.doc = doc
+        self.index = -1
+        self.block = -1
+        self.story = BODY
+        self.prev = None
+        self.level = 0
+        self.stats = Counter()
+        self.progress = progress
+        self.cancel = cancel
+        self.total = total
+
+
+class Pipeline:
+    def __init__(self, stages, stories=None):
+        """
+        stages: [(name, func)]，func(formatter, para, ctx)
+        stories: {区域: True 或 stage 名称集合}（见 stories.story_config），默认按 DEFAULT_STORY_STAGES
+        """
+        self.stages = list(stages)
+        self.stories = story_config({}) if stories is None else dict(stories)
+        self._story_stages = {}
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """
+        按配置中的 "stages" 开关选出启用的 stage，例如：
+        {"stages": {"captions": false}} 表示跳过图表标题处理。
+        未出现在配置中的 stage 默认启用。
+        "stories" 按区域选择 stage，例如 {"stories": {"table": ["coalesce_runs", "brackets", "style"]}}。
+        """
+        switches = config.get("stages", {}) or {}
+        return cls(
+            ((name, func) for name, func in _STAGES.items() if switches.get(name, True)),
+            story_config(config),
+        )
+
+    def instrumented(self, instrument):
+        """返回每个 stage 都累计耗时的流水线（instrument 为 Instrumentation）"""
+        return type(self)(
+            ((name, instrument.wrap_stage(name, func)) for name, func in self.stages), self.stories)
+
+    @property
+    def names(self):
+        return [name for name, _ in self.stages]
+
+    def stages_for(self, story):
+        """区域 story 中执行的 [(name, func)]（启用的 stage 与区域配置的交集）"""
+        stages = self._story_stages.get(story)
+        if stages is None:
+            allowed = self.stories.get(story, ())
+            stages = self._story_stages[story] = [
+                (name, func) for name, func in self.stages
+                if (allowed is True or name in allowed)
+                and story in _STAGE_STORIES.get(name, (story,))
+            ]
+        return stages
+
+    def handles(self, story):
+        """区域 story（或其中的文本框）是否有要执行的 stage"""
+        return bool(self.stages_for(story) or self.stages_for(TEXTBOX))
+
+    def new_context(self, doc=None, formatter=None, total=None):
+        """formatter 上设置了 progress / cancel_event 时一并带入上下文"""
+        progress = getattr(formatter, "progress", None)
+        cancel = getattr(formatter, "cancel_event", None)
+        return PipelineContext(doc, progress, cancel, total)
+
+    def process(self, formatter, para, ctx, block=-1):
+        """对单个正文段落依次执行所有 stage（流式引擎逐段调用）"""
+        # 只在段落之间检查取消，不会留下处理了一半的段落
+        if ctx.cancel is not None and ctx.cancel.is_set():
+            raise FormatCancelled()
+        ctx.index += 1
+        ctx.block = block
+        ctx.story = BODY
+        ctx.level = 0
+        for _, func in self.stages_for(BODY):
+            func(formatter, para, ctx)
+        ctx.prev = para
+        if ctx.progress is not None and ctx.index % _PROGRESS_EVERY == 0:
+            ctx.progress(ctx.index + 1, ctx.total)
+
+    def process_story(self, formatter, para, ctx, story):
+        """对正文以外区域的段落执行该区域的 stage（不计入正文段落序号和进度）"""
+        stages = self.stages_for(story)
+        if not stages:
+            return
+        if ctx.cancel is not None and ctx.cancel.is_set():
+            raise FormatCancelled()
+        ctx.block = -1
+        ctx.story = story
+        ctx.level = 0
+        for _, func in stages:
+            func(formatter, para, ctx)
+        ctx.stats[f"{story}_paragraphs"] += 1
+
+    def process_nested(self, formatter, elm, ctx, parent):
+        """
+        正文块 elm 内部的段落：表格单元格中的段落，以及段落/表格中的文本框。
+        在块本身处理完之后再遍历，取到的是 stage 修改后的树。
+        """
+        if elm.tag == _P:
+            # 文本框总在图形（w:drawing / w:pict）中，不含图形的段落不必向下查找
+            if not formatter.doc_index.has_image(elm) or not self.stages_for(TEXTBOX):
+                return
+        elif elm.tag != _TBL or not self.handles(TABLE):
+            return
+        for story, p in list(iter_paragraphs(elm, TABLE)):
+            self.process_story(formatter, Paragraph(p, parent), ctx, story)
+
+    def process_part(self, formatter, root, story, ctx, parent):
+        """页眉/页脚/脚注/尾注部件（root 为部件的根元素）中的全部段落"""
+        for inner, p in list(iter_part_paragraphs(root, story)):
+            self.process_story(formatter, Paragraph(p, parent), ctx, inner)
+
+    def finish(self, ctx):
+        ctx.stats["paragraphs"] = ctx.index + 1
+        if ctx.progress is not None:
+            ctx.progress(ctx.index + 1, ctx.total)
+        return ctx
+
+    def run(self, formatter, doc, total=None, parts=()):
+        """
+        单次遍历正文，逐段执行所有 stage，正文块中的表格、文本框段落随块一起处理。
+        total: 段落总数（用于进度回调，可选）
+        parts: [(区域, 部件根元素)]，页眉/页脚/脚注/尾注，正文之后处理
+        返回本次遍历的上下文（含段落数与计数器）。
+        """
+        ctx = self.new_context(doc, formatter, total)
+        # 只生成一次正文顶层段落的 Paragraph 代理，块下标与 BlockModel.build 的顺序一致
+        parent = doc._body
+        for block, elm in enumerate(doc.element.body.iterchildren()):
+            if elm.tag == _P:
+                self.process(formatter, Paragraph(elm, parent), ctx, block)
+            self.process_nested(formatter, elm, ctx, parent)
+        for story, root in parts:
+            self.process_part(formatter, root, story, ctx, parent)
+        return self.finish(ctx)
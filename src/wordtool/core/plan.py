@@ -0,0 +1,263 @@
+"""
+格式方案（FormatPlan）：把配置编译成逐段落应用时直接可用的形式。
+
+- 字号、行距等配置字符串（"四号 (14pt)"、"1.25"）只解析一次
+- 每个级别（0 正文、1~4 标题、"caption" 图表标题）预先生成 w:rPr / w:pPr 模板。
+  模板由 python-docx 的属性 setter 在空白元素上生成一次，写出的 XML 与逐个设置完全一致；
+  应用时 run 没有 rPr 就整体复制模板，已有 rPr / pPr 则按 schema 顺序合并（同名元素只改属性）
+- 同一配置只编译一次（按配置内容的哈希缓存），批量处理的工作进程在多个文档间复用
+"""
+import hashlib
+import json
+import re
+from collections import namedtuple
+from copy import deepcopy
+
+from docx.enum.text import WD_LINE_SPACING, WD_PARAGRAPH_ALIGNMENT
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.shared import Pt, RGBColor
+from docx.text.paragraph import Paragraph
+from docx.text.run import Run
+
+# w:rPr / w:pPr 子元素的 schema 顺序（与 python-docx 的 CT_RPr / CT_PPr 相同）
+_RPR_SEQUENCE = (
+    "w:rStyle", "w:rFonts", "w:b", "w:bCs", "w:i", "w:iCs", "w:caps", "w:smallCaps", "w:strike",
+    "w:dstrike", "w:outline", "w:shadow", "w:emboss", "w:imprint", "w:noProof", "w:snapToGrid",
+    "w:vanish", "w:webHidden", "w:color", "w:spacing", "w:w", "w:kern", "w:position", "w:sz",
+    "w:szCs", "w:highlight", "w:u", "w:effect", "w:bdr", "w:shd", "w:fitText", "w:vertAlign",
+    "w:rtl", "w:cs", "w:em", "w:lang", "w:eastAsianLayout", "w:specVanish", "w:oMath",
+)
+_PPR_SEQUENCE = (
+    "w:pStyle", "w:keepNext", "w:keepLines", "w:pageBreakBefore", "w:framePr", "w:widowControl",
+    "w:numPr", "w:suppressLineNumbers", "w:pBdr", "w:shd", "w:tabs", "w:suppressAutoHyphens",
+    "w:kinsoku", "w:wordWrap", "w:overflowPunct", "w:topLinePunct", "w:autoSpaceDE",
+    "w:autoSpaceDN", "w:bidi", "w:adjustRightInd", "w:snapToGrid", "w:spacing", "w:ind",
+    "w:contextualSpacing", "w:mirrorIndents", "w:suppressOverlap", "w:jc", "w:textDirection",
+    "w:textAlignment", "w:textboxTightWrap", "w:outlineLvl", "w:divId", "w:cnfStyle", "w:rPr",
+    "w:sectPr", "w:pPrChange",
+)
+
+_RPR = qn("w:rPr")
+_PPR = qn("w:pPr")
+_VAL = qn("w:val")
+_IND_FIRST_LINE = (qn("w:firstLine"), qn("w:hanging"))
+
+_SIZE_PT = re.compile(r"\(([\d.]+)pt\)")
+
+# 已编译的方案：配置哈希 -> FormatPlan
+_PLANS = {}
+_MAX_PLANS = 32
+
+
+def _successor_ranks(sequence):
+    """tag -> {排在它后面的 tag: 先后次序}"""
+    tags = [qn(t) for t in sequence]
+    return {tag: {t: i for i, t in enumerate(tags[n + 1:])} for n, tag in enumerate(tags)}
+
+
+_RPR_RANKS = _successor_ranks(_RPR_SEQUENCE)
+_PPR_RANKS = _successor_ranks(_PPR_SEQUENCE)
+
+
+# ----------------------------------------------------------------------
+# 合并属性元素
+# ----------------------------------------------------------------------
+class _Prop:
+    """
+    一个属性元素的写法：已存在时先删除 remove 中的属性再写入模板的属性，
+    replace 为 True 时删掉已有元素、插入模板的副本（与 python-docx 的颜色 setter 相同）。
+    """
+    __slots__ = ("template", "remove", "replace")
+
+    def __init__(self, template, remove=(), replace=False):
+        self.template = template
+        self.remove = remove
+        self.replace = replace
+
+
+def _insert(parent, child, ranks):
+    """与 python-docx 的 insert_element_before 相同：插到按 schema 顺序最靠前的已有后继元素之前"""
+    successors = ranks[child.tag]
+    best = None
+    best_rank = len(successors)
+    for existing in parent:
+        rank = successors.get(existing.tag)
+        if rank is not None and rank < best_rank:
+            best, best_rank = existing, rank
+    if best is None:
+        parent.append(child)
+    else:
+        best.addprevious(child)
+
+
+def _merge(parent, props, ranks):
+    for prop in props:
+        template = prop.template
+        child = parent.find(template.tag)
+        if child is not None and prop.replace:
+            for old in parent.findall(template.tag):
+                parent.remove(old)
+            child = None
+        if child is None:
+            _insert(parent, deepcopy(template), ranks)
+            continue
+        for name in prop.remove:
+            child.attrib.pop(name, None)
+        for name, value in template.attrib.items():
+            child.set(name, value)
+
+
+def _get_or_add_pPr(p):
+    pPr = p.find(_PPR)
+    if pPr is None:
+        pPr = OxmlElement("w:pPr")
+        p.insert(0, pPr)
+    return pPr
+
+
+# ----------------------------------------------------------------------
+# 生成模板（只在编译方案时调用 python-docx 的 setter）
+# ----------------------------------------------------------------------
+def _run_template(font_name, size, bold):
+    """顺序与原来逐个设置 run 属性时相同：字体、东亚字体、字号、加粗、颜色"""
+    r = OxmlElement("w:r")
+    run = Run(r, None)
+    run.font.name = font_name
+    r.rPr.rFonts.set(qn("w:eastAsia"), font_name)
+    run.font.size = Pt(size)
+    run.bold = bold
+    run.font.color.rgb = RGBColor(0, 0, 0)
+    rPr = r.rPr
+    props = (
+        _Prop(rPr.find(qn("w:rFonts"))),
+        _Prop(rPr.find(qn("w:sz"))),
+        _Prop(rPr.find(qn("w:b")), remove=(_VAL,)),
+        _Prop(rPr.find(qn("w:color")), replace=True),
+    )
+    return rPr, props
+
+
+def _paragraph_props(set_format, tags, removes):
+    """在空白段落上执行 set_format(Paragraph)，按 tags 的顺序取出生成的 pPr 子元素"""
+    p = OxmlElement("w:p")
+    set_format(Paragraph(p, None))
+    return tuple(_Prop(p.pPr.find(qn(tag)), remove=removes.get(tag, ())) for tag in tags)
+
+
+def _line_spacing_props(style_cfg, alignment=None):
+    line_rule = style_cfg.get("line_rule", "多倍行距")
+    spacing = float(style_cfg.get("spacing", 1.25))
+
+    def set_format(paragraph):
+        fmt = paragraph.paragraph_format
+        if line_rule == "多倍行距":
+            fmt.line_spacing_rule = WD_LINE_SPACING.MULTIPLE
+            fmt.line_spacing = spacing
+        else:  # 固定值（磅）
+            fmt.line_spacing_rule = WD_LINE_SPACING.EXACTLY
+            fmt.line_spacing = Pt(spacing)
+        if alignment is not None:
+            paragraph.alignment = alignment
+
+    tags = ("w:spacing",) if alignment is None else ("w:spacing", "w:jc")
+    return _paragraph_props(set_format, tags, {})
+
+
+def _title_props():
+    def set_format(paragraph):
+        paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+        paragraph.paragraph_format.first_line_indent = Pt(0)
+        paragraph.paragraph_format.left_indent = Pt(0)
+
+    return _paragraph_props(set_format, ("w:jc", "w:ind"), {"w:ind": _IND_FIRST_LINE})
+
+
+def _indent_props(first_line):
+    def set_format(paragraph):
+        paragraph.paragraph_format.left_indent = Pt(0)
+        paragraph.paragraph_format.first_line_indent = first_line
+        paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+
+    return _paragraph_props(set_format, ("w:ind", "w:jc"), {"w:ind": _IND_FIRST_LINE})
+
+
+# ----------------------------------------------------------------------
+# 格式方案
+# ----------------------------------------------------------------------
+# 一个级别的格式：字体、字号（pt）、加粗、rPr 模板、rPr 合并方式、pPr 合并方式
+LevelFormat = namedtuple("LevelFormat", "font size bold rpr run_props para_props")
+
+
+def _size_pt(style_cfg):
+    m = _SIZE_PT.search(style_cfg.get("size", "12"))
+    return float(m.group(1)) if m else 12
+
+
+def _compile_level(style_cfg, para_props):
+    font_name = style_cfg.get("font", "宋体")
+    size = _size_pt(style_cfg)
+    bold = bool(style_cfg.get("bold", False))
+    rpr, run_props = _run_template(font_name, size, bold)
+    return LevelFormat(font_name, size, bold, rpr, run_props, para_props)
+
+
+def config_key(config: dict):
+    """方案只取决于 titles / body / caption 三部分配置"""
+    data = {name: config.get(name) for name in ("titles", "body", "caption")}
+    text = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class FormatPlan:
+    """
+    编译后的格式方案（编译后不再修改，可在多个文档、多个 WordFormatter 之间共用）。
+    levels[0] 为正文，levels[1~4] 为标题，levels["caption"] 为图表标题（含居中）。
+    """
+
+    def __init__(self, config: dict):
+        titles = config.get("titles", {})
+        body = config.get("body", {})
+        title_props = _title_props()
+        levels = {0: _compile_level(body, _line_spacing_props(body))}
+        for level in range(1, 5):
+            levels[level] = _compile_level(titles.get(f"title{level}", body), title_props)
+        caption = config.get("caption", {})
+        levels["caption"] = _compile_level(
+            caption, _line_spacing_props(caption, WD_PARAGRAPH_ALIGNMENT.CENTER))
+        self.levels = levels
+        # 首行缩进（两个字符宽）按字号缓存，字号种类很少
+        self._indents = {}
+
+    @classmethod
+    def from_config(cls, config: dict):
+        key = config_key(config)
+        plan = _PLANS.get(key)
+        if plan is None:
+            plan = cls(config)
+            if len(_PLANS) >= _MAX_PLANS:
+                _PLANS.pop(next(iter(_PLANS)))
+            _PLANS[key] = plan
+        return plan
+
+    # ---------------------- 应用 ----------------------
+    @staticmethod
+    def apply_run(r, fmt):
+        """把级别格式 fmt 写入 run（CT_R）"""
+        rPr = r.find(_RPR)
+        if rPr is None:
+            r.insert(0, deepcopy(fmt.rpr))
+        else:
+            _merge(rPr, fmt.run_props, _RPR_RANKS)
+
+    @staticmethod
+    def apply_paragraph(p, fmt):
+        """写入段落级格式（正文/图表标题的行距，标题的左对齐和零缩进）"""
+        _merge(_get_or_add_pPr(p), fmt.para_props, _PPR_RANKS)
+
+    def apply_indent(self, p, font_size):
+        """正文缩进：左缩进 0、首行缩进两个字符（font_size * 2）、左对齐"""
+        props = self._indents.get(font_size)
+        if props is None:
+            props = self._indents[font_size] = _indent_props(font_size * 2)
+        _merge(_get_or_add_pPr(p), props, _PPR_RANKS)
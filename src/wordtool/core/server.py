@@ -0,0 +1,530 @@
+"""
+本地格式化服务（wordtool serve）：常驻进程 + 预热的工作进程池。
+
+每次命令行调用都要付出解释器启动、导入 python-docx、解析配置的开销；
+服务模式只启动一次，工作进程预先导入 formatter 并编译好配置（FormatPlan、TitleMatcher），
+之后每个请求只剩真正的格式化时间。
+
+基于 asyncio 的最小 HTTP/1.1 实现（只用标准库），监听 localhost 端口或 Unix socket：
+
+    POST /format[?config=ID]   请求体为 .docx，返回格式化后的 .docx
+    POST /configs              请求体为 JSON 配置，返回 {"id": ...}，之后用 ?config=ID 引用
+    GET  /metrics              Prometheus 文本格式：请求数、耗时直方图、排队数、运行数
+    GET  /health               {"status": "ok", ...}
+
+    curl --data-binary @in.docx -o out.docx http://127.0.0.1:8765/format
+    curl --unix-socket /tmp/wordtool.sock --data-binary @in.docx -o out.docx http://localhost/format
+
+排队数超过 max_queue 时立即返回 503（带 Retry-After），不读取请求体；
+单个文档的处理时间超过 timeout 返回 504。
+"""
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import signal
+import time
+from bisect import bisect_left
+from collections import Counter
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from .batch import FormatTimeout, WorkerPool, grace_period
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_QUEUE = 64
+DEFAULT_TIMEOUT = 120.0
+DEFAULT_MAX_SIZE = 100 * 1024 * 1024
+
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+# 请求耗时直方图的桶（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_MAX_HEADERS = 100
+_ROUTES = ("/format", "/configs", "/metrics", "/health")
+_MAX_CONFIGS = 256     # POST /configs 注册的配置上限，超过时丢弃最早的
+_WRITE_CHUNK = 256 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message=None, close=False, headers=None):
+        super().__init__(message or HTTPStatus(status).phrase)
+        self.status = status
+        self.close = close          # 请求体未读取，必须关闭连接
+        self.headers = headers or {}
+
+
+# ----------------------------------------------------------------------
+# 工作进程中执行
+# ----------------------------------------------------------------------
+def _init_worker(configs):
+    """预热：导入 formatter，按配置编译格式方案和标题匹配器（结果缓存在本进程中）"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C 由主进程处理
+    from . import formatter  # noqa: F401  python-docx、lxml 在这里导入
+    from .matcher import TitleMatcher
+    from .plan import FormatPlan
+
+    for config in configs:
+        FormatPlan.from_config(config)
+        TitleMatcher.from_config(config)
+
+
+# 当前任务是否被 SIGALRM 中断（save() 会捕获异常，不能只靠异常类型判断）
+_timed_out = False
+
+
+def _on_timeout(signum, frame):
+    global _timed_out
+    _timed_out = True
+    raise FormatTimeout("处理超时")
+
+
+def _format_job(data, config, timeout):
+    """
+    格式化一个文档，返回 (状态, 输出数据或错误信息, 段落数, 秒)。
+    状态为 "ok" / "failed" / "timeout"；超时由工作进程自己用 SIGALRM 中断。
+    """
+    global _timed_out
+    from .formatter import format_stream
+
+    start = time.perf_counter()
+    _timed_out = False
+    use_alarm = bool(timeout) and hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    out = io.BytesIO()
+    try:
+        formatter = format_stream(io.BytesIO(data), out, config)
+        result = ("ok", out.getvalue(), formatter.paragraph_count)
+    except Exception as e:
+        # save() 内部捕获了超时异常（FormatError 中只留下错误信息），以 SIGALRM 处理函数设置的标志为准
+        if _timed_out:
+            result = ("timeout", "处理超时", 0)
+        else:
+            result = ("failed", str(e) or type(e).__name__, 0)
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return result + (time.perf_counter() - start,)
+
+
+def _ping():
+    return None
+
+
+# ----------------------------------------------------------------------
+# 统计
+# ----------------------------------------------------------------------
+class Metrics:
+    def __init__(self):
+        self.requests = Counter()               # (路径, 状态码) -> 次数
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.latency_count = 0
+        self.rejected = 0                       # 因队列已满返回 503 的次数
+        self.timeouts = 0
+
+    def observe(self, path, status, seconds):
+        # 未知路径归入同一个标签，扫描请求不会让指标无限增长
+        self.requests[(path if path in _ROUTES else "other", status)] += 1
+        if path == "/format":
+            self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self.latency_sum += seconds
+            self.latency_count += 1
+
+    def render(self, server):
+        lines = [
+            "# HELP wordtool_requests_total HTTP requests by path and status.",
+            "# TYPE wordtool_requests_total counter",
+        ]
+        for (path, status), n in sorted(self.requests.items()):
+            lines.append(f'wordtool_requests_total{{path="{path}",status="{status}"}} {n}')
+        lines += [
+            "# HELP wordtool_format_seconds Latency of /format requests (queue + processing).",
+            "# TYPE wordtool_format_seconds histogram",
+        ]
+        total = 0
+        for bound, n in zip(LATENCY_BUCKETS + ("+Inf",), self.buckets):
+            total += n
+            lines.append(f'wordtool_format_seconds_bucket{{le="{bound}"}} {total}')
+        lines += [
+            f"wordtool_format_seconds_sum {self.latency_sum:.6f}",
+            f"wordtool_format_seconds_count {self.latency_count}",
+            "# TYPE wordtool_queue_depth gauge",
+            f"wordtool_queue_depth {server.waiting}",
+            "# TYPE wordtool_in_flight gauge",
+            f"wordtool_in_flight {server.running}",
+            "# TYPE wordtool_workers gauge",
+            f"wordtool_workers {server.workers}",
+            "# TYPE wordtool_rejected_total counter",
+            f"wordtool_rejected_total {self.rejected}",
+            "# TYPE wordtool_timeouts_total counter",
+            f"wordtool_timeouts_total {self.timeouts}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def config_id(config: dict):
+    text = json.dumps(config, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+# ----------------------------------------------------------------------
+# 服务
+# ----------------------------------------------------------------------
+class FormatServer:
+    """
+    config: 默认配置（不带 ?config= 时使用，ID 为 "default"）
+    configs: 预先加载的命名配置 {ID: 配置}（--config-dir 下的 ID.json）
+    workers: 工作进程数；max_queue: 等待空闲工作进程的请求数上限
+    timeout: 单个文档的处理超时（秒）；max_size: 请求体大小上限（字节）
+    """
+
+    def __init__(self, config: dict, configs=None, workers=None, max_queue=DEFAULT_MAX_QUEUE,
+                 timeout=DEFAULT_TIMEOUT, max_size=DEFAULT_MAX_SIZE, max_tasks_per_child=None):
+        self.configs = {"default": config}
+        self.configs.update(configs or {})
+        self._registered = []  # POST /configs 登记的配置 ID，按登记顺序
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.max_size = max_size
+        self.max_tasks_per_child = max_tasks_per_child
+        self.metrics = Metrics()
+        self.waiting = 0       # 等待工作进程的请求数
+        self.running = 0       # 正在工作进程中处理的请求数
+        self.pool = None
+        self._slots = None
+        self._server = None
+        self._connections = set()
+        self._idle = set()     # 正在等待下一个请求的连接（保持连接的空闲连接）的 writer
+        self._closing = False
+
+    # ---------------------- 工作进程池 ----------------------
+    def _start_pool(self):
+        # 请求的处理时间由 _format() 自己计时（同时提交的任务不超过工作进程数，提交即开始执行）
+        self.pool = WorkerPool(self.workers, self.max_tasks_per_child, initializer=_init_worker,
+                               initargs=(list(self.configs.values()),), track=False)
+
+    def _restart_pool(self, executor, reason):
+        """终止并重建进程池；executor 已经被其他请求重建过时不再重复"""
+        if executor is self.pool.executor:
+            logger.error("终止并重建进程池：%s", reason, extra={"event": "serve_pool_restart"})
+            self.pool.restart()
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None):
+        """启动工作进程池（等待全部预热完成）并开始监听"""
+        self._slots = asyncio.Semaphore(self.workers)
+        self._start_pool()
+        # 同时提交 workers 个任务，进程池会启动全部工作进程并执行预热
+        await asyncio.gather(*(asyncio.wrap_future(self.pool.submit(_ping)) for _ in range(self.workers)))
+        logger.info("工作进程已就绪：%d 个", self.workers, extra={"event": "serve_ready", "workers": self.workers})
+
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.remove(unix_path)  # 上次异常退出留下的 socket 文件
+            self._server = await asyncio.start_unix_server(self._handle, path=unix_path)
+            address = unix_path
+        else:
+            self._server = await asyncio.start_server(self._handle, host, port)
+            address = "http://%s:%d" % self._server.sockets[0].getsockname()[:2]
+        logger.info("正在监听 %s", address, extra={"event": "serve_listen", "address": address})
+        return address
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """停止接受新连接，等待处理中的请求结束后关闭工作进程池"""
+        self._closing = True
+        if self._server is not None:
+            self._server.close()
+        for writer in list(self._idle):
+            writer.close()  # 空闲连接读到 EOF 后自行结束
+        if self._connections:
+            await asyncio.gather(*self._connections, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+
+    # ---------------------- HTTP ----------------------
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            # HTTP/1.1 默认保持连接，客户端可以在同一连接上连续提交文档
+            while await self._handle_one(reader, writer):
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _handle_one(self, reader, writer):
+        """处理一个请求，返回是否保持连接"""
+        if self._closing:
+            return False
+        self._idle.add(writer)
+        try:
+            request = await _read_head(reader)
+        except HTTPError as e:
+            await _respond(writer, e.status, _json_body({"error": str(e)}), "application/json", close=True)
+            return False
+        finally:
+            self._idle.discard(writer)
+        if request is None:
+            return False
+        method, target, headers, keep_alive = request
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        start = time.perf_counter()
+        extra_headers = {}
+        try:
+            status, body, content_type, extra_headers = await self._route(
+                method, url.path, query, headers, reader)
+        except HTTPError as e:
+            status, body, content_type = e.status, _json_body({"error": str(e)}), "application/json"
+            extra_headers = e.headers
+            keep_alive = keep_alive and not e.close
+        seconds = time.perf_counter() - start
+        self.metrics.observe(url.path, status, seconds)
+        await _respond(writer, status, body, content_type, extra_headers, close=not keep_alive)
+        return keep_alive
+
+    async def _route(self, method, path, query, headers, reader):
+        if path == "/format":
+            _require(method, "POST", headers)
+            return await self._format(query, headers, reader)
+        if path == "/configs":
+            _require(method, "POST", headers)
+            config = _parse_json(await self._read_body(headers, reader))
+            return 200, _json_body({"id": self.register_config(config)}), "application/json", {}
+        if path == "/metrics":
+            _require(method, "GET", headers)
+            return 200, self.metrics.render(self).encode("utf-8"), "text/plain; version=0.0.4", {}
+        if path == "/health":
+            _require(method, "GET", headers)
+            data = {"status": "ok", "workers": self.workers, "queue": self.waiting, "running": self.running}
+            return 200, _json_body(data), "application/json", {}
+        raise HTTPError(404, close=_has_body(headers))
+
+    async def _read_body(self, headers, reader):
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HTTPError(411, "不支持分块传输，请提供 Content-Length", close=True)
+        try:
+            length = int(headers.get("content-length", ""))
+        except ValueError:
+            raise HTTPError(411, "缺少 Content-Length", close=True) from None
+        if length < 0:
+            raise HTTPError(400, "Content-Length 无效", close=True)
+        if length > self.max_size:
+            raise HTTPError(413, f"请求体超过上限 {self.max_size} 字节", close=True)
+        return await reader.readexactly(length)
+
+    def register_config(self, config):
+        """校验并登记配置，返回配置 ID（相同内容的配置 ID 相同）"""
+        from wordtool.config import ConfigManager
+        from .matcher import TitleMatcher
+        from .plan import FormatPlan
+
+        if not isinstance(config, dict):
+            raise HTTPError(400, "配置必须是 JSON 对象")
+        try:
+            ConfigManager.validate_config(config)
+        except ValueError as e:
+            raise HTTPError(400, f"配置无效：{e}") from None
+        try:
+            TitleMatcher.from_config(config)
+            FormatPlan.from_config(config)
+        except Exception as e:
+            # 结构检查之外的问题（如字段取值无法使用）同样是客户端的配置错误
+            raise HTTPError(400, f"配置无效：{type(e).__name__}: {e}") from None
+        key = config_id(config)
+        if key not in self.configs:
+            if len(self._registered) >= _MAX_CONFIGS:
+                self.configs.pop(self._registered.pop(0), None)
+            self._registered.append(key)
+            self.configs[key] = config
+        return key
+
+    async def _format(self, query, headers, reader):
+        name = query.get("config", ["default"])[0]
+        config = self.configs.get(name)
+        if config is None:
+            raise HTTPError(404, f"未知的配置 ID：{name}", close=True)
+        # 背压：排队已满时不读取请求体，直接拒绝。
+        # 读取请求体之前就占用排队名额，同时上传的大文件也计入队列，内存中最多缓存 max_queue 个请求体
+        if self.waiting >= self.max_queue:
+            self.metrics.rejected += 1
+            raise HTTPError(503, "队列已满", close=True, headers={"Retry-After": "1"})
+        self.waiting += 1
+        try:
+            data = await self._read_body(headers, reader)
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+        try:
+            status, result, paragraphs, seconds = await self._run(data, config)
+        finally:
+            self.running -= 1
+            self._slots.release()
+
+        if status == "timeout":
+            self.metrics.timeouts += 1
+            raise HTTPError(504, result)
+        if status != "ok":
+            raise HTTPError(422, result)
+        extra = {"X-Wordtool-Seconds": f"{seconds:.3f}", "X-Wordtool-Paragraphs": str(paragraphs)}
+        return 200, result, DOCX_TYPE, extra
+
+    async def _run(self, data, config):
+        """
+        在工作进程中格式化。工作进程自己中断超时任务；不支持 SIGALRM 的平台、卡在 C 代码中时
+        由这里兜底，终止并重建进程池（否则卡住的工作进程一直占用）。
+        进程池因其他请求超时、崩溃被重建时，被连带中断的任务换到新进程池重试一次。
+        """
+        grace = grace_period(self.timeout)
+        for retry in (False, True):
+            executor = self.pool.executor
+            future = asyncio.wrap_future(self.pool.submit(_format_job, data, config, self.timeout))
+            try:
+                return await asyncio.wait_for(future, grace)
+            except asyncio.TimeoutError:
+                self._restart_pool(executor, "处理超时")
+                return "timeout", "处理超时", 0, grace
+            except BrokenProcessPool as e:
+                if executor is self.pool.executor:
+                    # 本请求最先发现进程池崩溃：重建后继续服务
+                    self._restart_pool(executor, f"工作进程异常退出：{e}")
+                    raise HTTPError(500, "工作进程异常退出") from None
+                if retry:
+                    raise HTTPError(500, "工作进程异常退出") from None
+
+
+# ----------------------------------------------------------------------
+# HTTP 读写
+# ----------------------------------------------------------------------
+async def _read_head(reader):
+    """读取请求行和请求头，连接已关闭时返回 None"""
+    try:
+        line = await reader.readline()
+    except ValueError:  # 超过 StreamReader 的行长度上限
+        raise HTTPError(431, close=True) from None
+    if not line:
+        return None
+    parts = line.decode("latin-1").split()
+    if len(parts) != 3 or not parts[2].startswith("HTTP/1."):
+        raise HTTPError(400, "请求行无效", close=True)
+    method, target, version = parts
+
+    headers = {}
+    for _ in range(_MAX_HEADERS):
+        try:
+            line = await reader.readline()
+        except ValueError:
+            raise HTTPError(431, close=True) from None
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, sep, value = line.decode("latin-1").partition(":")
+        if not sep:
+            raise HTTPError(400, "请求头无效", close=True)
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HTTPError(431, close=True)
+
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+    return method, target, headers, keep_alive
+
+
+async def _respond(writer, status, body, content_type, headers=None, close=False):
+    lines = [
+        f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'close' if close else 'keep-alive'}",
+    ]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    # 大文件分块写出，每块等待发送缓冲区腾空，不在内存中再复制一份
+    view = memoryview(body)
+    for start in range(0, len(view), _WRITE_CHUNK):
+        writer.write(view[start:start + _WRITE_CHUNK])
+        await writer.drain()
+    await writer.drain()
+
+
+def _require(method, expected, headers):
+    if method != expected:
+        raise HTTPError(405, close=_has_body(headers), headers={"Allow": expected})
+
+
+def _has_body(headers):
+    """请求是否带有请求体（出错时不读取请求体，必须关闭连接）"""
+    if "transfer-encoding" in headers:
+        return True
+    try:
+        return int(headers.get("content-length") or 0) != 0
+    except ValueError:
+        return True
+
+
+def _json_body(data):
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+def _parse_json(data):
+    try:
+        return json.loads(data)
+    except ValueError as e:
+        raise HTTPError(400, f"JSON 无效：{e}") from None
+
+
+def load_config_dir(path):
+    """--config-dir：目录下每个 ID.json 是一个命名配置"""
+    from wordtool.config import ConfigManager
+
+    return {p.stem: ConfigManager.load_config_file(p) for p in sorted(Path(path).glob("*.json"))}
+
+
+def serve(server: FormatServer, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None):
+    """运行服务直到收到 SIGINT / SIGTERM"""
+
+    async def main():
+        await server.start(host, port, unix_path)
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, AttributeError, ValueError):  # Windows
+                pass
+        serving = asyncio.ensure_future(server.serve_forever())
+        try:
+            await stop.wait()
+        finally:
+            logger.info("正在停止服务", extra={"event": "serve_stop"})
+            serving.cancel()
+            await server.close()
+            if unix_path and os.path.exists(unix_path):
+                os.remove(unix_path)
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,95 @@
+"""
+文字区域（story）：正文以外同样含有段落的地方。
+
+- table：正文表格单元格中的段落（含嵌套表格）
+- header / footer：页眉、页脚部件
+- footnote / endnote：脚注、尾注部件（分隔线等特殊注释跳过）
+- textbox：文本框（w:txbxContent），可以出现在以上任何区域中
+
+每个部件只遍历一次：用 iterwalk 按文档顺序同时取出段落和文本框边界，
+得到 (区域, 段落) 列表后交给流水线，按区域选择执行的 stage（见 Pipeline.stages_for）。
+正文段落是否含文本框直接查 DocumentIndex（文本框总在 w:drawing / w:pict 中），
+不含图形的段落不再向下查找。
+"""
+from lxml import etree
+
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml.ns import qn
+
+BODY = "body"
+TABLE = "table"
+HEADER = "header"
+FOOTER = "footer"
+FOOTNOTE = "footnote"
+ENDNOTE = "endnote"
+TEXTBOX = "textbox"
+
+STORIES = (BODY, TABLE, HEADER, FOOTER, FOOTNOTE, ENDNOTE, TEXTBOX)
+
+# 各区域默认执行的 stage：正文全部执行；其余区域只做不改变版式的文本规范化
+# （标题识别、缩进、图表标题都是针对正文的），配置 "stories" 可以逐个区域修改
+DEFAULT_STORY_STAGES = {story: ("coalesce_runs", "brackets") for story in STORIES}
+DEFAULT_STORY_STAGES[BODY] = True
+
+# 主文档关系类型 -> 区域
+PART_STORIES = {
+    RT.HEADER: HEADER,
+    RT.FOOTER: FOOTER,
+    RT.FOOTNOTES: FOOTNOTE,
+    RT.ENDNOTES: ENDNOTE,
+}
+
+_P = qn("w:p")
+_TXBX = qn("w:txbxContent")
+_NOTE_TAGS = (qn("w:footnote"), qn("w:endnote"))
+_TYPE = qn("w:type")
+
+
+def story_config(config: dict):
+    """
+    读取配置中的 "stories"：{区域: true | false | [stage 名称]}。
+    true 为执行全部启用的 stage，false / [] 为不处理该区域，未出现的区域使用默认值。
+    返回 {区域: True 或 stage 名称的 frozenset}。
+    """
+    switches = config.get("stories", {}) or {}
+    result = {}
+    for story in STORIES:
+        value = switches.get(story, DEFAULT_STORY_STAGES[story])
+        result[story] = True if value is True else frozenset(value or ())
+    return result
+
+
+def iter_story_parts(document_part):
+    """主文档部件引用的页眉/页脚/脚注/尾注部件：(区域, 部件)，同一部件只出现一次"""
+    seen = set()
+    for rel in document_part.rels.values():
+        story = PART_STORIES.get(rel.reltype)
+        if story is None or rel.is_external:
+            continue
+        part = rel.target_part
+        if part.partname not in seen:
+            seen.add(part.partname)
+            yield story, part
+
+
+def iter_paragraphs(root, story):
+    """
+    按文档顺序生成 root 下的 (区域, 段落)，文本框中的段落区域为 TEXTBOX。
+    root 本身是段落时不包括它自己（正文段落由流水线直接处理）。
+    """
+    depth = 0  # 所在文本框的嵌套层数
+    for event, elm in etree.iterwalk(root, events=("start", "end"), tag=(_P, _TXBX)):
+        if elm.tag == _TXBX:
+            depth += 1 if event == "start" else -1
+        elif event == "start" and elm is not root:
+            yield (TEXTBOX if depth else story), elm
+
+
+def iter_part_paragraphs(root, story):
+    """页眉/页脚/脚注/尾注部件中的 (区域, 段落)；脚注分隔线等带 w:type 的特殊注释跳过"""
+    if story in (FOOTNOTE, ENDNOTE):
+        for note in root:
+            if note.tag in _NOTE_TAGS and note.get(_TYPE, "normal") == "normal":
+                yield from iter_paragraphs(note, story)
+    else:
+        yield from iter_paragraphs(root, story)
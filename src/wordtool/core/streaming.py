@@ -0,0 +1,253 @@
+"""
+流式引擎：不用 python-docx 加载整个文档包。
+
+逐块（正文下的 w:p / w:tbl 等顶层元素）增量解析 word/document.xml，
+对段落（以及块内表格、文本框中的段落）执行与普通引擎相同的 stage，
+处理完立即写入输出并从内存中释放，峰值内存只取决于最大的单个块，而不是整个文档大小。
+页眉/页脚/脚注/尾注部件很小，整体解析、处理后重新写入；
+其余部件（图片、未修改的样式等）不解压、不重新压缩，压缩数据原样复制到输出包（见 package.py）。
+"""
+import re
+import zipfile
+from collections import deque
+
+from lxml import etree
+
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.oxml import serialize_part_xml
+from docx.oxml.ns import qn
+from docx.oxml.parser import element_class_lookup, parse_xml
+from docx.styles.styles import Styles
+from docx.text.paragraph import Paragraph
+
+from .blocks import BlockModel, StyleMap
+from .index import DocumentIndex
+from .numbering import NumberingExpander
+from .package import PackageWriter, iter_rels, open_source, read_rels
+from .stories import PART_STORIES
+from .styles import StyleSheet
+
+_CHUNK_SIZE = 64 * 1024
+# 等待下一个非空块时最多缓存的块数（连续空段落超过这个数量时不再等待）
+_MAX_LOOKAHEAD = 64
+_XMLNS_ATTR = re.compile(rb'\s+xmlns(?::([\w.-]+))?="([^"]*)"')
+
+
+class _StylesPart:
+    """为 Paragraph 代理提供样式查询（代替 python-docx 的 DocumentPart）"""
+
+    def __init__(self, styles_element):
+        self.styles = Styles(styles_element)
+
+    def get_style(self, style_id, style_type):
+        return self.styles.get_by_id(style_id, style_type)
+
+    def get_style_id(self, style_or_name, style_type):
+        return self.styles.get_style_id(style_or_name, style_type)
+
+
+class _StoryParent:
+    def __init__(self, part):
+        self.part = part
+
+
+# ----------------------------------------------------------------------
+# 序列化
+# ----------------------------------------------------------------------
+def _start_tag(elm, declared=()):
+    """元素（不含子元素）的开始标签，保留属性和 declared 之外的命名空间声明"""
+    empty = etree.Element(elm.tag, dict(elm.attrib), nsmap=elm.nsmap)
+    data = etree.tostring(empty, encoding="UTF-8", xml_declaration=False)
+    return _strip_declared(data[:-2], declared) + b">"
+
+
+def _strip_declared(head, declared):
+    if not declared:
+        return head
+    return _XMLNS_ATTR.sub(
+        lambda m: b"" if ((m.group(1) or b"").decode(), m.group(2).decode()) in declared else m.group(0),
+        head,
+    )
+
+
+def _end_tag(elm):
+    local = etree.QName(elm).localname
+    return f"</{elm.prefix}:{local}>".encode() if elm.prefix else f"</{local}>".encode()
+
+
+def _serialize_block(elm, declared):
+    """
+    序列化一个块；去掉根元素已经声明过的命名空间，
+    避免每个段落都重复携带几十个 xmlns 声明。
+    """
+    data = etree.tostring(elm, encoding="UTF-8", xml_declaration=False)
+    head_end = data.index(b">")
+    return _strip_declared(data[:head_end], declared) + data[head_end:]
+
+
+# ----------------------------------------------------------------------
+# 流式引擎
+# ----------------------------------------------------------------------
+class StreamingEngine:
+    def __init__(self, formatter, pipeline):
+        self.formatter = formatter
+        self.pipeline = pipeline
+
+    def run(self, input_path, output_path, expand_numbering=True):
+        """
+        流式格式化 input_path 写入 output_path，返回流水线上下文。
+        """
+        with zipfile.ZipFile(input_path) as zin:
+            main_part = read_rels(zin, None).get(RT.OFFICE_DOCUMENT, "word/document.xml")
+            doc_rels = read_rels(zin, main_part)
+
+            styles_name = doc_rels.get(RT.STYLES)
+            styles_element = self._parse_part(zin, styles_name)
+            parent = _StoryParent(_StylesPart(styles_element) if styles_element is not None else None)
+
+            # 样式模式：先改好样式表，输出时替换 styles.xml
+            styles_blob = None
+            if self.formatter.style_mode == "styles" and styles_element is not None:
+                self.formatter.style_ids = StyleSheet(styles_element, self.formatter.config).apply()
+                styles_blob = etree.tostring(styles_element, encoding="UTF-8", standalone=True)
+
+            expander = None
+            if expand_numbering:
+                numbering_element = self._parse_part(zin, doc_rels.get(RT.NUMBERING))
+                if numbering_element is not None:
+                    expander = NumberingExpander(numbering_element, styles_element)
+
+            # 有 stage 要执行的页眉/页脚/脚注/尾注部件：部件名 -> 区域
+            story_parts = {}
+            for rel_type, name in iter_rels(zin, main_part):
+                story = PART_STORIES.get(rel_type)
+                if story is not None and self.pipeline.handles(story):
+                    story_parts.setdefault(name, story)
+
+            formatter = self.formatter
+            # 流式处理时段落总数未知
+            ctx = self.pipeline.new_context(formatter=formatter)
+            # 元素索引只保留尚未写出的块；块模型的数组很紧凑，保留整篇文档
+            formatter.doc_index = DocumentIndex()
+            formatter.blocks = BlockModel(formatter.doc_index)
+            formatter.style_map = StyleMap(styles_element)
+            found = False
+            with open_source(input_path) as raw, \
+                    PackageWriter(output_path, formatter.compresslevel, formatter.compress_workers) as writer:
+                for info in zin.infolist():
+                    if info.filename == main_part:
+                        found = True
+                        with zin.open(info) as src, writer.open(info.filename, info.date_time) as dst:
+                            self._stream_document(src, dst, parent, expander, ctx)
+                    elif styles_blob is not None and info.filename == styles_name:
+                        writer.write(info.filename, styles_blob, info.date_time)
+                    elif info.filename in story_parts:
+                        blob = self._process_story_part(zin.read(info), story_parts[info.filename], parent, ctx)
+                        writer.write(info.filename, blob, info.date_time)
+                    else:
+                        writer.copy(raw, info)
+            if formatter.instrument is not None:
+                formatter.instrument.count("parts_copied", writer.copied)
+                formatter.instrument.count("parts_written", writer.written)
+
+        if not found:
+            raise ValueError(f"文档中没有找到主文档部件：{main_part}")
+        return self.pipeline.finish(ctx)
+
+    def _process_story_part(self, data, story, parent, ctx):
+        """处理一个页眉/页脚/脚注/尾注部件，返回新的部件数据"""
+        root = parse_xml(data)
+        doc_index = self.formatter.doc_index
+        doc_index.add(root)
+        self.pipeline.process_part(self.formatter, root, story, ctx, parent)
+        doc_index.forget(root)
+        return serialize_part_xml(root)
+
+    @staticmethod
+    def _parse_part(zin, name):
+        if not name:
+            return None
+        try:
+            return parse_xml(zin.read(name))
+        except KeyError:
+            return None
+
+    def _stream_document(self, src, dst, parent, expander, ctx):
+        parser = etree.XMLPullParser(
+            events=("start", "end"), remove_blank_text=True,
+            resolve_entities=False, huge_tree=True,
+        )
+        parser.set_element_class_lookup(element_class_lookup)
+
+        doc_index = self.formatter.doc_index
+        model = self.formatter.blocks
+        body_tag = qn("w:body")
+        p_tag = qn("w:p")
+        # pending: 已解析、等待处理的 [(块下标, 元素)]
+        state = {"root": None, "body": None, "declared": set(), "pending": deque()}
+
+        def flush(block, elm):
+            """处理并写出一个已经完整解析的块"""
+            if elm.tag == p_tag:
+                self.pipeline.process(self.formatter, Paragraph(elm, parent), ctx, block)
+            # 块内表格单元格、文本框中的段落
+            self.pipeline.process_nested(self.formatter, elm, ctx, parent)
+            dst.write(_serialize_block(elm, state["declared"]))
+            # 写出后从树中移除，释放内存
+            elm.getparent().remove(elm)
+            doc_index.forget(elm)
+
+        def push(elm):
+            """
+            新块加入等待队列；队首块的下一个非空块已经读到时才处理它
+            （表题判断要跨过中间的空段落看到后面的表格），空段落过多时强制处理。
+            """
+            # 块内所有段落（表格单元格、文本框中的段落）都展开编号，计数与 Word 一致；
+            # 先于块模型分类，只有自动编号的段落不会被当成空段落
+            if expander is not None:
+                expander.expand_tree(elm)
+            doc_index.add(elm)
+            pending = state["pending"]
+            pending.append((model.append(elm), elm))
+            while pending and (model.next[pending[0][0]] != -1 or len(pending) > _MAX_LOOKAHEAD):
+                flush(*pending.popleft())
+
+        def handle(event, elm):
+            root = state["root"]
+            if event == "start":
+                if root is None:
+                    state["root"] = elm
+                    state["declared"] = {(k or "", v) for k, v in elm.nsmap.items()}
+                    dst.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\r\n')
+                    dst.write(_start_tag(elm))
+                elif elm.tag == body_tag and elm.getparent() is root:
+                    state["body"] = elm
+                    dst.write(_start_tag(elm, state["declared"]))
+                return
+
+            parent_elm = elm.getparent()
+            if parent_elm is not None and parent_elm is state["body"]:
+                push(elm)
+            elif elm is state["body"]:
+                pending = state["pending"]
+                while pending:
+                    flush(*pending.popleft())
+                dst.write(_end_tag(elm))
+                root.remove(elm)
+            elif parent_elm is not None and parent_elm is root:
+                # body 之外的根级元素（如 w:background）
+                dst.write(_serialize_block(elm, state["declared"]))
+                root.remove(elm)
+            elif elm is root:
+                dst.write(_end_tag(elm))
+
+        while True:
+            chunk = src.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            parser.feed(chunk)
+            for event, elm in parser.read_events():
+                handle(event, elm)
+        parser.close()
+        for event, elm in parser.read_events():
+            handle(event, elm)
@@ -0,0 +1,177 @@
+"""
+样式模式（"style_mode": "styles"）。
+
+不再把字体、字号、行距、缩进逐个写进每个 run / 段落，而是根据配置一次性修改
+styles.xml 中的 正文(Normal)、标题 1~4(Heading 1~4) 和 题注(Caption) 样式，
+段落只保留样式引用，并去掉与样式冲突的直接格式。
+"""
+from docx.enum.style import WD_STYLE_TYPE
+from docx.enum.text import WD_LINE_SPACING, WD_PARAGRAPH_ALIGNMENT
+from docx.oxml.ns import qn
+from docx.shared import Pt, RGBColor
+from docx.styles.style import StyleFactory
+
+# styles.xml 中内置样式的内部名称
+_NORMAL_NAME = "Normal"
+_HEADING_NAME = "heading {}"
+_CAPTION_NAME = "caption"
+
+# 与样式冲突、需要从 run 上去掉的直接格式
+_RUN_OVERRIDES = tuple(qn(t) for t in ("w:rFonts", "w:b", "w:bCs", "w:color", "w:sz", "w:szCs"))
+# 与样式冲突、需要从段落上去掉的直接格式（w:spacing 只去掉行距属性）
+_PARA_OVERRIDES = tuple(qn(t) for t in ("w:ind", "w:jc"))
+_SPACING_LINE_ATTRS = (qn("w:line"), qn("w:lineRule"))
+_THEME_FONT_ATTRS = tuple(qn(f"w:{a}") for a in (
+    "asciiTheme", "hAnsiTheme", "eastAsiaTheme", "cstheme",
+))
+
+
+def _size_pt(style_cfg):
+    from .formatter import extract_pt
+    return extract_pt(style_cfg.get("size", "12"))
+
+
+class StyleSheet:
+    """
+    按配置修改文档样式表，并记录各级别对应的样式 id：
+    style_ids[0] 为正文，style_ids[1~4] 为标题，style_ids["caption"] 为图表标题。
+    """
+
+    def __init__(self, styles_element, config: dict):
+        self.element = styles_element
+        self.config = config
+        self.style_ids = {}
+
+    # ---------------------- 查找/创建样式 ----------------------
+    def _find_or_add(self, name, display_name):
+        lower = name.lower()
+        for style in self.element.iterfind(qn("w:style")):
+            if style.get(qn("w:type")) != "paragraph":
+                continue
+            style_name = style.find(qn("w:name"))
+            if style_name is not None and (style_name.get(qn("w:val")) or "").lower() == lower:
+                return style
+
+        style = self.element.add_style_of_type(display_name, WD_STYLE_TYPE.PARAGRAPH, True)
+        style.name_val = name
+        if name != _NORMAL_NAME:
+            style.basedOn_val = self._normal_id()
+            style.next_val = self._normal_id()
+            style.qFormat_val = True
+        return style
+
+    def _normal_id(self):
+        normal = self.style_ids.get(0)
+        return normal if normal is not None else "Normal"
+
+    # ---------------------- 写入样式属性 ----------------------
+    def _set_font(self, style, style_cfg):
+        font_name = style_cfg.get("font", "宋体")
+        style.font.name = font_name
+        rFonts = style.element.rPr.rFonts
+        rFonts.set(qn("w:eastAsia"), font_name)
+        # 主题字体优先级高于具体字体，必须去掉
+        for attr in _THEME_FONT_ATTRS:
+            rFonts.attrib.pop(attr, None)
+        style.font.size = Pt(_size_pt(style_cfg))
+        style.font.bold = bool(style_cfg.get("bold", False))
+        style.font.color.rgb = RGBColor(0, 0, 0)
+
+    @staticmethod
+    def _set_line_spacing(style, style_cfg):
+        fmt = style.paragraph_format
+        line_rule = style_cfg.get("line_rule", "多倍行距")
+        spacing = float(style_cfg.get("spacing", 1.25))
+        if line_rule == "多倍行距":
+            fmt.line_spacing_rule = WD_LINE_SPACING.MULTIPLE
+            fmt.line_spacing = spacing
+        else:  # 固定值（磅）
+            fmt.line_spacing_rule = WD_LINE_SPACING.EXACTLY
+            fmt.line_spacing = Pt(spacing)
+
+    @staticmethod
+    def _set_indent(style, first_line, first_line_chars):
+        fmt = style.paragraph_format
+        fmt.left_indent = Pt(0)
+        fmt.first_line_indent = first_line
+        # 按字符数缩进，字号变化时 Word 会自动换算
+        style.element.pPr.ind.set(qn("w:firstLineChars"), str(first_line_chars))
+
+    def apply(self):
+        """修改 Normal / Heading 1~4 / Caption 样式，返回 style_ids"""
+        body_cfg = self.config.get("body", {})
+        titles = self.config.get("titles", {})
+        caption_cfg = self.config.get("caption", {})
+
+        # 正文：字体、行距、首行缩进 2 字符、左对齐
+        normal = StyleFactory(self._find_or_add(_NORMAL_NAME, _NORMAL_NAME))
+        self.style_ids[0] = normal.style_id
+        self._set_font(normal, body_cfg)
+        self._set_line_spacing(normal, body_cfg)
+        self._set_indent(normal, Pt(_size_pt(body_cfg) * 2), 200)
+        normal.paragraph_format.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+
+        # 标题 1~4：字体、顶格、左对齐、大纲级别（用于生成目录）
+        for level in range(1, 5):
+            style_cfg = titles.get(f"title{level}", body_cfg)
+            heading = StyleFactory(self._find_or_add(_HEADING_NAME.format(level), f"Heading {level}"))
+            self.style_ids[level] = heading.style_id
+            self._set_font(heading, style_cfg)
+            self._set_indent(heading, Pt(0), 0)
+            heading.paragraph_format.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+            heading.element.pPr.get_or_add_outlineLvl().val = level - 1
+
+        # 图表标题：字体、行距、居中
+        caption = StyleFactory(self._find_or_add(_CAPTION_NAME, "Caption"))
+        self.style_ids["caption"] = caption.style_id
+        self._set_font(caption, caption_cfg)
+        self._set_line_spacing(caption, caption_cfg)
+        self._set_indent(caption, Pt(0), 0)
+        caption.paragraph_format.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+        return self.style_ids
+
+
+# ----------------------------------------------------------------------
+# 段落：只保留样式引用
+# ----------------------------------------------------------------------
+def strip_direct_formatting(p, has_image=None):
+    """
+    去掉段落和 run 上与样式冲突的直接格式（字体、字号、加粗、颜色、行距、缩进、对齐）。
+    只处理段落的直接子 run 和段落标记；文本框、图形中嵌套的 run 属于其他区域，格式保持不变。
+    has_image(r) 为真的图片 run 跳过（与直接格式模式的 _set_run_style 相同）。
+    """
+    pPr = p.pPr
+    if pPr is not None:
+        for child in list(pPr):
+            if child.tag in _PARA_OVERRIDES:
+                pPr.remove(child)
+        spacing = pPr.spacing
+        if spacing is not None:
+            for attr in _SPACING_LINE_ATTRS:
+                spacing.attrib.pop(attr, None)
+            if not spacing.attrib:
+                pPr.remove(spacing)
+        # 段落标记的 rPr 同样处理，保证换行符格式一致
+        _strip_run_props(pPr.find(qn("w:rPr")))
+
+    for r in p.iterchildren(qn("w:r")):
+        if has_image is not None and has_image(r):
+            continue
+        _strip_run_props(r.find(qn("w:rPr")))
+
+
+def _strip_run_props(rPr):
+    if rPr is None:
+        return
+    for child in list(rPr):
+        if child.tag in _RUN_OVERRIDES:
+            rPr.remove(child)
+    if len(rPr) == 0 and not rPr.attrib:
+        rPr.getparent().remove(rPr)
+
+
+def set_paragraph_style(p, style_id):
+    """直接设置段落的 pStyle（style_id 为 None 时使用默认正文样式）"""
+    pPr = p.get_or_add_pPr()
+    pPr.style = style_id
@@ -0,0 +1,152 @@
+"""
+段落文字的最小修改：保留 run 结构，只改动文字真正变化的 w:t。
+
+段落文字是所有 run（含超链接中的 run）内容拼接的结果，与 python-docx 的 Paragraph.text 相同：
+w:t 为其文字，w:tab / w:ptab 为 "\t"，换行类型的 w:br 和 w:cr 为 "\n"，w:noBreakHyphen 为 "-"。
+TextMap 记录每段文字来自哪个元素（偏移 -> 元素），修改按拼接后文字的位置给出，
+可以跨越 run 边界；图片、域代码、脚注引用、文本框等不产生文字的内容和各 run 的格式都不受影响。
+不需要修改的段落只扫描一次，不写任何元素。
+"""
+from docx.oxml.ns import qn
+
+_R = qn("w:r")
+_RPR = qn("w:rPr")
+_T = qn("w:t")
+_BR = qn("w:br")
+_HYPERLINK = qn("w:hyperlink")
+_BR_TYPE = qn("w:type")
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+# run 中固定文字的内容元素（w:br 只有换行类型算 "\n"，单独判断）
+_RUN_TEXT = {
+    qn("w:tab"): "\t",
+    qn("w:ptab"): "\t",
+    qn("w:cr"): "\n",
+    qn("w:noBreakHyphen"): "-",
+}
+
+
+class CharMap:
+    """
+    逐字符替换（str.translate 映射表）。
+    中文文本上 translate 走逐字符的慢路径，先确认文字中有要替换的字符再调用。
+    """
+
+    __slots__ = ("table", "chars")
+
+    def __init__(self, mapping):
+        self.table = str.maketrans(mapping)
+        self.chars = tuple(mapping)
+
+    def __call__(self, text):
+        for c in self.chars:
+            if c in text:
+                return text.translate(self.table)
+        return text
+
+
+# 英文括号 -> 中文括号
+BRACKETS = CharMap({"(": "（", ")": "）"})
+
+
+def _content_text(e):
+    """run 内容元素 e 的文字，不产生文字的元素返回 None"""
+    tag = e.tag
+    if tag == _T:
+        return e.text
+    if tag == _BR:
+        return "\n" if e.get(_BR_TYPE, "textWrapping") == "textWrapping" else None
+    return _RUN_TEXT.get(tag)
+
+
+def iter_text_runs(p):
+    """段落中参与文字拼接的 run：直接子 run 和超链接中的 run，按文档顺序"""
+    for child in p:
+        if child.tag == _R:
+            yield child
+        elif child.tag == _HYPERLINK:
+            for r in child:
+                if r.tag == _R:
+                    yield r
+
+
+def paragraph_text(p):
+    """段落文本，与 python-docx 的 Paragraph.text 相同（不经过 XPath）"""
+    parts = []
+    for r in iter_text_runs(p):
+        for e in r:
+            text = _content_text(e)
+            if text:
+                parts.append(text)
+    return "".join(parts)
+
+
+def translate_text(r, charmap):
+    """按 CharMap 修改 run 中 w:t 的文字，只写回有变化的 w:t，返回修改的个数"""
+    changed = 0
+    for t in r.iterchildren(_T):
+        text = t.text
+        if text:
+            new = charmap(text)
+            if new != text:
+                t.text = new
+                changed += 1
+    return changed
+
+
+class TextMap:
+    """
+    段落文字及其偏移 -> 元素的映射。
+    segments 中每项为 (起始偏移, 结束偏移, 元素)，元素为 w:t 或固定文字的内容元素（w:tab 等）。
+    """
+
+    __slots__ = ("p", "text", "segments")
+
+    def __init__(self, p):
+        self.p = p
+        parts = []
+        segments = []
+        pos = 0
+        for r in iter_text_runs(p):
+            for e in r:
+                text = _content_text(e)
+                if text:
+                    parts.append(text)
+                    segments.append((pos, pos + len(text), e))
+                    pos += len(text)
+        self.text = "".join(parts)
+        self.segments = segments
+
+    def delete(self, ranges):
+        """
+        删除拼接文字中的若干区间 [(start, end)]（按原文字的位置，互不重叠），可以跨越 run。
+        部分落在区间内的 w:t 只截掉对应文字；完全被删除的 w:t、w:tab 等元素直接移除，
+        因此变空的纯文字 run 也一并移除。返回是否有修改。
+        """
+        ranges = [(a, b) for a, b in ranges if a < b]
+        if not ranges:
+            return False
+        emptied = []
+        for start, end, e in self.segments:
+            cuts = [(max(a, start) - start, min(b, end) - start)
+                    for a, b in ranges if a < end and b > start]
+            if not cuts:
+                continue
+            if e.tag != _T:
+                emptied.append(e)
+                continue
+            text = e.text
+            for a, b in reversed(cuts):
+                text = text[:a] + text[b:]
+            if not text:
+                emptied.append(e)
+                continue
+            e.text = text
+            if text != text.strip():
+                e.set(_XML_SPACE, "preserve")
+        for e in emptied:
+            r = e.getparent()
+            r.remove(e)
+            if all(child.tag == _RPR for child in r):
+                r.getparent().remove(r)
+        return True
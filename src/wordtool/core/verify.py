@@ -0,0 +1,324 @@
+"""
+输入 / 输出结构校验：确认格式化没有丢失文字、图片、域、表格。
+
+两个包都逐块流式解析（不建立 python-docx 对象模型），每个段落只保留一个文字哈希：
+- 输入段落先按处理时的规则推算出预期文字：主文档中的段落加上自动编号展开的编号文本，
+  执行 clean_numbering 的区域去掉段首空白和编号后的空白；
+- 两边的文字都把英文括号换成中文括号后再比较，因此括号规范化不算差异。
+另外逐段比较图片、域、脚注引用等不产生文字的内容的数量，逐个比较表格的形状（每行单元格数），
+比较主文档及页眉/页脚/脚注/尾注部件的关系类型数量，以及它们引用的图片等二进制部件的 CRC（只读 zip 目录）。
+
+报告格式与 analyze 相同，可直接序列化为 JSON：
+
+    {
+        "file": ..., "output": ..., "ok": true / false,
+        "paragraphs": 段落数, "tables": 表格数, "seconds": 耗时,
+        "columns": ["part", "index", "kind", "detail"],
+        "differences": [[部件, 段落/表格序号, 差异类型, 说明], ...],
+        "truncated": 超出 MAX_DIFFERENCES 未列出的差异数
+    }
+
+段落序号为该部件中所有段落（含表格、文本框中的段落）按文档顺序的下标。
+"""
+import time
+import zipfile
+from array import array
+from collections import Counter
+
+from lxml import etree
+
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml.ns import qn
+from docx.oxml.parser import parse_xml
+
+from .classify import apply_clean, clean_numbering
+from .matcher import TitleMatcher
+from .numbering import NumberingExpander
+from .package import iter_relationships, read_rels
+from .stories import BODY, PART_STORIES, STORIES, TABLE, TEXTBOX
+from .textedit import BRACKETS, paragraph_text
+
+COLUMNS = ["part", "index", "kind", "detail"]
+MAX_DIFFERENCES = 100
+
+# 段落中不产生文字、但不能丢失的内容
+OBJECT_NAMES = ("drawing", "pict", "object", "fldChar", "fldSimple",
+                "footnoteReference", "endnoteReference", "commentReference")
+_OBJECT_TAGS = tuple(qn(f"w:{name}") for name in OBJECT_NAMES)
+_OBJECT_INDEX = {tag: i for i, tag in enumerate(_OBJECT_TAGS)}
+
+_P = qn("w:p")
+_TBL = qn("w:tbl")
+_TR = qn("w:tr")
+_TC = qn("w:tc")
+_TXBX = qn("w:txbxContent")
+_BODY = qn("w:body")
+
+# 差异说明中显示的文字长度
+_SNIPPET = 30
+
+
+class VerifyError(Exception):
+    """输出没有通过结构校验"""
+
+    def __init__(self, report):
+        self.report = report
+        first = report["differences"][0] if report["differences"] else None
+        message = f"结构校验失败：{len(report['differences']) + report['truncated']} 处差异"
+        if first is not None:
+            message += f"（{first[0]} #{first[1]} {first[2]}：{first[3]}）"
+        super().__init__(message)
+
+
+# ----------------------------------------------------------------------
+# 流式遍历
+# ----------------------------------------------------------------------
+def _iter_items(src, part_story):
+    """
+    流式解析一个部件，按结束顺序生成 ("p", 区域, 元素) 和 ("tbl", None, 元素)。
+    区域为 None 的段落不经过流水线（如正文内容控件 w:sdt 中的段落）。
+    正文的顶层块处理完后立即从树中移除。
+    """
+    body = None
+    txbx_depth = 0
+    for event, elm in etree.iterparse(src, events=("start", "end"), tag=(_P, _TBL, _TXBX, _BODY),
+                                      resolve_entities=False, huge_tree=True):
+        tag = elm.tag
+        if tag == _TXBX:
+            txbx_depth += 1 if event == "start" else -1
+            continue
+        if event == "start":
+            if tag == _BODY:
+                body = elm
+            continue
+        if tag == _BODY:
+            continue
+
+        if tag == _TBL:
+            yield "tbl", None, elm
+        elif part_story != BODY:
+            yield "p", TEXTBOX if txbx_depth else part_story, elm
+        else:
+            yield "p", _body_story(elm, body, txbx_depth), elm
+
+        # 正文顶层块：连同前面的书签等零散元素一起释放
+        if body is not None and elm.getparent() is body:
+            while elm.getprevious() is not None:
+                body.remove(elm.getprevious())
+            body.remove(elm)
+
+
+def _body_story(p, body, txbx_depth):
+    # 与 Pipeline.run / process_nested 的遍历范围一致
+    top = p
+    parent = p.getparent()
+    while parent is not None and parent is not body:
+        top, parent = parent, parent.getparent()
+    if parent is None or top.tag not in (_P, _TBL):
+        return None
+    if txbx_depth:
+        return TEXTBOX
+    if top is p:
+        return BODY
+    return TABLE if top.tag == _TBL else None
+
+
+def _objects(p):
+    counts = None
+    for e in p.iter(_OBJECT_TAGS):
+        if counts is None:
+            counts = [0] * len(_OBJECT_TAGS)
+        counts[_OBJECT_INDEX[e.tag]] += 1
+    return tuple(counts) if counts is not None else None
+
+
+def _table_shape(tbl):
+    return tuple(sum(1 for _ in tr.iterchildren(_TC)) for tr in tbl.iterchildren(_TR))
+
+
+def _describe_objects(expected, actual):
+    expected = expected or (0,) * len(OBJECT_NAMES)
+    actual = actual or (0,) * len(OBJECT_NAMES)
+    return "，".join(f"{name} {a} -> {b}" for name, a, b in zip(OBJECT_NAMES, expected, actual) if a != b)
+
+
+# ----------------------------------------------------------------------
+# 单个部件
+# ----------------------------------------------------------------------
+class _PartRecord:
+    """输入部件的紧凑记录：每段一个文字哈希，图片等内容只记录非零的段落"""
+
+    def __init__(self):
+        self.texts = array("q")
+        self.objects = {}
+        self.tables = array("q")
+        self.shapes = {}  # 只在报告差异时需要，按表格序号保存形状
+
+
+class _Verifier:
+    def __init__(self, config, expand_numbering=True, pipeline=None):
+        if pipeline is None:
+            from .formatter import WordFormatter  # noqa: F401  导入时注册内置 stage
+            from .pipeline import Pipeline
+
+            pipeline = Pipeline.from_config(config)
+        # 执行 clean_numbering 的区域
+        self.clean_stories = {
+            story for story in STORIES
+            if any(name == "clean_numbering" for name, _ in pipeline.stages_for(story))
+        }
+        self.match = TitleMatcher.from_config(config).match
+        self.expand_numbering = expand_numbering
+        self.differences = []
+        self.truncated = 0
+        self.paragraphs = 0
+        self.tables = 0
+
+    def report(self, part, index, kind, detail):
+        if len(self.differences) < MAX_DIFFERENCES:
+            self.differences.append([part, index, kind, detail])
+        else:
+            self.truncated += 1
+
+    def _expected_text(self, text, story):
+        if story in self.clean_stories and text.strip():
+            text = apply_clean(text, *clean_numbering(text, self.match))
+        return BRACKETS(text)
+
+    def record(self, src, story, expander):
+        """读取输入部件，返回 _PartRecord"""
+        record = _PartRecord()
+        for kind, p_story, elm in _iter_items(src, story):
+            if kind == "tbl":
+                shape = _table_shape(elm)
+                record.shapes[len(record.tables)] = shape
+                record.tables.append(hash(shape))
+                continue
+            text = paragraph_text(elm)
+            # 正文部件中所有段落的自动编号都会展开（与 NumberingExpander.expand_tree 的顺序相同）
+            if expander is not None:
+                rendered = expander.render(elm)
+                if rendered is not None:
+                    text = (rendered[0] or "") + (rendered[1] or "") + text
+            if p_story is not None:
+                text = self._expected_text(text, p_story)
+            else:
+                text = BRACKETS(text)
+            objects = _objects(elm)
+            if objects is not None:
+                record.objects[len(record.texts)] = objects
+            record.texts.append(hash(text))
+        return record
+
+    def compare(self, src, story, part, record):
+        """流式读取输出部件，与输入记录逐段比较"""
+        paragraphs = tables = 0
+        texts, shapes = record.texts, record.tables
+        for kind, _, elm in _iter_items(src, story):
+            if kind == "tbl":
+                if tables < len(shapes):
+                    shape = _table_shape(elm)
+                    if hash(shape) != shapes[tables]:
+                        self.report(part, tables, "table",
+                                    f"行/单元格 {list(record.shapes[tables])} -> {list(shape)}")
+                tables += 1
+                continue
+            if paragraphs < len(texts):
+                text = paragraph_text(elm)
+                if hash(BRACKETS(text)) != texts[paragraphs]:
+                    self.report(part, paragraphs, "text", f"输出为 {text[:_SNIPPET]!r}")
+                expected = record.objects.get(paragraphs)
+                actual = _objects(elm)
+                if expected != actual:
+                    self.report(part, paragraphs, "objects", _describe_objects(expected, actual))
+            paragraphs += 1
+        if paragraphs != len(texts):
+            self.report(part, -1, "paragraph_count", f"{len(texts)} -> {paragraphs}")
+        if tables != len(shapes):
+            self.report(part, -1, "table_count", f"{len(shapes)} -> {tables}")
+        self.paragraphs += len(texts)
+        self.tables += len(shapes)
+
+
+# ----------------------------------------------------------------------
+# 包
+# ----------------------------------------------------------------------
+def _read_part(zin, name):
+    if not name:
+        return None
+    try:
+        return parse_xml(zin.read(name))
+    except KeyError:
+        return None
+
+
+def verify_documents(source, output, config: dict, expand_numbering=True, pipeline=None):
+    """
+    校验 output 是否为 source 按 config 格式化的结果（两者为路径或可 seek 的文件对象），返回报告字典。
+    expand_numbering 为 False 时不推算自动编号展开的文字（numbering_backend 为 com 时输入已是展开后的文件）。
+    """
+    start = time.perf_counter()
+    verifier = _Verifier(config, expand_numbering, pipeline)
+    with zipfile.ZipFile(source) as zin, zipfile.ZipFile(output) as zout:
+        main_part = read_rels(zin, None).get(RT.OFFICE_DOCUMENT, "word/document.xml")
+        doc_rels = read_rels(zin, main_part)
+        expander = None
+        if expand_numbering:
+            numbering_element = _read_part(zin, doc_rels.get(RT.NUMBERING))
+            if numbering_element is not None:
+                expander = NumberingExpander(numbering_element, _read_part(zin, doc_rels.get(RT.STYLES)))
+
+        parts = [(main_part, BODY)]
+        seen = {main_part}
+        for rel_type, target, external in iter_relationships(zin, main_part):
+            story = PART_STORIES.get(rel_type)
+            if story is not None and not external and target not in seen:
+                seen.add(target)
+                parts.append((target, story))
+
+        binaries = set()
+        for name, story in parts:
+            if name not in zout.NameToInfo:
+                verifier.report(name, -1, "missing_part", "输出中没有该部件")
+                continue
+            with zin.open(name) as src:
+                record = verifier.record(src, story, expander if name == main_part else None)
+            with zout.open(name) as src:
+                verifier.compare(src, story, name, record)
+
+            # 关系：按类型计数比较；引用的二进制部件（图片、嵌入对象）比较 CRC
+            rels_in = list(iter_relationships(zin, name))
+            expected = Counter(rel_type for rel_type, _, _ in rels_in)
+            actual = Counter(rel_type for rel_type, _, _ in iter_relationships(zout, name))
+            for rel_type in sorted(set(expected) | set(actual)):
+                if expected[rel_type] != actual[rel_type]:
+                    verifier.report(name, -1, "relationships",
+                                    f"{rel_type.rsplit('/', 1)[-1]} {expected[rel_type]} -> {actual[rel_type]}")
+            binaries.update(target for _, target, external in rels_in
+                            if not external and not target.endswith(".xml"))
+
+        for name in sorted(binaries):
+            info = zin.NameToInfo.get(name)
+            if info is None:
+                continue
+            out_info = zout.NameToInfo.get(name)
+            if out_info is None:
+                verifier.report(name, -1, "missing_part", "输出中没有该部件")
+            elif (out_info.CRC, out_info.file_size) != (info.CRC, info.file_size):
+                verifier.report(name, -1, "media", "内容与输入不同")
+
+    return {
+        "file": _display(source),
+        "output": _display(output),
+        "ok": not verifier.differences,
+        "paragraphs": verifier.paragraphs,
+        "tables": verifier.tables,
+        "seconds": round(time.perf_counter() - start, 6),
+        "columns": COLUMNS,
+        "differences": verifier.differences,
+        "truncated": verifier.truncated,
+    }
+
+
+def _display(f):
+    return str(f) if isinstance(f, (str, bytes)) or hasattr(f, "__fspath__") else "<stream>"
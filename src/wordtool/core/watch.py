@@ -0,0 +1,372 @@
+"""
+监视目录（wordtool watch DIR）：放进目录的 .docx 自动格式化，输出写在旁边。
+
+- 目录变化：Linux 上用 inotify（ctypes 调用 libc，无需第三方库），其他平台或 inotify 不可用时定时扫描
+- 防抖：文件大小和修改时间持续 settle 秒不变、并且 zip 目录已经完整时才处理，
+  正在复制、正在保存的文件不会被读到一半；Word 锁文件（~$*.docx）和隐藏文件跳过
+- 常驻的预热进程池（与 serve 相同，工作进程预先导入 formatter 并编译配置），
+  一次放入几百个文件时只保持 jobs*2 个在途任务，其余按到达顺序排队
+- 输出先写入同目录的隐藏临时文件，完成后 os.replace 原子替换，读取方不会看到半个文件；
+  工作进程先把输入整体读入内存再处理，处理过程中输入被覆盖也不影响
+- 启动时补做目录中还没有输出（或输出比输入旧）的文件；处理期间输入又被修改时，完成后重新处理
+  （大小或修改时间与提交处理时不同才算修改）
+- 工作进程自己无法中断的超时任务（卡在 C 代码中等），超过宽限时间后终止并重建进程池，其余在途文件重新排队
+
+输出默认与输入同目录，文件名与界面相同（格式化_原名.docx），这些输出文件本身不会再被处理。
+"""
+import ctypes
+import ctypes.util
+import io
+import logging
+import os
+import select
+import signal
+import struct
+import sys
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from .batch import BatchResult, WorkerPool, _format_one, grace_period, remove_temp
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_PREFIX = "格式化_"
+DEFAULT_SETTLE = 1.0          # 文件持续不变多少秒后处理
+DEFAULT_POLL_INTERVAL = 1.0   # 扫描方式的扫描间隔（秒）
+DEFAULT_MAX_WAIT = 300.0      # 文件一直不是完整的 zip 时最多等待多少秒
+
+# 主循环的间隔（秒）：检查防抖、收集完成的任务
+_TICK = 0.2
+
+
+# ----------------------------------------------------------------------
+# 目录变化
+# ----------------------------------------------------------------------
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_IN_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+_EVENT_HEADER = struct.Struct("iIII")  # struct inotify_event: wd, mask, cookie, len
+
+
+class InotifyWatcher:
+    """Linux inotify（只监视 directory 本身，不含子目录）"""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        if libc.inotify_add_watch(fd, os.fsencode(directory), _IN_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(errno, f"inotify_add_watch 失败：{directory}")
+        self.fd = fd
+
+    def wait(self, timeout):
+        """
+        等待最多 timeout 秒，返回有变化的文件名集合；
+        事件队列溢出（丢失了事件）时返回 None，调用方应重新扫描整个目录。
+        """
+        names = set()
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return names
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return names
+            pos = 0
+            while pos < len(data):
+                _, mask, _, length = _EVENT_HEADER.unpack_from(data, pos)
+                pos += _EVENT_HEADER.size
+                if mask & _IN_Q_OVERFLOW:
+                    return None
+                if length:
+                    names.add(os.fsdecode(data[pos:pos + length].rstrip(b"\0")))
+                pos += length
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class PollingWatcher:
+    """定时扫描目录，比较文件大小和修改时间"""
+
+    def __init__(self, directory, interval=DEFAULT_POLL_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self._snapshot = self._scan()
+        self._next = time.monotonic() + interval
+
+    def _scan(self):
+        snapshot = {}
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                snapshot[entry.name] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def wait(self, timeout):
+        now = time.monotonic()
+        if now < self._next:
+            time.sleep(min(timeout, self._next - now))
+            if time.monotonic() < self._next:
+                return set()
+        self._next = time.monotonic() + self.interval
+        old, self._snapshot = self._snapshot, self._scan()
+        new = self._snapshot
+        return {name for name in old.keys() | new.keys() if old.get(name) != new.get(name)}
+
+    def close(self):
+        pass
+
+
+def make_watcher(directory, polling=False, interval=DEFAULT_POLL_INTERVAL):
+    """优先使用 inotify，不可用时（非 Linux、监视数量达到上限等）改为定时扫描"""
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError) as e:
+            logger.warning("inotify 不可用，改为定时扫描：%s", e, extra={"event": "watch_polling"})
+    return PollingWatcher(directory, interval)
+
+
+# ----------------------------------------------------------------------
+# 工作进程中执行
+# ----------------------------------------------------------------------
+def _format_atomic(in_path, out_path, config, timeout):
+    """读入输入的快照再格式化（_format_one 先写临时文件，成功后原子替换为 out_path）"""
+    try:
+        with open(in_path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        return BatchResult(in_path, out_path, "failed", 0.0, 0, f"{type(e).__name__}: {e}")
+    return _format_one(io.BytesIO(data), out_path, config, timeout)._replace(path=in_path)
+
+
+# ----------------------------------------------------------------------
+# 主进程
+# ----------------------------------------------------------------------
+class FolderWatcher:
+    """
+    directory: 监视的目录；out_dir: 输出目录，默认与 directory 相同
+    jobs: 工作进程数；settle: 防抖秒数；polling: 强制使用定时扫描
+    on_result: 每处理完一个文件回调一次 on_result(BatchResult)
+    """
+
+    def __init__(self, directory, config: dict, out_dir=None, jobs=None, settle=DEFAULT_SETTLE,
+                 polling=False, poll_interval=DEFAULT_POLL_INTERVAL, timeout=None,
+                 max_tasks_per_child=None, max_wait=DEFAULT_MAX_WAIT, on_result=None):
+        self.directory = Path(directory)
+        self.out_dir = Path(out_dir) if out_dir else self.directory
+        self.config = config
+        self.jobs = jobs or os.cpu_count() or 1
+        self.settle = settle
+        self.polling = polling
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.max_tasks_per_child = max_tasks_per_child
+        self.max_wait = max_wait
+        self.on_result = on_result
+        self.pool = None
+        # 等待防抖的文件：{文件名: [大小, 修改时间, 开始不变的时间, 第一次发现的时间]}
+        self._pending = {}
+        self._ready = deque()   # 已经稳定、等待提交的文件名
+        self._running = {}      # {future: 文件名}
+        # 最近一次提交处理时文件的 (大小, 修改时间)：之后的事件没有改变文件时不重新处理
+        self._snapshots = {}
+        self.processed = 0
+        self.failed = 0
+
+    # ---------------------- 文件筛选 ----------------------
+    def is_candidate(self, name):
+        if not name.endswith(".docx") or name.startswith(("~$", ".")):
+            return False
+        # 输出写在同一目录时不处理自己的输出
+        return not (self.out_dir == self.directory and name.startswith(OUTPUT_PREFIX))
+
+    def output_path(self, name):
+        return self.out_dir / (OUTPUT_PREFIX + name)
+
+    def _up_to_date(self, name):
+        try:
+            return self.output_path(name).stat().st_mtime_ns >= (self.directory / name).stat().st_mtime_ns
+        except FileNotFoundError:
+            return False
+
+    def _scan(self, initial=False):
+        """把目录中的候选文件加入防抖队列；启动时跳过输出已是最新的文件"""
+        for entry in os.scandir(self.directory):
+            if self.is_candidate(entry.name) and entry.is_file():
+                if initial and self._up_to_date(entry.name):
+                    continue
+                self._touch(entry.name)
+
+    def _touch(self, name):
+        if name not in self._pending:
+            now = time.monotonic()
+            self._pending[name] = [None, None, now, now]
+
+    # ---------------------- 防抖 ----------------------
+    def _check_pending(self, now):
+        queued = set(self._ready) | set(self._running.values())
+        for name, state in list(self._pending.items()):
+            if name in queued:
+                continue  # 处理中又被修改：完成后再处理
+            path = self.directory / name
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                del self._pending[name]  # 已被删除或改名
+                self._snapshots.pop(name, None)
+                continue
+            signature = (st.st_size, st.st_mtime_ns)
+            if signature == self._snapshots.get(name):
+                del self._pending[name]  # 与已处理的版本相同（如写完之后才到达的事件）
+                continue
+            if signature != (state[0], state[1]):
+                state[0], state[1], state[2] = signature[0], signature[1], now
+                continue
+            if now - state[2] < self.settle:
+                continue
+            if zipfile.is_zipfile(path):
+                del self._pending[name]
+                self._snapshots[name] = signature
+                self._ready.append(name)
+            elif now - state[3] > self.max_wait:
+                del self._pending[name]
+                self._emit(BatchResult(str(path), str(self.output_path(name)), "skipped", 0.0, 0,
+                                       "不是完整的 .docx 文件"))
+            else:
+                state[2] = now  # 还没有写完（zip 目录不完整），继续等待
+
+    # ---------------------- 工作进程池 ----------------------
+    def _start_pool(self):
+        from .server import _init_worker
+
+        self.pool = WorkerPool(self.jobs, self.max_tasks_per_child,
+                               initializer=_init_worker, initargs=([self.config],))
+
+    def _restart_pool(self, reason):
+        """终止并重建进程池，尚未完成的文件重新排在队首"""
+        logger.warning("终止并重建进程池（%s）", reason, extra={"event": "watch_pool_restart"})
+        self._ready.extendleft(reversed(list(self._running.values())))
+        self._running.clear()
+        self.pool.restart()
+
+    def _submit(self):
+        while self._ready and len(self._running) < self.jobs * 2:
+            name = self._ready.popleft()
+            future = self.pool.submit(_format_atomic, str(self.directory / name),
+                                      str(self.output_path(name)), self.config, self.timeout)
+            self._running[future] = name
+
+    def _collect(self, restart=True):
+        broken = False
+        for future in [f for f in self._running if f.done()]:
+            name = self._running.pop(future)
+            if future.cancelled():
+                continue  # 停止时撤销的任务：没有输出，下次启动时补做
+            try:
+                result = future.result()
+            except Exception as e:  # 工作进程崩溃等
+                broken = broken or isinstance(e, BrokenProcessPool)
+                result = BatchResult(str(self.directory / name), str(self.output_path(name)), "failed",
+                                     0.0, 0, f"{type(e).__name__}: {e}")
+            self._emit(result)
+        if broken and restart:
+            self._restart_pool("工作进程异常退出")
+
+    def _check_hung(self):
+        """开始执行后超过宽限时间仍未完成的文件判为超时，终止并重建进程池（与 batch 相同）"""
+        grace = grace_period(self.timeout)
+        if not grace:
+            return
+        hung = self.pool.hung(grace)
+        if not hung:
+            return
+        abandoned = []
+        for future, seconds in hung:
+            name = self._running.pop(future)
+            abandoned.append(self.output_path(name))
+            self._emit(BatchResult(str(self.directory / name), str(self.output_path(name)), "failed",
+                                   seconds, 0, "处理超时"))
+        self._restart_pool("处理超时")
+        for out_path in abandoned:
+            remove_temp(str(out_path))
+
+    def _stop_pool(self):
+        """撤销尚未开始的任务，等待运行中的任务完成；超过宽限时间仍未完成时直接终止工作进程"""
+        for future in self._running:
+            future.cancel()
+        _, running = wait(self._running, timeout=grace_period(self.timeout))
+        if running:
+            self.pool.terminate()
+            for future in running:
+                remove_temp(str(self.output_path(self._running[future])))
+        else:
+            self.pool.shutdown(wait=True)
+        self._collect(restart=False)
+
+    def _emit(self, result):
+        self.processed += 1
+        if result.status != "ok":
+            self.failed += 1
+        if self.on_result is not None:
+            self.on_result(result)
+
+    # ---------------------- 主循环 ----------------------
+    def run(self, stop=None):
+        """持续监视，直到 stop（threading.Event）被置位；返回时等待在途任务完成"""
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        watcher = make_watcher(self.directory, self.polling, self.poll_interval)
+        self._start_pool()
+        logger.info("正在监视 %s（%s，%d 个工作进程）", self.directory, type(watcher).__name__, self.jobs,
+                    extra={"event": "watch_start", "directory": str(self.directory), "workers": self.jobs})
+        try:
+            self._scan(initial=True)
+            while stop is None or not stop.is_set():
+                names = watcher.wait(_TICK)
+                if names is None:
+                    self._scan()
+                else:
+                    for name in names:
+                        if self.is_candidate(name):
+                            self._touch(name)
+                self._check_pending(time.monotonic())
+                self._collect()
+                self._check_hung()
+                self._submit()
+        finally:
+            watcher.close()
+            self._stop_pool()
+            logger.info("停止监视：处理 %d 个文件，失败 %d 个", self.processed, self.failed,
+                        extra={"event": "watch_stop", "processed": self.processed, "failed": self.failed})
+
+
+def watch(folder: FolderWatcher):
+    """运行 folder 直到收到 SIGINT / SIGTERM"""
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            signal.signal(sig, lambda signum, frame: stop.set())
+        except (ValueError, OSError):  # 不在主线程中
+            pass
+    folder.run(stop)
@@ -0,0 +1,41 @@
+"""
+日志配置：命令行和图形界面启动时调用 setup_logging()。
+
+核心代码只通过 logging.getLogger(__name__) 输出，作为库使用时不会向控制台打印；
+json_format=True 时每条日志输出一行 JSON，extra 中的字段（event、file 等）一并输出，
+便于批量处理时收集和检索。
+"""
+import json
+import logging
+import sys
+
+# LogRecord 自带的属性，不属于 extra
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def setup_logging(level="INFO", json_format=False):
+    """日志输出到 stderr，避免和命令行的结果输出（stdout）混在一起"""
+    handler = logging.StreamHandler(sys.stderr)
+    if json_format:
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(message)s"))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
@@ -0,0 +1,10 @@
+"""
+pytest 配置：未安装 wordtool 时直接从 src/ 导入。
+tests/ 下的 2.py、序列号.py 是依赖 Word 的手工脚本，不会被 pytest 收集。
+"""
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
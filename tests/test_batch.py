@@ -0,0 +1,109 @@
+"""
+批量处理（batch.py）：超时的文件判为失败，卡住的工作进程被终止，其余文件（包括排在后面的）照常完成。
+"""
+import multiprocessing
+import os
+import signal
+import time
+
+import pytest
+from docx import Document
+
+from wordtool.config import ConfigManager
+from wordtool.core import batch
+
+
+def _hang(in_path, out_path, config, timeout):
+    """模拟卡在 C 代码中的文档：屏蔽 SIGALRM，留下临时文件后一直不返回"""
+    if "hang" in os.path.basename(in_path):
+        signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGALRM})
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        with open(batch.temp_path(out_path), "w") as f:
+            f.write("partial")
+        time.sleep(600)
+    return _format_one(in_path, out_path, config, timeout)
+
+
+def _slow(in_path, out_path, config, timeout):
+    """可以被 SIGALRM 中断的慢文档"""
+    if "slow" not in os.path.basename(in_path):
+        return _format_one(in_path, out_path, config, timeout)
+    from wordtool.core.formatter import WordFormatter
+
+    save = WordFormatter.save
+    WordFormatter.save = lambda self, path: time.sleep(600)
+    try:
+        return _format_one(in_path, out_path, config, timeout)
+    finally:
+        WordFormatter.save = save
+
+
+_format_one = batch._format_one
+
+
+@pytest.fixture
+def in_dir(tmp_path):
+    directory = tmp_path / "in"
+    directory.mkdir()
+    for name in ("a_hang", "b_slow", "c", "d", "e", "f"):
+        doc = Document()
+        doc.add_paragraph("一、 总则")
+        doc.add_paragraph(f"正文 {name}")
+        doc.save(directory / f"{name}.docx")
+    (directory / "~$c.docx").write_bytes(b"lock")
+    return directory
+
+
+def _statuses(results):
+    return {os.path.basename(r.path): (r.status, r.error) for r in results}
+
+
+@pytest.mark.skipif(not hasattr(signal, "setitimer"), reason="需要 SIGALRM")
+def test_worker_timeout(in_dir, tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "_format_one", _slow)
+    results = batch.run_batch(in_dir, tmp_path / "out", ConfigManager.default_config(), jobs=2, timeout=0.5)
+    statuses = _statuses(results)
+    assert statuses["b_slow.docx"] == ("failed", "FormatTimeout: 处理超时")
+    assert all(status == "ok" for name, (status, _) in statuses.items() if name != "b_slow.docx"), statuses
+    assert "~$c.docx" not in statuses
+    # 超时的文件不留下输出和临时文件
+    assert sorted(os.listdir(tmp_path / "out")) == ["a_hang.docx", "c.docx", "d.docx", "e.docx", "f.docx"]
+
+
+@pytest.mark.skipif(not hasattr(signal, "pthread_sigmask"), reason="需要屏蔽信号")
+def test_hung_worker_is_terminated(in_dir, tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "_format_one", _hang)
+    monkeypatch.setattr(batch, "grace_period", lambda timeout: 1.5)
+    others = set(multiprocessing.active_children())
+
+    start = time.monotonic()
+    # 单个工作进程：其余文件都排在卡住的文件后面，等待期间不计入超时
+    results = batch.run_batch(in_dir, tmp_path / "out", ConfigManager.default_config(), jobs=1, timeout=0.5)
+    assert time.monotonic() - start < 30
+
+    statuses = _statuses(results)
+    assert statuses.pop("a_hang.docx") == ("failed", "处理超时")
+    assert statuses.pop("b_slow.docx")[0] == "ok"
+    assert all(status == "ok" for status, _ in statuses.values()), statuses
+    assert sorted(os.listdir(tmp_path / "out")) == ["b_slow.docx", "c.docx", "d.docx", "e.docx", "f.docx"]
+    # 工作进程全部结束，且没有终止不属于批量处理进程池的进程
+    assert set(multiprocessing.active_children()) == others
+
+
+def test_terminate_only_own_workers():
+    other = batch.WorkerPool(1, track=False)
+    pool = batch.WorkerPool(1)
+    try:
+        assert other.submit(os.getpid).result() != os.getpid()
+        future = pool.submit(time.sleep, 600)
+        deadline = time.monotonic() + 10
+        while not pool.hung(0) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        [(hung, seconds)] = pool.hung(0)
+        assert hung is future and seconds >= 0
+        pool.restart()
+        assert pool.submit(os.getpid).result() != os.getpid()
+        assert other.submit(sum, [1, 2]).result() == 3
+    finally:
+        pool.terminate()
+        other.shutdown()
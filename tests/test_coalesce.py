@@ -0,0 +1,142 @@
+"""
+合并碎片化的 run（coalesce.py）：格式等价的相邻纯文本 run 合并后文字不变，拼写检查标记成对去掉。
+"""
+import pytest
+from docx.oxml.ns import nsdecls, qn
+from docx.oxml.parser import parse_xml
+from docx.text.paragraph import Paragraph
+from lxml import etree
+
+from wordtool.core.coalesce import coalesce_runs
+
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+
+def _p(body):
+    return parse_xml(f"<w:p {nsdecls('w', 'r')}>{body}</w:p>")
+
+
+def _r(text, rpr=""):
+    return f'<w:r>{rpr}<w:t xml:space="preserve">{text}</w:t></w:r>'
+
+
+def _c14n(e):
+    return etree.tostring(e, method="c14n", exclusive=True)
+
+
+def _proof(kind):
+    return f'<w:proofErr w:type="{kind}"/>'
+
+
+def _tags(p):
+    return [etree.QName(child).localname for child in p]
+
+
+def _proof_types(p):
+    return [mark.get(qn("w:type")) for mark in p.iter(qn("w:proofErr"))]
+
+
+BOLD = "<w:rPr><w:b/></w:rPr>"
+
+
+def test_merge_equal_runs():
+    p = _p(_r("一、", BOLD) + _r(" 总则", BOLD) + _r("正文") + '<w:r><w:t>内容</w:t><w:tab/></w:r>' + _r(" "))
+    assert coalesce_runs(p) == 3
+    assert Paragraph(p, None).text == "一、 总则正文内容\t "
+    assert _tags(p) == ["r", "r"]
+    first, second = p.findall(qn("w:r"))
+    assert [t.text for t in first.iter(qn("w:t"))] == ["一、 总则"]
+    # 相邻的 w:t 拼接成一个，制表符保持原位
+    assert [etree.QName(c).localname for c in second] == ["t", "tab", "t"]
+    assert second[0].text == "正文内容" and second[2].get(_XML_SPACE) == "preserve"
+    # 没有可合并的 run 时不做任何修改
+    before = _c14n(p)
+    assert coalesce_runs(p) == 0
+    assert _c14n(p) == before
+
+
+def test_whitespace_is_preserved():
+    p = _p('<w:r><w:t>结尾</w:t></w:r><w:r><w:t xml:space="preserve"> </w:t></w:r>')
+    coalesce_runs(p)
+    [t] = p.iter(qn("w:t"))
+    assert (t.text, t.get(_XML_SPACE)) == ("结尾 ", "preserve")
+    # 重新解析后空格不丢失
+    assert Paragraph(parse_xml(_c14n(p)), None).text == "结尾 "
+
+
+def test_language_is_ignored():
+    zh = '<w:rPr><w:b/><w:lang w:eastAsia="zh-CN"/></w:rPr>'
+    en = '<w:rPr><w:b/><w:lang w:val="en-US"/></w:rPr>'
+    p = _p(_r("中文", zh) + _r("English", en) + _r("。", BOLD))
+    assert coalesce_runs(p) == 2
+    [r] = p.findall(qn("w:r"))
+    assert [t.text for t in r.iter(qn("w:t"))] == ["中文English。"]
+    # 保留第一个 run 的格式
+    assert r.find(qn("w:rPr")).find(qn("w:lang")).get(qn("w:eastAsia")) == "zh-CN"
+
+
+@pytest.mark.parametrize("rpr", [
+    "<w:rPr><w:i/></w:rPr>",
+    '<w:rPr><w:b w:val="0"/></w:rPr>',
+    '<w:rPr><w:b/><w:color w:val="FF0000"/></w:rPr>',
+    '<w:rPr><w:rStyle w:val="Strong"/></w:rPr>',
+])
+def test_different_format_is_kept(rpr):
+    p = _p(_r("加粗", BOLD) + _r("其他", rpr))
+    before = _c14n(p)
+    assert coalesce_runs(p) == 0
+    assert _c14n(p) == before
+
+
+@pytest.mark.parametrize("content", [
+    "<w:drawing/>",
+    "<w:br/>",
+    '<w:fldChar w:fldCharType="begin"/>',
+    '<w:t>带换行</w:t><w:br w:type="page"/>',
+])
+def test_special_runs_are_not_merged(content):
+    p = _p(_r("前") + f"<w:r>{content}</w:r>" + _r("后"))
+    before = _c14n(p)
+    assert coalesce_runs(p) == 0
+    assert _c14n(p) == before
+
+
+def test_only_direct_child_runs():
+    # 超链接、修订中的 run 不合并，也不与外面的 run 合并
+    p = _p(_r("前") + '<w:hyperlink r:id="rId1">' + _r("链") + _r("接") + "</w:hyperlink>" + _r("后"))
+    before = _c14n(p)
+    assert coalesce_runs(p) == 0
+    assert _c14n(p) == before
+
+
+def test_proof_marks_between_merged_runs():
+    p = _p(_r("这是") + _proof("spellStart") + _r("错字") + _proof("spellEnd") + _r("。"))
+    assert coalesce_runs(p) == 2
+    assert _tags(p) == ["r"]
+    assert Paragraph(p, None).text == "这是错字。"
+
+
+def test_proof_partner_outside_merge_is_removed():
+    # spellStart 夹在合并的 run 之间，spellEnd 在图片 run 之后：一起去掉，不留下孤立的标记
+    p = _p(_r("这是") + _proof("spellStart") + _r("错")
+           + "<w:r><w:drawing/></w:r>" + _r("字") + _proof("spellEnd"))
+    assert coalesce_runs(p) == 1
+    assert _proof_types(p) == []
+    assert Paragraph(p, None).text == "这是错字"
+
+
+def test_other_proof_marks_are_kept():
+    # 不在合并位置的标记（段首、格式不同的 run 之间、段尾）原样保留
+    body = (_proof("gramStart") + _r("句子") + _proof("gramEnd")
+            + _r("加粗", BOLD) + _proof("spellStart") + _r("斜体", "<w:rPr><w:i/></w:rPr>") + _proof("spellEnd"))
+    p = _p(body)
+    before = _c14n(p)
+    assert coalesce_runs(p) == 0
+    assert _c14n(p) == before
+
+    p = _p(_proof("gramStart") + _r("句") + _proof("spellStart") + _r("子") + _proof("spellEnd")
+           + _proof("gramEnd") + "<w:r><w:br/></w:r>")
+    assert coalesce_runs(p) == 1
+    # 只去掉夹在中间的 spell 对，跨越合并的 gram 对保留
+    assert _proof_types(p) == ["gramStart", "gramEnd"]
+    assert _tags(p) == ["proofErr", "r", "proofErr", "r"]
@@ -0,0 +1,66 @@
+"""
+配置加载（config.py）：--config / 服务严格校验，界面配置文件尽量保留可用的设置。
+"""
+import json
+
+import pytest
+
+from wordtool import config as config_module
+from wordtool.config import ConfigManager
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    path = tmp_path / "ui_config.json"
+    monkeypatch.setattr(config_module, "CONFIG_PATH", path)
+    return path
+
+
+def _config(**titles):
+    config = ConfigManager.default_config()
+    for key, fmt in titles.items():
+        config["titles"][key]["format"] = fmt
+    return config
+
+
+def test_missing_file_gives_defaults(config_file):
+    assert ConfigManager.load_config() == ConfigManager.default_config()
+
+
+@pytest.mark.parametrize("content", ["{不是 JSON", "[1, 2]", '{"titles": 5}'])
+def test_unreadable_file_gives_defaults(config_file, content, caplog):
+    config_file.write_text(content, encoding="utf-8")
+    assert ConfigManager.load_config() == ConfigManager.default_config()
+    assert "使用默认配置" in caplog.text
+
+
+def test_invalid_custom_formats_are_dropped_individually(config_file, caplog):
+    config = _config(title1="第N章", title2="坏格式")
+    config["custom_formats"] = {"第N章": r"^第\d+章", "坏格式": "没有锚点", "也坏": "^("}
+    config["body"]["font"] = "楷体"
+    config_file.write_text(json.dumps(config, ensure_ascii=False), encoding="utf-8")
+
+    loaded = ConfigManager.load_config()
+    assert loaded["custom_formats"] == {"第N章": r"^第\d+章"}
+    # 引用了被去掉的格式的标题恢复为该级默认格式，其余设置保留
+    assert loaded["titles"]["title1"]["format"] == "第N章"
+    assert loaded["titles"]["title2"]["format"] == ConfigManager.default_config()["titles"]["title2"]["format"]
+    assert loaded["body"]["font"] == "楷体"
+    assert "坏格式" in caplog.text and "也坏" in caplog.text
+
+
+def test_unknown_title_format_falls_back_to_default(config_file):
+    config_file.write_text(json.dumps(_config(title3="不存在"), ensure_ascii=False), encoding="utf-8")
+    assert ConfigManager.load_config()["titles"]["title3"]["format"] == "1."
+
+
+def test_validate_config_is_strict():
+    ConfigManager.validate_config(ConfigManager.default_config())
+    with pytest.raises(ValueError, match="title3"):
+        ConfigManager.validate_config(_config(title3="不存在"))
+    bad = _config()
+    bad["custom_formats"] = {"x": "没有锚点"}
+    with pytest.raises(ValueError):
+        ConfigManager.validate_config(bad)
+    with pytest.raises(ValueError):
+        ConfigManager.validate_config({"body": {"spacing": "abc"}})
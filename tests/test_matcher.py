@@ -0,0 +1,105 @@
+"""
+标题编号匹配器（matcher.py）：组合正则 + 首字符分派表必须与逐级 re.match 的旧实现结果一致。
+"""
+import random
+import re
+
+import pytest
+
+from wordtool.core.matcher import _FORMAT_TO_REGEX, TITLE_FORMATS, TitleMatcher, compile_custom_formats
+
+TEXTS = [
+    "", "正文", " 一、总则", "一、总则", "一 总则", "十二、附则", "一.概述", "（一）目的", "（一）、目的",
+    "（一）.目的", "（十）", "1总则", "1. 总则", "12、范围", "3.2 小节", "（1）步骤", "（12）、步骤", "（1）.步骤",
+    "a 选项", "ab.选项", "abc 选项", "A 选项", "B、选项", "I 引言", "IV. 方法", "（II）结论", "MIX 文字",
+    "①第一", "②③", "１．全角数字", "٣ 阿拉伯-印度数字", "(1) 半角括号", "一二三四五六七八九十", "Ⅳ 罗马字符",
+    "\t一、制表符开头", "图1 示意图", "表2 数据", "1", "a", "（", "一",
+]
+
+
+def _old_detect_level(titles, formats, text):
+    """旧实现：按 title1~title4 的顺序逐个 re.match，第一个匹配的等级即结果"""
+    for level in range(1, 5):
+        fmt = titles.get(f"title{level}", {}).get("format", "")
+        pattern = formats.get(fmt)
+        if pattern and re.match(pattern, text):
+            return level
+    return 0
+
+
+def _titles(formats):
+    return {f"title{level}": {"format": fmt} for level, fmt in enumerate(formats, 1)}
+
+
+def _random_configs(count, seed=0):
+    rng = random.Random(seed)
+    choices = TITLE_FORMATS + [""]
+    return [[rng.choice(choices) for _ in range(4)] for _ in range(count)]
+
+
+@pytest.mark.parametrize("formats", [
+    ["一、", "（一）", "1.", "（1）"],
+    ["1", "1.", "a", "A"],
+    ["I", "A.", "①", "（I）"],
+    ["一", "一、", "（一）、", "（一）."],
+] + _random_configs(200))
+def test_matches_old_per_regex_behaviour(formats):
+    titles = _titles(formats)
+    matcher = TitleMatcher(titles)
+    for text in TEXTS:
+        assert matcher.detect_level(text) == _old_detect_level(titles, _FORMAT_TO_REGEX, text), (formats, text)
+
+
+def test_custom_formats_match_old_behaviour():
+    custom = {"第N章": r"^第[一二三四五六七八九十\d]+章\s*", "§": r"^§\d+\s*", "任意": r"^.{2}\s*"}
+    for formats in (["第N章", "一、", "§", "1."], ["任意", "1.", "", ""], ["1.", "任意", "第N章", "§"]):
+        titles = _titles(formats)
+        matcher = TitleMatcher(titles, custom)
+        all_formats = {**_FORMAT_TO_REGEX, **compile_custom_formats(custom)}
+        for text in TEXTS + ["第三章 总论", "第12章", "§4 条款"]:
+            assert matcher.detect_level(text) == _old_detect_level(titles, all_formats, text), (formats, text)
+
+
+def test_match_spans():
+    matcher = TitleMatcher(_titles(["一、", "（一）", "1.", "（1）"]))
+    m = matcher.match("（一）  目的")
+    assert m.level == 2
+    assert m.span == (0, 3)        # 编号前缀，不含其后空白
+    assert m.body_start == 5       # 标题正文从空白之后开始
+    assert matcher.match("正文内容") is None
+
+
+def test_dispatch_table_rejects_impossible_first_chars():
+    matcher = TitleMatcher(_titles(["一、", "（一）", "1.", "（1）"]))
+    assert matcher.could_match("一")
+    assert matcher.could_match("（")
+    assert matcher.could_match("7")
+    assert not matcher.could_match("正")
+    assert not matcher.could_match("a")
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        TitleMatcher(_titles(["不存在的格式", "", "", ""]))
+
+
+@pytest.mark.parametrize("custom", [
+    {"x": "没有锚点"},
+    {"x": "^("},
+    {"x": "^(?P<n>\\d)"},
+    {"x": "^\\d*"},
+    {"x": "^(\\d)\\1"},
+    {"x": "^(?:第|(\\d))(?(1)、|章)"},
+])
+def test_invalid_custom_formats(custom):
+    with pytest.raises(ValueError):
+        compile_custom_formats(custom)
+
+
+def test_custom_format_groups_do_not_shift():
+    # 普通分组可以用；放进组合正则后编号后移，引用分组的格式在加载时就被拒绝
+    custom = {"重复": r"^(\d)(\d)?、"}
+    matcher = TitleMatcher(_titles(["一、", "重复", "", ""]), custom)
+    assert matcher.match("12、正文").level == 2
+    with pytest.raises(ValueError, match="引用分组"):
+        compile_custom_formats({"重复": r"^(\d)\1、"})
@@ -0,0 +1,145 @@
+"""
+自动编号展开（numbering.py）：计数、多级重置、startOverride、lvlRestart 和文档顺序。
+"""
+from docx import Document
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml.ns import nsdecls, qn
+from docx.oxml.parser import parse_xml
+
+from wordtool.core.numbering import NumberingExpander, format_number
+
+
+def _lvl(ilvl, num_fmt, lvl_text, start=1, restart=None, suff=None):
+    restart_xml = f'<w:lvlRestart w:val="{restart}"/>' if restart is not None else ""
+    suff_xml = f'<w:suff w:val="{suff}"/>' if suff else ""
+    return (f'<w:lvl w:ilvl="{ilvl}"><w:start w:val="{start}"/><w:numFmt w:val="{num_fmt}"/>'
+            f'{restart_xml}{suff_xml}<w:lvlText w:val="{lvl_text}"/></w:lvl>')
+
+
+# abstractNum 1：一、 / （一） / 1.（第 3 级 lvlRestart=0，从不重新开始）
+# num 1、num 2 都引用 abstractNum 1，num 2 的第 1 级从 5 开始
+NUMBERING = parse_xml(
+    f'<w:numbering {nsdecls("w")}>'
+    '<w:abstractNum w:abstractNumId="1">'
+    + _lvl(0, "chineseCounting", "%1、", suff="nothing")
+    + _lvl(1, "chineseCounting", "（%2）", suff="nothing")
+    + _lvl(2, "decimal", "%3.", restart=0, suff="space")
+    + '</w:abstractNum>'
+    '<w:abstractNum w:abstractNumId="2">'
+    + _lvl(0, "decimal", "%1.")
+    + _lvl(1, "lowerLetter", "%1.%2)", suff="space")
+    + '</w:abstractNum>'
+    '<w:num w:numId="1"><w:abstractNumId w:val="1"/></w:num>'
+    '<w:num w:numId="2"><w:abstractNumId w:val="1"/>'
+    '<w:lvlOverride w:ilvl="0"><w:startOverride w:val="5"/></w:lvlOverride></w:num>'
+    '<w:num w:numId="3"><w:abstractNumId w:val="2"/></w:num>'
+    '</w:numbering>'
+)
+
+
+def _p(num_id=None, ilvl=0, text="正文", style=None):
+    ppr = ""
+    if style or num_id is not None:
+        style_xml = f'<w:pStyle w:val="{style}"/>' if style else ""
+        numpr_xml = (f'<w:numPr><w:ilvl w:val="{ilvl}"/><w:numId w:val="{num_id}"/></w:numPr>'
+                     if num_id is not None else "")
+        ppr = f"<w:pPr>{style_xml}{numpr_xml}</w:pPr>"
+    return f"<w:p>{ppr}<w:r><w:t>{text}</w:t></w:r></w:p>"
+
+
+def _body(*paragraphs):
+    return parse_xml(f'<w:body {nsdecls("w")}>{"".join(paragraphs)}</w:body>')
+
+
+def _texts(root):
+    return ["".join(t.text for t in p.iter(qn("w:t"))) for p in root.iter(qn("w:p"))]
+
+
+def _render_all(expander, body):
+    return [(rendered[0] if rendered else None) for rendered in map(expander.render, body.iter(qn("w:p")))]
+
+
+def test_format_number():
+    assert format_number(3, "decimal") == "3"
+    assert format_number(14, "upperRoman") == "XIV"
+    assert format_number(27, "lowerLetter") == "aa"
+    assert format_number(21, "chineseCounting") == "二十一"
+    assert format_number(2, "decimalEnclosedCircle") == "②"
+    assert format_number(7, "unknownFormat") == "7"
+
+
+def test_multilevel_counting_and_reset():
+    body = _body(
+        _p(1, 0), _p(1, 1), _p(1, 1), _p(1, 0), _p(1, 1), _p(), _p(1, 0),
+    )
+    expander = NumberingExpander(NUMBERING)
+    assert _render_all(expander, body) == ["一、", "（一）", "（二）", "二、", "（一）", None, "三、"]
+
+
+def test_lvl_restart_zero_keeps_counting():
+    body = _body(_p(1, 2), _p(1, 2), _p(1, 0), _p(1, 2))
+    expander = NumberingExpander(NUMBERING)
+    assert _render_all(expander, body) == ["1.", "2.", "一、", "3."]
+
+
+def test_start_override_applies_on_first_use():
+    # num 2 与 num 1 共用 abstractNum，第一次出现时按 startOverride 重新开始，之后继续计数
+    body = _body(_p(1, 0), _p(1, 0), _p(2, 0), _p(2, 0), _p(1, 0))
+    expander = NumberingExpander(NUMBERING)
+    assert _render_all(expander, body) == ["一、", "二、", "五、", "六、", "七、"]
+
+
+def test_parent_level_placeholders():
+    body = _body(_p(3, 0), _p(3, 1), _p(3, 1), _p(3, 0), _p(3, 1))
+    expander = NumberingExpander(NUMBERING)
+    assert _render_all(expander, body) == ["1.", "1.a)", "1.b)", "2.", "2.a)"]
+
+
+def test_expand_writes_number_text_and_suffix():
+    body = _body(_p(3, 0, "甲"), _p(3, 1, "乙"), _p(1, 0, "丙"), _p(num_id="0", text="丁"))
+    expander = NumberingExpander(NUMBERING)
+    assert expander.expand_tree(body) == 3
+    assert _texts(body) == ["1.甲", "1.a) 乙", "一、丙", "丁"]
+    # 默认后缀是制表符；展开后的段落不再有 numPr，只剩“丁”原有的 numId=0
+    first = next(body.iter(qn("w:p")))
+    assert first.find(f"{qn('w:r')}/{qn('w:tab')}") is not None
+    assert [n.get(qn("w:val")) for n in body.iter(qn("w:numId"))] == ["0"]
+
+
+def test_style_numbering_is_suppressed_after_expand():
+    styles = parse_xml(
+        f'<w:styles {nsdecls("w")}>'
+        '<w:style w:type="paragraph" w:styleId="Heading1"><w:pPr>'
+        '<w:numPr><w:ilvl w:val="0"/><w:numId w:val="3"/></w:numPr></w:pPr></w:style>'
+        '<w:style w:type="paragraph" w:styleId="Heading1Child"><w:basedOn w:val="Heading1"/></w:style>'
+        '</w:styles>'
+    )
+    body = _body(_p(style="Heading1", text="概述"), _p(style="Heading1Child", text="范围"))
+    expander = NumberingExpander(NUMBERING, styles)
+    assert expander.expand_tree(body) == 2
+    assert _texts(body) == ["1.概述", "2.范围"]
+    # 样式自带的编号用 numId=0 屏蔽，避免 Word 再显示一次
+    assert [n.get(qn("w:val")) for n in body.iter(qn("w:numId"))] == ["0", "0"]
+
+
+def test_expand_tree_counts_table_paragraphs_in_document_order():
+    doc = Document()
+    doc.add_paragraph("甲", style="List Number")
+    cell = doc.add_table(rows=1, cols=1).cell(0, 0)
+    cell.paragraphs[0].style = doc.styles["List Number"]
+    cell.paragraphs[0].add_run("乙")
+    doc.add_paragraph("丙", style="List Number")
+
+    expander = NumberingExpander.from_document(doc)
+    assert expander.expand_tree(doc.element.body) == 3
+    assert _texts(doc.element.body) == ["1.甲", "2.乙", "3.丙"]
+
+
+def test_from_document_without_numbering_part():
+    # 默认模板带 numbering 部件；去掉关系后 from_document 返回 None，且不会新建部件
+    doc = Document()
+    for rel_id, rel in list(doc.part.rels.items()):
+        if rel.reltype == RT.NUMBERING:
+            del doc.part.rels[rel_id]
+    assert NumberingExpander.from_document(doc) is None
+    assert all(rel.reltype != RT.NUMBERING for rel in doc.part.rels.values())
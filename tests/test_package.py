@@ -0,0 +1,146 @@
+"""
+输出包写入（package.py）：未修改的成员原样复制压缩数据，重新写入的部件并行压缩后内容不变。
+"""
+import io
+import os
+import struct
+import zipfile
+import zlib
+
+import pytest
+from docx import Document
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.shared import Inches
+
+from wordtool.config import ConfigManager
+from wordtool.core.formatter import WordFormatter
+from wordtool.core.package import PackageWriter, deflate, iter_relationships, open_source, read_rels, rels_name
+
+
+def _members(path):
+    with zipfile.ZipFile(path) as z:
+        assert z.testzip() is None
+        return {info.filename: info for info in z.infolist()}
+
+
+def _png():
+    """1x1 的白色 PNG"""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(b"\x00\xff\xff\xff")) + chunk(b"IEND", b""))
+
+
+class _Unseekable(io.RawIOBase):
+    """只能顺序写的流：zipfile 写入时改用数据描述符"""
+
+    def __init__(self, target):
+        self.target = target
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.target.write(data)
+
+
+@pytest.fixture
+def source(tmp_path):
+    """源包中的图片不压缩（stored），其余成员 level 9 压缩，所有成员都带数据描述符"""
+    doc = Document()
+    doc.add_paragraph("  一、 总则")
+    doc.add_paragraph("正文内容 (English brackets)。")
+    doc.add_picture(io.BytesIO(_png()), width=Inches(1))
+    doc.sections[0].header.paragraphs[0].text = "页眉 (机密)"
+    plain = tmp_path / "plain.docx"
+    doc.save(plain)
+
+    path = tmp_path / "source.docx"
+    with zipfile.ZipFile(plain) as zin, open(path, "wb") as f, \
+            zipfile.ZipFile(_Unseekable(f), "w", compresslevel=9) as zout:
+        for info in zin.infolist():
+            member = zipfile.ZipInfo(info.filename, info.date_time)
+            stored = info.filename.startswith("word/media/")
+            member.compress_type = zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED
+            with zout.open(member, "w") as dst:
+                dst.write(zin.read(info))
+    return path
+
+
+@pytest.mark.parametrize("engine", ["docx", "streaming"])
+def test_unchanged_members_keep_compressed_data(source, tmp_path, engine):
+    output = tmp_path / "out.docx"
+    formatter = WordFormatter(str(source), dict(ConfigManager.default_config(), engine=engine))
+    assert formatter.save(str(output)), formatter.last_error
+
+    before = _members(source)
+    after = _members(output)
+    copied = []
+    with zipfile.ZipFile(source) as a, zipfile.ZipFile(output) as b:
+        for name, info in after.items():
+            # 内容类型、关系部件总是重新生成；正文、页眉等修改过的部件重新压缩
+            if name == "[Content_Types].xml" or name.endswith(".rels") or b.read(name) != a.read(name):
+                continue
+            original = before[name]
+            assert (info.compress_type, info.CRC, info.compress_size, info.file_size) == (
+                original.compress_type, original.CRC, original.compress_size, original.file_size), name
+            copied.append(name)
+    assert {"word/styles.xml", "word/media/image1.png", "word/theme/theme1.xml"} <= set(copied)
+    assert before["word/styles.xml"].flag_bits & 0x08  # 源成员带数据描述符
+    assert after["word/media/image1.png"].compress_type == zipfile.ZIP_STORED
+
+
+def test_copy_from_file_object_with_prefix(source):
+    # 源包前面有其他数据（自解压等）时 header_offset 已经包含偏移
+    data = b"prefix" * 100 + source.read_bytes()
+    buffer = io.BytesIO()
+    src = io.BytesIO(data)
+    with zipfile.ZipFile(src) as zin, open_source(src) as raw, PackageWriter(buffer) as writer:
+        for info in zin.infolist():
+            writer.copy(raw, info)
+    assert writer.copied == len(zin.infolist())
+    with zipfile.ZipFile(io.BytesIO(data)) as a, zipfile.ZipFile(buffer) as b:
+        assert b.testzip() is None
+        assert [(i.filename, i.CRC, i.compress_size) for i in b.infolist()] == [
+            (i.filename, i.CRC, i.compress_size) for i in a.infolist()]
+
+
+def test_parallel_deflate_round_trip():
+    data = b"".join(b"<w:p><w:r><w:t>%d</w:t></w:r></w:p>" % i for i in range(200_000))
+    assert len(data) > 5 * 1024 * 1024
+    serial = b"".join(deflate(data, 6, workers=1))
+    parallel = b"".join(deflate(data, 6, workers=4))
+    assert zlib.decompress(parallel, -15) == data
+    # 预设字典使分块压缩几乎不损失压缩率
+    assert len(parallel) < len(serial) * 1.01
+
+
+def test_writer_output(tmp_path):
+    path = tmp_path / "out.zip"
+    data = os.urandom(1000) * 3000
+    with PackageWriter(path, workers=2) as writer:
+        writer.write("大文件.xml", data, (2024, 5, 6, 7, 8, 10))
+        with writer.open("stream.xml") as f:
+            for _ in range(100):
+                f.write(b"<a/>" * 1000)
+        writer.write("empty.xml", b"")
+    assert writer.written == 3
+    with zipfile.ZipFile(path) as z:
+        assert z.testzip() is None
+        info = z.getinfo("大文件.xml")
+        assert info.date_time == (2024, 5, 6, 7, 8, 10)
+        assert z.read(info) == data
+        assert z.read("stream.xml") == b"<a/>" * 100_000
+        assert z.read("empty.xml") == b""
+
+
+def test_relationships(source):
+    assert rels_name(None) == "_rels/.rels"
+    assert rels_name("word/document.xml") == "word/_rels/document.xml.rels"
+    with zipfile.ZipFile(source) as zin:
+        assert read_rels(zin, None)[RT.OFFICE_DOCUMENT] == "word/document.xml"
+        rels = read_rels(zin, "word/document.xml")
+        assert rels[RT.STYLES] == "word/styles.xml"
+        assert rels[RT.IMAGE] == "word/media/image1.png"
+        assert all(not external for *_, external in iter_relationships(zin, "word/document.xml"))
+        assert list(iter_relationships(zin, "word/styles.xml")) == []
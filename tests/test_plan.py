@@ -0,0 +1,125 @@
+"""
+格式方案（plan.py）：按模板合并 rPr / pPr 的结果与直接调用 python-docx 的 setter 逐字节相同。
+"""
+from copy import deepcopy
+
+import pytest
+from docx.enum.text import WD_LINE_SPACING, WD_PARAGRAPH_ALIGNMENT
+from docx.oxml.ns import nsdecls, qn
+from docx.oxml.parser import parse_xml
+from docx.shared import Pt, RGBColor
+from docx.text.paragraph import Paragraph
+from docx.text.run import Run
+from lxml import etree
+
+from wordtool.config import ConfigManager
+from wordtool.core.plan import FormatPlan, config_key
+
+
+def _c14n(e):
+    return etree.tostring(e, method="c14n", exclusive=True)
+
+
+def _r(rpr=""):
+    return parse_xml(f"<w:r {nsdecls('w')}>{rpr}<w:t>文字</w:t></w:r>")
+
+
+def _p(ppr=""):
+    return parse_xml(f"<w:p {nsdecls('w')}>{ppr}<w:r><w:t>文字</w:t></w:r></w:p>")
+
+
+@pytest.fixture(scope="module")
+def config():
+    config = ConfigManager.default_config()
+    config["titles"]["title2"].update(font="楷体", bold=False)
+    return config
+
+
+@pytest.fixture(scope="module")
+def plan(config):
+    return FormatPlan(config)
+
+
+RUN_PROPERTIES = [
+    "",
+    "<w:rPr/>",
+    '<w:rPr><w:rStyle w:val="Emphasis"/><w:lang w:val="en-US"/></w:rPr>',
+    '<w:rPr><w:rFonts w:ascii="Arial" w:hint="eastAsia"/><w:b w:val="0"/><w:sz w:val="18"/></w:rPr>',
+    '<w:rPr><w:i/><w:color w:val="FF0000" w:themeColor="accent1"/><w:szCs w:val="18"/></w:rPr>',
+    '<w:rPr><w:b/><w:u w:val="single"/><w:vertAlign w:val="superscript"/></w:rPr>',
+]
+
+
+@pytest.mark.parametrize("rpr", RUN_PROPERTIES)
+@pytest.mark.parametrize("level", [0, 1, 2, "caption"])
+def test_apply_run_matches_setters(plan, config, rpr, level):
+    style_cfg = {0: config["body"], 1: config["titles"]["title1"], 2: config["titles"]["title2"],
+                 "caption": config["caption"]}[level]
+    fmt = plan.levels[level]
+    expected = _r(rpr)
+    run = Run(expected, None)
+    run.font.name = style_cfg["font"]
+    expected.rPr.rFonts.set(qn("w:eastAsia"), style_cfg["font"])
+    run.font.size = Pt(fmt.size)
+    run.bold = bool(style_cfg.get("bold", False))
+    run.font.color.rgb = RGBColor(0, 0, 0)
+
+    actual = _r(rpr)
+    FormatPlan.apply_run(actual, fmt)
+    assert _c14n(actual) == _c14n(expected)
+    # 模板本身不被修改，可以反复使用
+    FormatPlan.apply_run(_r(rpr), fmt)
+    assert _c14n(fmt.rpr) == _c14n(plan.levels[level].rpr)
+
+
+PARAGRAPH_PROPERTIES = [
+    "",
+    '<w:pPr><w:pStyle w:val="ListNumber"/><w:numPr><w:ilvl w:val="0"/><w:numId w:val="1"/></w:numPr></w:pPr>',
+    '<w:pPr><w:spacing w:before="120" w:after="0"/><w:ind w:left="420" w:hanging="420"/>'
+    '<w:jc w:val="right"/><w:rPr><w:b/></w:rPr></w:pPr>',
+    '<w:pPr><w:ind w:firstLineChars="200" w:firstLine="480"/><w:outlineLvl w:val="1"/></w:pPr>',
+]
+
+
+@pytest.mark.parametrize("ppr", PARAGRAPH_PROPERTIES)
+def test_apply_paragraph_matches_setters(plan, config, ppr):
+    # 标题：左对齐、零缩进
+    expected = _p(ppr)
+    paragraph = Paragraph(expected, None)
+    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+    paragraph.paragraph_format.first_line_indent = Pt(0)
+    paragraph.paragraph_format.left_indent = Pt(0)
+    actual = _p(ppr)
+    FormatPlan.apply_paragraph(actual, plan.levels[1])
+    assert _c14n(actual) == _c14n(expected)
+
+    # 正文：行距，再加首行缩进两个字符
+    expected = _p(ppr)
+    fmt = Paragraph(expected, None).paragraph_format
+    fmt.line_spacing_rule = WD_LINE_SPACING.MULTIPLE
+    fmt.line_spacing = float(config["body"].get("spacing", 1.25))
+    fmt.left_indent = Pt(0)
+    fmt.first_line_indent = Pt(plan.levels[0].size * 2)
+    Paragraph(expected, None).alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+    actual = _p(ppr)
+    FormatPlan.apply_paragraph(actual, plan.levels[0])
+    plan.apply_indent(actual, Pt(plan.levels[0].size))
+    assert _c14n(actual) == _c14n(expected)
+
+
+def test_caption_is_centered(plan):
+    p = _p('<w:pPr><w:jc w:val="left"/></w:pPr>')
+    FormatPlan.apply_paragraph(p, plan.levels["caption"])
+    assert [e.get(qn("w:val")) for e in p.iter(qn("w:jc"))] == ["center"]
+
+
+def test_plans_are_cached_by_relevant_config(config):
+    plan = FormatPlan.from_config(config)
+    assert FormatPlan.from_config(deepcopy(config)) is plan
+    # 与格式方案无关的配置不影响缓存
+    assert FormatPlan.from_config(dict(config, engine="streaming")) is plan
+    changed = deepcopy(config)
+    changed["body"]["font"] = "黑体"
+    assert config_key(changed) != config_key(config)
+    assert FormatPlan.from_config(changed) is not plan
+    assert FormatPlan.from_config(changed).levels[0].font == "黑体"
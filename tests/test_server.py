@@ -0,0 +1,144 @@
+"""
+格式化服务（server.py）：在 localhost 上启动服务，用原始 HTTP 请求检查格式化、背压、404/405、超时。
+"""
+import asyncio
+import io
+import signal
+import time
+import zipfile
+
+import pytest
+from docx import Document
+
+from wordtool.config import ConfigManager
+from wordtool.core import server as server_module
+from wordtool.core.server import FormatServer
+
+
+def _hang_job(data, config, timeout):
+    """模拟卡在 C 代码中的文档：屏蔽 SIGALRM，一直不返回"""
+    if data == b"hang":
+        signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGALRM})
+        time.sleep(600)
+    return _format_job(data, config, timeout)
+
+
+_format_job = server_module._format_job
+
+
+def _docx():
+    doc = Document()
+    doc.add_paragraph("  一、 总则")
+    doc.add_paragraph("正文内容 (English brackets)。")
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+async def _request(reader, writer, method, path, body=b"", headers=None):
+    """发送一个请求，返回 (状态码, 响应头, 响应体)"""
+    lines = [f"{method} {path} HTTP/1.1", "Host: localhost", f"Content-Length: {len(body)}"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    response_headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        response_headers[name.strip().lower()] = value.strip()
+    data = await reader.readexactly(int(response_headers["content-length"]))
+    return status, response_headers, data
+
+
+def _serve(test, **options):
+    """启动一个单工作进程的服务，执行 test(server, connect)，结束后关闭服务"""
+    async def main():
+        server = FormatServer(ConfigManager.default_config(), workers=1, **options)
+        host, port = (await server.start(port=0)).rsplit("/", 1)[-1].split(":")
+        try:
+            await test(server, lambda: asyncio.open_connection(host, int(port)))
+        finally:
+            await server.close()
+
+    asyncio.run(asyncio.wait_for(main(), 60))
+
+
+def test_format_round_trip_and_keep_alive():
+    async def test(server, connect):
+        reader, writer = await connect()
+        for _ in range(2):  # 同一连接上连续提交
+            status, headers, body = await _request(reader, writer, "POST", "/format", _docx())
+            assert status == 200, body
+            assert headers["connection"] == "keep-alive"
+            assert int(headers["x-wordtool-paragraphs"]) == 2
+            with zipfile.ZipFile(io.BytesIO(body)) as z:
+                assert "（English brackets）".encode() in z.read("word/document.xml")
+        status, _, body = await _request(reader, writer, "POST", "/format", b"not a docx")
+        assert status == 422
+        writer.close()
+
+    _serve(test)
+
+
+def test_not_found_and_method_not_allowed():
+    async def test(server, connect):
+        reader, writer = await connect()
+        status, headers, _ = await _request(reader, writer, "GET", "/nothing")
+        assert (status, headers["connection"]) == (404, "keep-alive")
+        status, headers, _ = await _request(reader, writer, "GET", "/format")
+        assert (status, headers["allow"], headers["connection"]) == (405, "POST", "keep-alive")
+
+        # 带请求体的错误请求不读取请求体，必须关闭连接，否则请求体会被当作下一个请求
+        for method, path in (("POST", "/nothing"), ("PUT", "/format"), ("POST", "/format?config=nope")):
+            reader, writer = await connect()
+            status, headers, _ = await _request(reader, writer, method, path, b"x" * 100)
+            assert status in (404, 405)
+            assert headers["connection"] == "close"
+            assert await reader.read() == b""
+            writer.close()
+
+        reader, writer = await connect()
+        status, _, body = await _request(reader, writer, "GET", "/metrics")
+        text = body.decode()
+        assert 'path="other",status="404"' in text
+        assert "/nothing" not in text
+        writer.close()
+
+    _serve(test)
+
+
+def test_queue_full_is_rejected_without_reading_body():
+    async def test(server, connect):
+        reader, writer = await connect()
+        # 声明了很大的请求体但不发送：服务不等待请求体，直接返回 503
+        writer.write(b"POST /format HTTP/1.1\r\nContent-Length: 100000000\r\n\r\n")
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), 10)
+        assert status_line.split()[1] == b"503"
+        response = await reader.read()
+        assert b"Retry-After: 1" in response and b"Connection: close" in response
+        assert server.metrics.rejected == 1
+        writer.close()
+
+    _serve(test, max_queue=0)
+
+
+@pytest.mark.skipif(not hasattr(signal, "pthread_sigmask"), reason="需要屏蔽信号")
+def test_hung_worker_is_replaced(monkeypatch):
+    monkeypatch.setattr(server_module, "_format_job", _hang_job)
+    monkeypatch.setattr(server_module, "grace_period", lambda timeout: 1.0)
+
+    async def test(server, connect):
+        reader, writer = await connect()
+        [worker] = server.pool.executor._processes.values()
+        status, _, body = await _request(reader, writer, "POST", "/format", b"hang")
+        assert status == 504, body
+        assert server.metrics.timeouts == 1
+        assert not worker.is_alive()
+        # 卡住的工作进程已被终止，唯一的工作位重新可用
+        status, _, body = await _request(reader, writer, "POST", "/format", _docx())
+        assert status == 200, body
+        assert worker.pid not in server.pool.executor._processes
+        writer.close()
+
+    _serve(test, timeout=0.5)
@@ -0,0 +1,138 @@
+"""
+段落文字的最小修改（textedit.py）：TextMap 的文字与 python-docx 一致，删除只改动真正变化的 w:t。
+"""
+from copy import deepcopy
+
+import pytest
+from docx.oxml.ns import nsdecls, qn
+from docx.oxml.parser import parse_xml
+from docx.text.paragraph import Paragraph
+from lxml import etree
+
+from wordtool.core.classify import apply_clean, clean_numbering, numbering_ranges
+from wordtool.core.matcher import TitleMatcher
+from wordtool.core.textedit import BRACKETS, CharMap, TextMap, paragraph_text, translate_text
+
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+
+def _p(body):
+    return parse_xml(f"<w:p {nsdecls('w', 'r')}>{body}</w:p>")
+
+
+def _r(text, bold=False):
+    rpr = "<w:rPr><w:b/></w:rPr>" if bold else ""
+    return f'<w:r>{rpr}<w:t xml:space="preserve">{text}</w:t></w:r>'
+
+
+def _c14n(e):
+    return etree.tostring(e, method="c14n", exclusive=True)
+
+
+def _ts(p):
+    return [t.text for t in p.iter(qn("w:t"))]
+
+
+DRAWING_RUN = '<w:r><w:drawing/></w:r>'
+
+PARAGRAPHS = [
+    _r("普通文字"),
+    _r("1. ", bold=True) + _r("分段") + _r("的 run"),
+    '<w:r><w:t>甲</w:t><w:tab/><w:t>乙</w:t><w:br/><w:t>丙</w:t><w:br w:type="page"/></w:r>',
+    '<w:r><w:t>前</w:t></w:r><w:hyperlink r:id="rId1"><w:r><w:t>链接</w:t></w:r></w:hyperlink>'
+    '<w:r><w:noBreakHyphen/><w:t>后</w:t></w:r>',
+    _r("图") + DRAWING_RUN + _r("题"),
+    '<w:r><w:fldChar w:fldCharType="begin"/></w:r><w:r><w:instrText> PAGE </w:instrText></w:r>'
+    '<w:r><w:fldChar w:fldCharType="end"/></w:r>',
+    "",
+]
+
+
+@pytest.mark.parametrize("body", PARAGRAPHS)
+def test_text_matches_python_docx(body):
+    p = _p(body)
+    expected = Paragraph(p, None).text
+    assert paragraph_text(p) == expected
+    text_map = TextMap(p)
+    assert text_map.text == expected
+    # segments 首尾相接，覆盖整段文字
+    pos = 0
+    for start, end, _ in text_map.segments:
+        assert start == pos and end > start
+        pos = end
+    assert pos == len(expected)
+
+
+def test_delete_within_one_run_touches_only_that_t():
+    p = _p(_r("1. ", bold=True) + _r("标题") + _r("正文"))
+    untouched = [deepcopy(r) for r in p.iter(qn("w:r"))][1:]
+    assert TextMap(p).delete([(2, 3)])
+    assert _ts(p) == ["1.", "标题", "正文"]
+    runs = list(p.iter(qn("w:r")))
+    assert runs[0].find(qn("w:rPr")) is not None  # 格式保留
+    assert [_c14n(r) for r in runs[1:]] == [_c14n(r) for r in untouched]
+
+
+def test_delete_across_runs_removes_emptied_runs():
+    p = _p(_r("  ") + _r("（一）", bold=True) + _r("  ") + _r(" 目的"))
+    assert TextMap(p).delete([(0, 2), (5, 8)])
+    assert _ts(p) == ["（一）", "目的"]
+    # 只剩空白的 run 整个移除，部分删除的 w:t 保留 run 和格式
+    runs = list(p.iter(qn("w:r")))
+    assert len(runs) == 2
+    assert runs[0].find(qn("w:rPr")) is not None
+
+
+def test_delete_keeps_runs_with_other_content():
+    p = _p('<w:r><w:t>图</w:t><w:drawing/></w:r>' + _r("1 说明"))
+    assert TextMap(p).delete([(0, 1)])
+    runs = list(p.iter(qn("w:r")))
+    assert len(runs) == 2
+    assert runs[0].find(qn("w:drawing")) is not None
+    assert runs[0].find(qn("w:t")) is None
+
+
+def test_delete_tab_and_preserve_space():
+    p = _p('<w:r><w:tab/><w:t>一、</w:t></w:r>' + '<w:r><w:t>总则 </w:t></w:r>')
+    assert TextMap(p).delete([(0, 1), (3, 4)])
+    assert paragraph_text(p) == "一、则 "
+    assert p.find(f".//{qn('w:tab')}") is None
+    assert list(p.iter(qn("w:t")))[-1].get(_XML_SPACE) == "preserve"
+
+
+def test_empty_ranges_do_not_modify():
+    p = _p(_r("不变"))
+    before = etree.tostring(p)
+    assert not TextMap(p).delete([])
+    assert not TextMap(p).delete([(3, 3)])
+    assert etree.tostring(p) == before
+
+
+def test_clean_numbering_ranges_match_apply_clean():
+    matcher = TitleMatcher({"title1": {"format": "一、"}, "title2": {"format": "（一）"}, "title3": {"format": "1."}})
+    for body in (
+        _r("  ") + _r("一、", bold=True) + _r("  总则"),
+        _r("\t1.") + _r("   ") + _r("范围 (a)"),
+        _r("(一) ", bold=True) + _r("目的"),
+        _r("  正文不变"),
+    ):
+        p = _p(body)
+        text = paragraph_text(p)
+        lead, cut, end = clean_numbering(text, matcher.match)
+        TextMap(p).delete(numbering_ranges(lead, cut, end))
+        assert paragraph_text(p) == apply_clean(text, lead, cut, end)
+
+
+def test_translate_text_only_writes_changed_elements():
+    p = _p(_r("无括号") + _r("有(括号)"))
+    t_plain, t_brackets = p.iter(qn("w:t"))
+    changed = sum(translate_text(r, BRACKETS) for r in p.iter(qn("w:r")))
+    assert changed == 1
+    assert (t_plain.text, t_brackets.text) == ("无括号", "有（括号）")
+
+
+def test_charmap():
+    quotes = CharMap({'"': "”", "'": "’"})
+    text = "没有需要替换的字符"
+    assert quotes(text) is text
+    assert quotes("it's \"x\"") == "it’s ”x”"
@@ -0,0 +1,182 @@
+"""
+结构校验（verify.py）：正常的格式化结果通过校验，丢失文字、图片、表格单元格、部件时报告对应的差异。
+"""
+import io
+import json
+import re
+import struct
+import zipfile
+import zlib
+
+import pytest
+from docx import Document
+from docx.shared import Inches
+
+from wordtool.config import ConfigManager
+from wordtool.core import verify
+from wordtool.core.formatter import WordFormatter
+from wordtool.core.verify import COLUMNS, MAX_DIFFERENCES, VerifyError, verify_documents
+
+
+def _png(color=b"\xff\xff\xff"):
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(b"\x00" + color)) + chunk(b"IEND", b""))
+
+
+@pytest.fixture
+def config():
+    return ConfigManager.default_config()
+
+
+@pytest.fixture
+def source(tmp_path):
+    doc = Document()
+    doc.add_paragraph("  一、 总则")
+    doc.add_paragraph("（一） 目的 (test)")
+    doc.add_paragraph("正文内容 (English brackets)。")
+    doc.add_picture(io.BytesIO(_png()), width=Inches(1))
+    doc.add_paragraph("图1 示例图片")
+    table = doc.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = "(a) 单元格"
+    doc.add_paragraph("列表项", style="List Number")
+    doc.sections[0].header.paragraphs[0].text = "页眉 (机密)"
+    path = tmp_path / "source.docx"
+    doc.save(path)
+    return path
+
+
+@pytest.fixture
+def output(source, config, tmp_path):
+    path = tmp_path / "output.docx"
+    formatter = WordFormatter(str(source), config)
+    assert formatter.save(str(path)), formatter.last_error
+    return path
+
+
+def _rewrite(path, target, name, edit):
+    """复制 path 到 target，成员 name 的内容改为 edit(原内容)；edit 返回 None 时删除该成员"""
+    with zipfile.ZipFile(path) as zin, zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as zout:
+        for info in zin.infolist():
+            data = zin.read(info)
+            if info.filename == name:
+                data = edit(data)
+                if data is None:
+                    continue
+            zout.writestr(info, data)
+    return target
+
+
+def _kinds(report):
+    return {(part, kind) for part, _, kind, _ in report["differences"]}
+
+
+def _media_name(path):
+    with zipfile.ZipFile(path) as z:
+        return next(name for name in z.namelist() if name.startswith("word/media/"))
+
+
+def test_formatted_output_passes(source, output, config):
+    report = verify_documents(str(source), str(output), config)
+    assert report["ok"], report["differences"]
+    assert report["columns"] == COLUMNS
+    assert report["differences"] == [] and report["truncated"] == 0
+    assert report["tables"] == 1
+    assert report["paragraphs"] >= 10
+    json.dumps(report, ensure_ascii=False)
+
+
+def test_both_engines_pass_with_file_objects(source, config, tmp_path):
+    for engine in ("docx", "streaming"):
+        buffer = io.BytesIO()
+        formatter = WordFormatter(str(source), dict(config, engine=engine))
+        assert formatter.save(buffer), formatter.last_error
+        buffer.seek(0)
+        with open(source, "rb") as f:
+            assert verify_documents(f, buffer, config)["ok"]
+
+
+def test_unformatted_input_reports_text_changes(source, config):
+    # 输入本身没有展开编号、清理空白，与预期文字不同
+    report = verify_documents(str(source), str(source), config)
+    assert not report["ok"]
+    assert ("word/document.xml", "text") in _kinds(report)
+
+
+def test_changed_text(output, source, config, tmp_path):
+    corrupt = _rewrite(output, tmp_path / "bad.docx", "word/document.xml",
+                       lambda data: data.replace("正文内容".encode(), "别的内容".encode()))
+    report = verify_documents(str(source), str(corrupt), config)
+    assert not report["ok"]
+    [(part, index, kind, detail)] = report["differences"]
+    assert (part, kind) == ("word/document.xml", "text")
+    assert index >= 0 and "别的内容" in detail
+
+
+def test_missing_drawing(output, source, config, tmp_path):
+    corrupt = _rewrite(output, tmp_path / "bad.docx", "word/document.xml",
+                       lambda data: re.sub(rb"<w:drawing>.*?</w:drawing>", b"", data, flags=re.S))
+    report = verify_documents(str(source), str(corrupt), config)
+    assert ("word/document.xml", "objects") in _kinds(report)
+    assert any("drawing 1 -> 0" in detail for *_, detail in report["differences"])
+
+
+def test_missing_table_cell(output, source, config, tmp_path):
+    corrupt = _rewrite(output, tmp_path / "bad.docx", "word/document.xml",
+                       lambda data: re.sub(rb"<w:tc>.*?</w:tc>", b"", data, count=1, flags=re.S))
+    report = verify_documents(str(source), str(corrupt), config)
+    assert ("word/document.xml", "table") in _kinds(report)
+
+
+def test_changed_and_missing_media(output, source, config, tmp_path):
+    media = _media_name(output)
+    changed = _rewrite(output, tmp_path / "changed.docx", media, lambda data: _png(b"\x00\x00\x00"))
+    assert (media, "media") in _kinds(verify_documents(str(source), str(changed), config))
+
+    missing = _rewrite(output, tmp_path / "missing.docx", media, lambda data: None)
+    assert (media, "missing_part") in _kinds(verify_documents(str(source), str(missing), config))
+
+
+def test_changed_header(output, source, config, tmp_path):
+    with zipfile.ZipFile(output) as z:
+        header = next(name for name in z.namelist() if re.match(r"word/header\d*\.xml$", name))
+    corrupt = _rewrite(output, tmp_path / "bad.docx", header, lambda data: data.replace("机密".encode(), "公开".encode()))
+    assert (header, "text") in _kinds(verify_documents(str(source), str(corrupt), config))
+
+
+def test_differences_are_truncated(config, tmp_path):
+    doc = Document()
+    for i in range(MAX_DIFFERENCES + 20):
+        doc.add_paragraph(f"正文第 {i} 段")
+    source = tmp_path / "long.docx"
+    doc.save(source)
+    output = tmp_path / "long_out.docx"
+    assert WordFormatter(str(source), config).save(str(output))
+    corrupt = _rewrite(output, tmp_path / "bad.docx", "word/document.xml",
+                       lambda data: data.replace("正文第".encode(), "改动第".encode()))
+    report = verify_documents(str(source), str(corrupt), config)
+    assert len(report["differences"]) == MAX_DIFFERENCES
+    assert report["truncated"] == 20
+
+
+def test_formatter_verify_option(source, config, tmp_path, monkeypatch):
+    path = tmp_path / "checked.docx"
+    formatter = WordFormatter(str(source), dict(config, verify=True))
+    assert formatter.save(str(path)), formatter.last_error
+    assert formatter.verify_report["ok"]
+
+    # 校验不通过时视为处理失败，删除输出
+    def failing(source, output, config, **kwargs):
+        report = verify_documents(source, output, config, **kwargs)
+        report["ok"] = False
+        report["differences"] = [["word/document.xml", 0, "text", "输出为 ''"]]
+        return report
+
+    monkeypatch.setattr(verify, "verify_documents", failing)
+    failed = tmp_path / "failed.docx"
+    formatter = WordFormatter(str(source), dict(config, verify=True))
+    assert not formatter.save(str(failed))
+    assert not failed.exists()
+    assert formatter.last_error.startswith(VerifyError.__name__)
+    assert "结构校验失败：1 处差异" in formatter.last_error
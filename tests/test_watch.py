@@ -0,0 +1,148 @@
+"""
+监视目录（watch.py）：文件稳定且是完整的 zip 时才处理，未改变的文件不重复处理，卡住的工作进程被终止。
+"""
+import io
+import os
+import signal
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+from docx import Document
+
+from wordtool.config import ConfigManager
+from wordtool.core import watch
+from wordtool.core.batch import temp_path
+from wordtool.core.watch import OUTPUT_PREFIX, FolderWatcher
+
+
+def _docx(text="正文内容"):
+    doc = Document()
+    doc.add_paragraph("一、 总则")
+    doc.add_paragraph(text)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def _hang(in_path, out_path, config, timeout):
+    """模拟卡在 C 代码中的文档：屏蔽 SIGALRM，留下临时文件后一直不返回"""
+    if "hang" in os.path.basename(in_path):
+        signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGALRM})
+        with open(temp_path(out_path), "w") as f:
+            f.write("partial")
+        time.sleep(600)
+    return _format_atomic(in_path, out_path, config, timeout)
+
+
+_format_atomic = watch._format_atomic
+
+
+@pytest.fixture
+def folder(tmp_path):
+    return FolderWatcher(tmp_path, ConfigManager.default_config(), jobs=1, settle=0.5)
+
+
+def _set_mtime(path, seconds):
+    os.utime(path, ns=(seconds * 10**9, seconds * 10**9))
+
+
+def test_candidates(folder):
+    assert folder.is_candidate("报告.docx")
+    for name in ("~$报告.docx", ".报告.docx", f"{OUTPUT_PREFIX}报告.docx", "报告.doc", "报告.docx.tmp"):
+        assert not folder.is_candidate(name), name
+
+
+def test_waits_for_settle_and_complete_zip(folder, tmp_path):
+    data = _docx()
+    path = tmp_path / "a.docx"
+    path.write_bytes(data[:len(data) // 2])  # 复制到一半
+    _set_mtime(path, 1000)
+    now = time.monotonic()
+    folder._touch("a.docx")
+
+    folder._check_pending(now)
+    folder._check_pending(now + 0.2)
+    assert not folder._ready  # 还没有稳定 settle 秒
+    folder._check_pending(now + 1)
+    assert not folder._ready and "a.docx" in folder._pending  # 稳定了但 zip 不完整，继续等待
+
+    path.write_bytes(data)
+    _set_mtime(path, 1001)
+    folder._check_pending(now + 1.2)
+    assert not folder._ready  # 变化后重新计时
+    folder._check_pending(now + 2)
+    assert list(folder._ready) == ["a.docx"] and not folder._pending
+
+
+def test_incomplete_file_is_skipped_after_max_wait(folder, tmp_path):
+    results = []
+    folder.on_result = results.append
+    (tmp_path / "bad.docx").write_bytes(b"not a zip")
+    folder._touch("bad.docx")
+    now = time.monotonic()
+    folder._check_pending(now)
+    folder._check_pending(now + folder.max_wait + 1)
+    [result] = results
+    assert (result.status, result.error) == ("skipped", "不是完整的 .docx 文件")
+    assert not folder._pending and not folder._ready
+
+
+def test_requeue_only_when_changed(folder, tmp_path):
+    path = tmp_path / "a.docx"
+    path.write_bytes(_docx())
+    _set_mtime(path, 1000)
+    now = time.monotonic()
+    folder._touch("a.docx")
+    folder._check_pending(now)
+    folder._check_pending(now + 1)
+    assert folder._ready.popleft() == "a.docx"
+
+    # 处理期间又收到事件（如复制结束时的 CLOSE_WRITE）：处理中不动，完成后文件没变就不再处理
+    future = Future()
+    folder._running[future] = "a.docx"
+    folder._touch("a.docx")
+    folder._check_pending(now + 2)
+    assert "a.docx" in folder._pending
+    del folder._running[future]
+    folder._check_pending(now + 3)
+    folder._check_pending(now + 4)
+    assert not folder._pending and not folder._ready
+
+    # 内容被修改：重新处理
+    path.write_bytes(_docx("修改后的正文"))
+    _set_mtime(path, 1002)
+    folder._touch("a.docx")
+    folder._check_pending(now + 5)
+    folder._check_pending(now + 6)
+    assert list(folder._ready) == ["a.docx"]
+
+
+@pytest.mark.skipif(not hasattr(signal, "pthread_sigmask"), reason="需要屏蔽信号")
+def test_hung_worker_is_terminated(tmp_path, monkeypatch):
+    monkeypatch.setattr(watch, "_format_atomic", _hang)
+    monkeypatch.setattr(watch, "grace_period", lambda timeout: 1.0)
+    for name in ("a_hang.docx", "b.docx", "c.docx"):
+        (tmp_path / name).write_bytes(_docx())
+
+    results = []
+    folder = FolderWatcher(tmp_path, ConfigManager.default_config(), jobs=1, settle=0.2, polling=True,
+                           timeout=0.5, on_result=results.append)
+    stop = threading.Event()
+    thread = threading.Thread(target=folder.run, args=(stop,))
+    thread.start()
+    try:
+        deadline = time.monotonic() + 30
+        while len(results) < 3 and time.monotonic() < deadline:
+            time.sleep(0.1)
+    finally:
+        stop.set()
+        thread.join(30)
+    assert not thread.is_alive()
+
+    statuses = {os.path.basename(r.path): (r.status, r.error) for r in results}
+    assert statuses == {"a_hang.docx": ("failed", "处理超时"), "b.docx": ("ok", None), "c.docx": ("ok", None)}
+    # 排在卡住的文件后面的文件照常输出，卡住的文件不留下临时文件
+    assert sorted(os.listdir(tmp_path)) == ["a_hang.docx", "b.docx", "c.docx",
+                                            f"{OUTPUT_PREFIX}b.docx", f"{OUTPUT_PREFIX}c.docx"]